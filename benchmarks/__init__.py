@@ -0,0 +1,8 @@
+"""
+Benchmarks of ``gitchecker`` on generated repositories
+
+``python -m benchmarks.run`` generates (or reuses) repositories of the
+selected shapes, see ``benchmarks.generate.SHAPES``, and times
+``git status`` as a baseline, ``check_status_and_get_commit_info()`` and
+each phase of the status of every engine, writing the results as JSON.
+"""
@@ -0,0 +1,129 @@
+"""
+Generator of synthetic repositories with a given shape
+
+The tracked files are spread over ``depth`` levels of ``fanout``
+directories each, so the same number of files can make a wide and
+shallow tree or a deep and narrow one. After the commit, the first
+``modified_files`` are modified, the first ``staged_files`` of them are
+staged and the untracked and ignored files are added. The objects are
+left loose or packed with ``git repack``.
+
+A generated repository is reused while its ``shape.json`` is unchanged.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from collections import namedtuple
+
+
+RepoShape = namedtuple("RepoShape", ["tracked_files",
+                                     "depth",
+                                     "fanout",
+                                     "untracked_files",
+                                     "ignored_files",
+                                     "modified_files",
+                                     "staged_files",
+                                     "packed"])
+
+SHAPES = {
+    "wide-10k": RepoShape(10000, 1, 100, 0, 0, 20, 10, True),
+    "deep-10k": RepoShape(10000, 8, 3, 0, 0, 20, 10, True),
+    "untracked-10k": RepoShape(10000, 2, 20, 10000, 0, 0, 0, True),
+    "ignored-10k": RepoShape(10000, 2, 20, 0, 100000, 0, 0, True),
+    "loose-10k": RepoShape(10000, 2, 20, 0, 0, 20, 10, False),
+    "wide-100k": RepoShape(100000, 2, 50, 1000, 10000, 200, 100, True),
+    "wide-1m": RepoShape(1000000, 3, 40, 1000, 10000, 200, 100, True),
+}
+
+SHAPE_FILENAME = "shape.json"
+IGNORED_DIR = "ignored"
+UNTRACKED_DIR = "untracked"
+
+GIT_IDENTITY = ["-c", "user.name=gitchecker-benchmark",
+                "-c", "user.email=benchmark@gitchecker",
+                "-c", "commit.gpgsign=false"]
+
+
+def generate_repo(path, shape):
+    """creates the repository of ``shape`` in ``path``, unless it already
+    exists, and returns the path of its working tree"""
+
+    worktree = os.path.join(path, "repo")
+    shape_path = os.path.join(path, SHAPE_FILENAME)
+    if _read_shape(shape_path) == shape._asdict():
+        return worktree
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(worktree)
+    _git(worktree, "init", "-q")
+
+    with open(os.path.join(worktree, ".gitignore"), "w") as f:
+        f.write("/{}/\n".format(IGNORED_DIR))
+
+    tracked_paths = [tracked_path(shape, i) for i in range(shape.tracked_files)]
+    for i, rel_path in enumerate(tracked_paths):
+        _write_file(worktree, rel_path, "tracked {}\n".format(i))
+
+    # "git add -A" of a million paths, without any argument list limit
+    _git(worktree, "add", "-A")
+    _git(worktree, "commit", "-q", "-m", "Generated {}".format(shape))
+    if shape.packed:
+        _git(worktree, "repack", "-a", "-d", "-q")
+
+    for i, rel_path in enumerate(tracked_paths[:shape.modified_files]):
+        _write_file(worktree, rel_path, "modified {}\n".format(i))
+    if shape.staged_files:
+        _git(worktree, "add", "--", *tracked_paths[:shape.staged_files])
+
+    for i in range(shape.untracked_files):
+        _write_file(worktree, _spread_path(UNTRACKED_DIR, i, 100), "untracked\n")
+    for i in range(shape.ignored_files):
+        _write_file(worktree, _spread_path(IGNORED_DIR, i, 1000), "ignored\n")
+
+    with open(shape_path, "w") as f:
+        json.dump(shape._asdict(), f)
+
+    return worktree
+
+
+def tracked_path(shape, i):
+    """returns the path of the tracked file ``i``, its directories being
+    the ``depth`` lowest digits of ``i`` in base ``fanout``"""
+
+    dirs = []
+    position = i
+    for _ in range(shape.depth):
+        position, digit = divmod(position, shape.fanout)
+        dirs.append("d{}".format(digit))
+
+    return "/".join(dirs + ["f{}.txt".format(i)])
+
+
+def _spread_path(top_dir, i, files_per_dir):
+    return "{}/d{}/f{}.txt".format(top_dir, i // files_per_dir, i)
+
+
+def _write_file(worktree, rel_path, content):
+    path = os.path.join(worktree, rel_path)
+    try:
+        f = open(path, "w")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, "w")
+
+    with f:
+        f.write(content)
+
+
+def _read_shape(shape_path):
+    try:
+        with open(shape_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _git(worktree, *args):
+    subprocess.run(["git"] + GIT_IDENTITY + list(args), cwd=worktree, check=True)
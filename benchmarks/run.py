@@ -0,0 +1,162 @@
+"""
+Runs the benchmarks and writes their results as JSON
+
+    python -m benchmarks.run --shapes wide-10k,deep-10k --repeat 5 --output results.json
+
+For each shape, the timed cases are:
+    - ``git status``: ``git status --porcelain=v2`` as a baseline
+    - ``check``: ``check_status_and_get_commit_info()`` of each engine
+    - ``phase:<name>``: each phase of the check of each engine, from its ``timings``
+The first run of each case warms up the caches and isn't recorded.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import gitchecker
+from gitchecker.gitchecker import ENGINES
+
+from benchmarks.generate import generate_repo, SHAPES
+
+
+RESULTS_VERSION = 1
+DEFAULT_SHAPES = ["wide-10k", "deep-10k", "untracked-10k", "ignored-10k", "loose-10k"]
+DEFAULT_REPEAT = 5
+
+# the results are compared across engines, the status of the repository doesn't matter
+_quiet_logger = logging.getLogger("benchmarks")
+_quiet_logger.addHandler(logging.NullHandler())
+_quiet_logger.propagate = False
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    engines = args.engines.split(",")
+    work_dir = os.path.abspath(args.work_dir)
+
+    results = []
+    for shape_name in args.shapes.split(","):
+        _log("generating {}".format(shape_name))
+        repo_path = generate_repo(os.path.join(work_dir, shape_name), SHAPES[shape_name])
+
+        for case, engine, function in _cases(repo_path, engines):
+            _log("timing {} {} {}".format(shape_name, case, engine or ""))
+            for phase, samples in _time(function, args.repeat).items():
+                results.append(_result(shape_name, phase or case, engine, samples))
+
+    output = {"version": RESULTS_VERSION, "environment": _environment(), "results": results}
+    if args.output == "-":
+        json.dump(output, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmarks gitchecker on generated repositories")
+    parser.add_argument("--shapes", default=",".join(DEFAULT_SHAPES),
+                        help="comma separated shapes, of: {}".format(", ".join(SHAPES)))
+    parser.add_argument("--engines", default=",".join(ENGINES),
+                        help="comma separated engines (default: all)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="recorded runs of each case")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(),
+                                                           "gitchecker-benchmarks"),
+                        help="directory of the generated repositories, reused across runs")
+    parser.add_argument("--output", default="-", help="JSON results file (default: stdout)")
+
+    return parser.parse_args(argv)
+
+
+def _cases(repo_path, engines):
+    """yields the ``(case, engine, function)`` of each case, ``function``
+    returning the ``{phase: seconds}`` of its phases or ``None``"""
+
+    yield "git status", None, lambda: _git_status(repo_path)
+
+    for engine in engines:
+        yield "check", engine, lambda engine=engine: _check(repo_path, engine)
+        yield "phases", engine, lambda engine=engine: _phases(repo_path, engine)
+
+
+def _time(function, repeat):
+    """returns the ``{phase: [seconds]}`` of ``repeat`` runs of ``function``,
+    the phase of the whole run being ``None``"""
+
+    function()
+
+    samples = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        phases = function()
+        if phases is None:
+            samples.setdefault(None, []).append(time.perf_counter() - start)
+        else:
+            for phase, seconds in phases.items():
+                samples.setdefault("phase:" + phase, []).append(seconds)
+
+    return samples
+
+
+def _result(shape_name, case, engine, samples):
+    return {"shape": shape_name,
+            "case": case,
+            "engine": engine,
+            "seconds": samples,
+            "min": min(samples),
+            "median": statistics.median(samples)}
+
+
+def _git_status(repo_path):
+    subprocess.run(["git", "status", "--porcelain=v2", "--untracked-files=all"],
+                   cwd=repo_path, stdout=subprocess.DEVNULL, check=True)
+
+
+def _check(repo_path, engine):
+    gitchecker.check_status_and_get_commit_info(repo_path,
+                                                warning_instead_of_error=True,
+                                                logger=_quiet_logger,
+                                                engine=engine)
+
+
+def _phases(repo_path, engine):
+    phases = {}
+
+    def on_timings(_, git_status):
+        phases.update((timing.phase, timing.seconds) for timing in git_status.timings)
+
+    gitchecker.check_status_and_get_commit_info(repo_path,
+                                                warning_instead_of_error=True,
+                                                logger=_quiet_logger,
+                                                engine=engine,
+                                                timings_callback=on_timings)
+
+    return phases
+
+
+def _environment():
+    git_version = subprocess.run(["git", "--version"], stdout=subprocess.PIPE,
+                                 universal_newlines=True).stdout.strip()
+
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_version,
+            "cpu_count": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def _log(msg):
+    print(msg, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,10 @@ setup(
     url="http://github.com/Crul/gitchecker",
     packages=find_packages("src"),
     package_dir={"": "src"},
+    python_requires=">=3.7",
     install_requires=["gitpython"],
+    entry_points={"console_scripts": ["gitchecker=gitchecker.cli:main",
+                                      "gitchecker-daemon=gitchecker.daemon:main"]},
     setup_requires=["pytest-runner"],
     tests_require=["pytest", "pytest-cov", "pytest-pep8"],
     classifiers=(
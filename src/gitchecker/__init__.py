@@ -8,8 +8,80 @@ any pending changes in GIT repository status and returns the last commit info:
     - authored_datetime (datetime): author datetime
     - committer (string): committer name
     - committed_datetime (datetime): committer datetime
+    - upstream, ahead, behind: with ``ahead_behind=True``, the upstream
+      branch and how many commits ``HEAD`` is ahead of and behind it
 By default it raises an ``Exception`` if there are any pending changes but
 it can be configured to only show a warning instead.
+
+``gitchecker.check_status_and_get_commit_info_async()`` is the asyncio
+version and ``gitchecker.check_many()`` checks many repositories concurrently and
+returns the ``CommitInfo`` or the error of each one.
+``gitchecker.iter_changes()`` yields the pending changes one by one, as
+they are read, instead of counting them.
+``gitchecker.get_commit_info()`` only returns the last commit info, read
+in-process from the ``.git`` directory, and
+``gitchecker.get_refs_commit_info()`` the commit info of many branches and tags.
+``gitchecker.compile_path_matcher()`` compiles the ``ignore_files_regex``
+patterns once, to reuse them across checks.
+``gitchecker.repo_pool`` keeps the GitPython handles of the last checked
+repositories open, ``gitchecker.repo_pool.close()`` closes them.
+``gitchecker.status_memo`` holds the statuses memoized with ``memoize=True``.
+``gitchecker.daemon.check_status_and_get_commit_info()`` asks the
+``gitchecker-daemon`` process for the status, to share it between processes.
+
+The public names and the submodules (e.g. ``gitchecker.daemon``) are
+imported on first use, so ``import gitchecker`` is fast: GitPython is only
+imported by the ``"gitpython"`` engine and ``asyncio`` by the asyncio
+version.
 """
 
-from gitchecker.gitchecker import check_status_and_get_commit_info
+import importlib
+
+
+# {public name: module}
+_EXPORTS = {
+    "check_many": "gitchecker.gitchecker",
+    "check_status_and_get_commit_info": "gitchecker.gitchecker",
+    "check_status_and_get_commit_info_async": "gitchecker.gitchecker",
+    "iter_changes": "gitchecker.gitchecker",
+    "compile_path_matcher": "gitchecker.matcher",
+    "PathMatcher": "gitchecker.matcher",
+    "get_commit_info": "gitchecker.native",
+    "get_refs_commit_info": "gitchecker.porcelain",
+    "status_memo": "gitchecker.memo",
+    "StatusMemo": "gitchecker.memo",
+    "repo_pool": "gitchecker.pool",
+    "RepoPool": "gitchecker.pool",
+    "watch": "gitchecker.watcher",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        return _import_submodule(name)
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def _import_submodule(name):
+    """returns the ``gitchecker.<name>`` submodule, imported like
+    ``import gitchecker.<name>`` does"""
+
+    module_name = "{}.{}".format(__name__, name)
+    try:
+        return importlib.import_module(module_name)
+    except ModuleNotFoundError as ex:
+        # a module missing inside the submodule is a real error
+        if ex.name != module_name:
+            raise
+
+    raise AttributeError("module 'gitchecker' has no attribute '{}'".format(name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,6 @@
+import sys
+
+from gitchecker.cli import main
+
+
+sys.exit(main())
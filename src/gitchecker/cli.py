@@ -0,0 +1,169 @@
+"""
+``gitchecker`` command line, also run by ``python -m gitchecker``
+
+It takes the options of ``check_status_and_get_commit_info()``, prints the
+last commit info as plain ``name: value`` lines or as JSON and reports the
+status with its exit code, without raising. The default engine is the
+``"native"`` one, which doesn't run ``git`` nor import GitPython, as the
+start-up time dominates the checks of hooks and CI steps.
+"""
+
+import argparse
+import sys
+
+from gitchecker.gitchecker import (_get_git_status, _get_status_msg, _is_error, ENGINES,
+                                   NATIVE_ENGINE, PORCELAIN_ENGINE)
+from gitchecker.status import CommitInfo, UPSTREAM_FIELDS
+
+
+EXIT_OK = 0
+EXIT_DIRTY = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_TIMEOUT = 4
+
+PLAIN_FORMAT = "plain"
+JSON_FORMAT = "json"
+
+
+def main(argv=None):
+    """runs the command line with ``argv`` (``sys.argv[1:]`` by default)
+    and returns its exit code"""
+
+    args = _parse_args(argv)
+
+    try:
+        git_status = _get_git_status(args.repo_path,
+                                     args.ignore_files_regex,
+                                     args.ignore_untracked_files,
+                                     engine=args.engine,
+                                     stat_cache=args.stat_cache,
+                                     fail_fast=args.fail_fast and not args.warning_instead_of_error,
+                                     timings=args.timings,
+                                     recurse_submodules=args.recurse_submodules,
+                                     paths=args.paths,
+                                     ahead_behind=args.ahead_behind,
+                                     timeout=args.timeout)
+    except Exception as ex:
+        _print_error("ERROR: {}".format(ex))
+        return EXIT_ERROR
+
+    if args.format == JSON_FORMAT:
+        _print_json(git_status)
+    else:
+        _print_plain(git_status, args.timings)
+
+    if not git_status.total_changes and not git_status.timed_out:
+        return EXIT_OK
+
+    if not _is_error(git_status, args.warning_instead_of_error, args.warning_on_timeout):
+        _print_error("WARNING: {}".format(_get_status_msg(git_status)))
+        return EXIT_OK
+
+    _print_error("ERROR: {}".format(_get_status_msg(git_status)))
+    if git_status.total_changes and not args.warning_instead_of_error:
+        return EXIT_DIRTY
+
+    return EXIT_TIMEOUT
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="gitchecker",
+        description="Checks if there are pending changes in a GIT repository "
+                    "and prints its last commit info.",
+        epilog="Exit codes: {} clean (or only warned), {} pending changes, {} usage error, "
+               "{} other errors, {} timed out."
+               .format(EXIT_OK, EXIT_DIRTY, EXIT_USAGE, EXIT_ERROR, EXIT_TIMEOUT))
+    parser.add_argument("repo_path", nargs="?", default="",
+                        help="GIT repository path (default: current directory)")
+    parser.add_argument("-w", "--warning-instead-of-error", action="store_true",
+                        help="only warn about pending changes, exiting with {}".format(EXIT_OK))
+    parser.add_argument("-u", "--ignore-untracked-files", action="store_true",
+                        help="ignore the untracked files")
+    parser.add_argument("-i", "--ignore-files-regex", action="append", metavar="PATTERN",
+                        help="ignore the paths matching the regex (or \"glob:\" prefixed glob), "
+                             "can be repeated")
+    parser.add_argument("-p", "--path", action="append", dest="paths", metavar="PATH",
+                        help="only check this file or directory, relative to the repository "
+                             "root, can be repeated")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default=NATIVE_ENGINE,
+                        help="how the status is read (default: %(default)s; use '{}' with "
+                             "clean/smudge filters or core.autocrlf)".format(PORCELAIN_ENGINE))
+    parser.add_argument("--stat-cache", action="store_true",
+                        help="record the results in .git/gitchecker-cache "
+                             "('{}' engine, without --path)".format(NATIVE_ENGINE))
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first pending change")
+    parser.add_argument("--recurse-submodules", action="store_true",
+                        help="also check the initialized submodules, recursively")
+    parser.add_argument("--ahead-behind", action="store_true",
+                        help="also print the upstream branch and the commits ahead of and "
+                             "behind it")
+    parser.add_argument("-t", "--timeout", type=float, default=None, metavar="SECONDS",
+                        help="stop the check after this time, reporting the changes seen so far")
+    parser.add_argument("--warning-on-timeout", action="store_true",
+                        help="only warn about a timeout, exiting with {} unless there are "
+                             "pending changes".format(EXIT_OK))
+    parser.add_argument("--timings", action="store_true",
+                        help="also print the time and count of each phase")
+    parser.add_argument("-f", "--format", choices=[PLAIN_FORMAT, JSON_FORMAT],
+                        default=PLAIN_FORMAT, help="output format (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+    if args.stat_cache and args.engine != NATIVE_ENGINE:
+        parser.error("--stat-cache requires --engine {}".format(NATIVE_ENGINE))
+    if args.stat_cache and args.paths:
+        parser.error("--stat-cache can't be combined with --path")
+
+    return args
+
+
+def _print_plain(git_status, timings=False):
+    # not read before a timeout
+    for name, value in zip(CommitInfo._fields, git_status.commit_info or ()):
+        if name in UPSTREAM_FIELDS and value is None:
+            continue
+        print("{}: {}".format(name, _format_value(value)))
+
+    if timings:
+        for timing in git_status.timings:
+            print("timing.{}: {:.6f}s ({})".format(timing.phase, timing.seconds, timing.count))
+
+
+def _print_json(git_status):
+    import json
+
+    print(json.dumps(_status_dict(git_status), indent=2))
+
+
+def _status_dict(git_status):
+    status = git_status._asdict()
+    if git_status.commit_info is not None:
+        status["commit_info"] = {name: _format_value(value)
+                                 for name, value in git_status.commit_info._asdict().items()}
+    if git_status.completed_phases is not None:
+        status["completed_phases"] = list(git_status.completed_phases)
+    else:
+        del status["completed_phases"]
+
+    if git_status.timings is not None:
+        status["timings"] = [timing._asdict() for timing in git_status.timings]
+    else:
+        del status["timings"]
+
+    if git_status.submodules is not None:
+        status["submodules"] = {path: _status_dict(submodule_status)
+                                for path, submodule_status in git_status.submodules.items()}
+    else:
+        del status["submodules"]
+
+    return status
+
+
+def _format_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _print_error(msg):
+    print(msg, file=sys.stderr)
@@ -0,0 +1,403 @@
+"""
+Ahead/behind counts of ``HEAD`` against the upstream of its branch
+
+The commits reachable from only one of the two tips are counted by walking
+their history down from both at once, highest generation first, until
+every commit left to visit is reachable from both. The parents, generation
+numbers and commit dates are read from the memory-mapped commit-graph
+(``objects/info/commit-graph`` or the layers of a
+``objects/info/commit-graphs`` chain), so a commit is a binary search and
+a few fixed-size records instead of an inflated and parsed object. The
+commits missing from it (newer than the graph, or all of them without any)
+are parsed from the objects and walked in commit date order, like ``git``
+does. A ``deadline`` is checked before each commit of the walk.
+
+See https://git-scm.com/docs/gitformat-commit-graph
+"""
+
+import heapq
+import itertools
+import mmap
+import os
+import struct
+
+from gitchecker.deadline import NO_DEADLINE
+from gitchecker.objects import HASH_SIZE, ObjectStore
+from gitchecker.repository import find_repository, read_head, resolve_ref
+
+
+GRAPH_SIGNATURE = b"CGPH"
+GRAPH_HEADER = struct.Struct(">4sBBBB")
+GRAPH_CHUNK = struct.Struct(">4sQ")
+GRAPH_FANOUT = struct.Struct(">256L")
+GRAPH_COMMIT = struct.Struct(">LLQ")
+GRAPH_EDGE = struct.Struct(">L")
+
+OID_FANOUT_CHUNK = b"OIDF"
+OID_LOOKUP_CHUNK = b"OIDL"
+COMMIT_DATA_CHUNK = b"CDAT"
+EXTRA_EDGES_CHUNK = b"EDGE"
+
+PARENT_NONE = 0x70000000
+PARENT_EXTRA_EDGES = 0x80000000
+LAST_EDGE = 0x80000000
+COMMIT_DATE_BITS = 34
+
+# the commits out of the graph are walked first, as none of its commits can reach them
+GENERATION_INFINITY = 0xFFFFFFFF
+
+HEADS_PREFIX = "refs/heads/"
+SHORTENED_REF_PREFIXES = ("refs/heads/", "refs/remotes/")
+
+AHEAD = 1
+BEHIND = 2
+COMMON = AHEAD | BEHIND
+
+
+def get_upstream_info(repo_path="", deadline=NO_DEADLINE):
+    """returns the short name of the upstream of the current branch (e.g.
+    ``"origin/master"``) and how many commits ``HEAD`` is ahead of and behind
+    it; ``(None, None, None)`` if ``HEAD`` is detached or its branch doesn't
+    track any, and ``(upstream, None, None)`` if the upstream ref is gone.
+    ``DeadlineExceeded`` is raised if the ``deadline`` expires first"""
+
+    repo = find_repository(repo_path)
+    branch_ref, head_sha = read_head(repo)
+    upstream_ref = _find_upstream_ref(repo.config, branch_ref) if branch_ref else None
+    if upstream_ref is None:
+        return None, None, None
+
+    upstream = _shorten_ref(upstream_ref)
+    try:
+        upstream_sha = resolve_ref(repo, upstream_ref)
+    except Exception:
+        return upstream, None, None
+
+    objects_dir = os.path.join(repo.common_dir, "objects")
+    store = ObjectStore(objects_dir)
+    graph = CommitGraph(objects_dir)
+    try:
+        source = _CommitSource(store, graph, _read_shallow(repo.common_dir))
+        ahead, behind = count_ahead_behind(source, head_sha, upstream_sha, deadline)
+    finally:
+        graph.close()
+        store.close()
+
+    return upstream, ahead, behind
+
+
+def count_ahead_behind(source, sha, other_sha, deadline=NO_DEADLINE):
+    """returns the number of commits reachable from ``sha`` but not from
+    ``other_sha`` and the other way around, read from the ``_CommitSource``,
+    checking the ``deadline`` before each commit"""
+
+    flags = {}
+    visited = {}
+    queue = []
+    order = itertools.count()
+    interesting = 0
+    # of the commits out of the graph visited with a single flag
+    oldest_date = None
+
+    def push(node, node_flags):
+        nonlocal interesting
+        flags[node] = node_flags
+        generation, date = source.sort_key(node)
+        heapq.heappush(queue, (-generation, -date, next(order), node, node_flags))
+        interesting += node_flags != COMMON
+
+    head, upstream = source.resolve(sha), source.resolve(other_sha)
+    push(head, AHEAD)
+    if upstream in flags:
+        flags[upstream] = COMMON
+    else:
+        push(upstream, BEHIND)
+
+    # stops when all the commits left are reachable from both tips, their
+    # ancestors too; a commit is only visited again if it gets new flags
+    # after it was, as the commits out of the graph are only ordered by date
+    # and a parent can have the date of its child: they are walked until
+    # older than the ones visited with a single flag
+    while interesting or _may_have_descendants(queue, oldest_date):
+        deadline.check()
+        negative_generation, negative_date, _, node, pushed_flags = heapq.heappop(queue)
+        interesting -= pushed_flags != COMMON
+        node_flags = flags[node]
+        if visited.get(node) == node_flags:
+            continue
+
+        visited[node] = node_flags
+        if node_flags != COMMON and -negative_generation == GENERATION_INFINITY:
+            oldest_date = -negative_date if oldest_date is None \
+                else min(oldest_date, -negative_date)
+
+        for parent in source.parents(node):
+            parent_flags = flags.get(parent, 0)
+            if parent_flags | node_flags != parent_flags:
+                push(parent, parent_flags | node_flags)
+
+    ahead = sum(1 for node_flags in flags.values() if node_flags == AHEAD)
+    behind = sum(1 for node_flags in flags.values() if node_flags == BEHIND)
+
+    return ahead, behind
+
+
+def _may_have_descendants(queue, date):
+    """whether the next commit of the walk may be a descendant of a commit
+    out of the graph with ``date``: it isn't in the graph either (the graph
+    commits can't reach them) and it isn't older"""
+
+    return (date is not None and bool(queue) and
+            queue[0][0] == -GENERATION_INFINITY and -queue[0][1] >= date)
+
+
+def _find_upstream_ref(config, branch_ref):
+    """returns the ref the branch ``branch_ref`` tracks, like
+    ``git rev-parse @{upstream}``, or ``None``"""
+
+    branch = branch_ref[len(HEADS_PREFIX):]
+    remote = config.get("branch.{}.remote".format(branch))
+    merge = config.get("branch.{}.merge".format(branch))
+    if not remote or not merge:
+        return None
+
+    if remote == ".":
+        return merge
+
+    fetch_refspec = config.get("remote.{}.fetch".format(remote))
+    if fetch_refspec:
+        return _map_refspec(fetch_refspec, merge)
+
+    return "refs/remotes/{}/{}".format(remote, merge[len(HEADS_PREFIX):])
+
+
+def _map_refspec(refspec, ref):
+    """returns the destination of ``ref`` in the ``src:dst`` refspec, which
+    can have a ``*`` in both sides, or ``None`` if it doesn't match"""
+
+    source, _, destination = refspec.lstrip("+").partition(":")
+    if "*" not in source:
+        return destination if source == ref else None
+
+    prefix, _, suffix = source.partition("*")
+    if not ref.startswith(prefix) or not ref.endswith(suffix) or \
+            len(ref) < len(prefix) + len(suffix):
+        return None
+
+    return destination.replace("*", ref[len(prefix):len(ref) - len(suffix)], 1)
+
+
+def _shorten_ref(ref):
+    for prefix in SHORTENED_REF_PREFIXES:
+        if ref.startswith(prefix):
+            return ref[len(prefix):]
+
+    return ref
+
+
+def _read_shallow(common_dir):
+    """returns the SHAs of the commits whose parents a shallow clone lacks"""
+
+    try:
+        with open(os.path.join(common_dir, "shallow")) as f:
+            return set(f.read().split())
+    except OSError:
+        return set()
+
+
+class _CommitSource:
+    """the parents and sort keys of the commits of the walk
+
+    A commit is its position in the ``CommitGraph`` if the graph has it,
+    otherwise its SHA, read from the ``ObjectStore``.
+    """
+
+    def __init__(self, store, graph, shallow=()):
+        self._store = store
+        self._graph = graph
+        self._shallow = shallow
+        # {sha: (parents, date)} of the commits read from the objects
+        self._parsed = {}
+
+    def resolve(self, sha):
+        position = self._graph.find(bytes.fromhex(sha))
+        return sha if position is None else position
+
+    def parents(self, node):
+        if isinstance(node, int):
+            return self._graph.parents(node)
+
+        return [self.resolve(parent) for parent in self._parse(node)[0]]
+
+    def sort_key(self, node):
+        if isinstance(node, int):
+            return self._graph.generation_and_date(node)
+
+        return GENERATION_INFINITY, self._parse(node)[1]
+
+    def _parse(self, sha):
+        parsed = self._parsed.get(sha)
+        if parsed is None:
+            commit = self._store.read_commit(sha)
+            parents = [] if sha in self._shallow else commit.parents
+            parsed = self._parsed[sha] = (parents, int(commit.committed_datetime.timestamp()))
+
+        return parsed
+
+
+class CommitGraph:
+    """the commit-graph file, or chain of files, of ``objects_dir``
+
+    The commits are numbered by their position in the graph (the layers of
+    a chain are concatenated, base first), the one the parents are recorded
+    with. A missing or unsupported graph is empty.
+    """
+
+    def __init__(self, objects_dir):
+        self._layers = []
+
+        info_dir = os.path.join(objects_dir, "info")
+        chain_dir = os.path.join(info_dir, "commit-graphs")
+        try:
+            with open(os.path.join(chain_dir, "commit-graph-chain")) as f:
+                paths = [os.path.join(chain_dir, "graph-{}.graph".format(graph_hash))
+                         for graph_hash in f.read().split()]
+        except OSError:
+            paths = [os.path.join(info_dir, "commit-graph")]
+
+        base_count = 0
+        for path in paths:
+            layer = _GraphFile.open(path, base_count)
+            if layer is None:
+                # the upper layers point to the commits of the missing one
+                break
+            self._layers.append(layer)
+            base_count += layer.count
+
+    def __len__(self):
+        return sum(layer.count for layer in self._layers)
+
+    def close(self):
+        for layer in self._layers:
+            layer.close()
+
+        self._layers = []
+
+    def find(self, binsha):
+        """returns the position of the commit ``binsha``, ``None`` if it's not in the graph"""
+
+        for layer in self._layers:
+            position = layer.find(binsha)
+            if position is not None:
+                return layer.base_count + position
+
+        return None
+
+    def parents(self, position):
+        return self._layer(position).parents(position)
+
+    def generation_and_date(self, position):
+        return self._layer(position).generation_and_date(position)
+
+    def _layer(self, position):
+        for layer in reversed(self._layers):
+            if position >= layer.base_count:
+                return layer
+
+        raise IndexError(position)
+
+
+class _GraphFile:
+    """a memory-mapped commit-graph file, a layer of the ``CommitGraph``
+    whose positions start at ``base_count``"""
+
+    def __init__(self, mapped, chunks, base_count=0):
+        self._mapped = mapped
+        self.base_count = base_count
+        self._fanout = GRAPH_FANOUT.unpack_from(mapped, chunks[OID_FANOUT_CHUNK])
+        self.count = self._fanout[-1]
+        self._oids_offset = chunks[OID_LOOKUP_CHUNK]
+        self._commits_offset = chunks[COMMIT_DATA_CHUNK]
+        self._edges_offset = chunks.get(EXTRA_EDGES_CHUNK)
+
+    @classmethod
+    def open(cls, path, base_count=0):
+        """returns the graph file at ``path``, ``None`` if it's missing or unsupported"""
+
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            signature, version, hash_version, chunk_count, _ = GRAPH_HEADER.unpack_from(mapped, 0)
+            chunks = dict(GRAPH_CHUNK.unpack_from(mapped, GRAPH_HEADER.size + i * GRAPH_CHUNK.size)
+                          for i in range(chunk_count))
+        except struct.error:
+            mapped.close()
+            return None
+
+        required = (OID_FANOUT_CHUNK, OID_LOOKUP_CHUNK, COMMIT_DATA_CHUNK)
+        if signature != GRAPH_SIGNATURE or version != 1 or hash_version != 1 or \
+                not all(chunk_id in chunks for chunk_id in required):
+            mapped.close()
+            return None
+
+        return cls(mapped, chunks, base_count)
+
+    def close(self):
+        self._mapped.close()
+
+    def find(self, binsha):
+        first_byte = binsha[0]
+        low = self._fanout[first_byte - 1] if first_byte else 0
+        high = self._fanout[first_byte]
+
+        while low < high:
+            middle = (low + high) // 2
+            oid_offset = self._oids_offset + middle * HASH_SIZE
+            oid = self._mapped[oid_offset:oid_offset + HASH_SIZE]
+            if oid < binsha:
+                low = middle + 1
+            elif oid > binsha:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def parents(self, position):
+        first, second, _ = self._commit(position)
+        if first == PARENT_NONE:
+            return []
+        if second == PARENT_NONE:
+            return [first]
+        if not second & PARENT_EXTRA_EDGES:
+            return [first, second]
+
+        # an octopus merge: the second and next parents are in the extra edges list
+        parents = [first]
+        edge_offset = self._edges_offset + (second & ~PARENT_EXTRA_EDGES) * GRAPH_EDGE.size
+        while True:
+            edge = GRAPH_EDGE.unpack_from(self._mapped, edge_offset)[0]
+            parents.append(edge & ~LAST_EDGE)
+            if edge & LAST_EDGE:
+                return parents
+            edge_offset += GRAPH_EDGE.size
+
+    def generation_and_date(self, position):
+        generation_and_date = self._commit(position)[2]
+        generation = generation_and_date >> COMMIT_DATE_BITS
+        date = generation_and_date & ((1 << COMMIT_DATE_BITS) - 1)
+
+        # graphs written without generation numbers have them all zero
+        return generation or GENERATION_INFINITY, date
+
+    def _commit(self, position):
+        # the commit data starts with the tree SHA
+        offset = (self._commits_offset +
+                  (position - self.base_count) * (HASH_SIZE + GRAPH_COMMIT.size) +
+                  HASH_SIZE)
+
+        return GRAPH_COMMIT.unpack_from(self._mapped, offset)
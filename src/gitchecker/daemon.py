@@ -0,0 +1,513 @@
+"""
+Status daemon: one process checks the repositories for many others
+
+``StatusDaemon`` listens on a local Unix socket (``gitchecker-daemon``
+runs one) and checks the repositories its clients ask for, keeping the
+warm GitPython handles of ``pool.repo_pool`` and the statuses memoized in
+``memo.status_memo`` unless a client asks ``memoize=False``. The same
+check asked by many clients at once (e.g. prefork workers at boot) runs
+only once, the rest wait for its result.
+
+``check_status_and_get_commit_info()`` has the params and the result of
+``gitchecker.check_status_and_get_commit_info()`` and asks the daemon over
+a persistent connection, reopened after a fork or a daemon restart. If no
+daemon is listening, the check is run in-process instead. The logging, the
+error raising and the ``timings_callback`` stay in the client.
+
+The requests and responses are lines of JSON. The socket is only
+accessible by its owner, in a directory no other user can modify, and the
+client only talks to a daemon run by the same user.
+"""
+
+import json
+import os
+import re
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+from gitchecker.gitchecker import (_check_git_status, _get_git_status, _memo_key,
+                                   GITPYTHON_ENGINE)
+from gitchecker.matcher import compile_path_matcher
+from gitchecker.status import CommitInfo, GitStatus, PhaseTiming
+
+
+SOCKET_ENV_VAR = "GITCHECKER_SOCKET"
+SOCKET_MODE = 0o600
+SOCKET_DIR_MODE = 0o700
+CONNECT_TIMEOUT = 1.0
+
+# the check options a client can send, the ``_get_git_status()`` keyword params
+OPTIONS = ("ignore_untracked_files", "engine", "stat_cache", "fail_fast", "timings",
+           "recurse_submodules", "paths", "memoize", "ahead_behind", "timeout")
+
+DATETIME_FIELDS = ("authored_datetime", "committed_datetime")
+
+
+def check_status_and_get_commit_info(repo_path="",
+                                     warning_instead_of_error=False,
+                                     ignore_untracked_files=False,
+                                     ignore_files_regex=None,
+                                     logger=None,
+                                     engine=GITPYTHON_ENGINE,
+                                     stat_cache=False,
+                                     fail_fast=False,
+                                     timings_callback=None,
+                                     recurse_submodules=False,
+                                     paths=None,
+                                     memoize=None,
+                                     ahead_behind=False,
+                                     timeout=None,
+                                     warning_on_timeout=False,
+                                     socket_path=None):
+
+    """``gitchecker.check_status_and_get_commit_info()`` asking the status
+    to the daemon listening at ``socket_path``, with the same params and
+    result
+
+    Args:
+        socket_path (string): Unix socket of the daemon. By default, the
+            ``GITCHECKER_SOCKET`` environment variable or
+            ``default_socket_path()``.
+        memoize (bool): See ``gitchecker.check_status_and_get_commit_info()``.
+            By default, the daemon's ``memoize`` (``False`` in-process).
+        The rest of the params are the ones of
+        ``gitchecker.check_status_and_get_commit_info()``. If no daemon is
+        listening, or ``ignore_files_regex`` has compiled regexes with
+        flags, the check is run in-process.
+    """
+
+    options = {"ignore_untracked_files": ignore_untracked_files,
+               "engine": engine,
+               "stat_cache": stat_cache,
+               "fail_fast": fail_fast and not warning_instead_of_error,
+               "timings": timings_callback is not None,
+               "recurse_submodules": recurse_submodules,
+               "paths": paths,
+               "ahead_behind": ahead_behind,
+               "timeout": timeout}
+    # left to the daemon unless set
+    if memoize is not None:
+        options["memoize"] = memoize
+
+    git_status = None
+    patterns = _patterns(ignore_files_regex)
+    if patterns is not None:
+        client = get_client(socket_path or default_socket_path())
+        git_status = client.get_git_status(os.path.abspath(repo_path or os.curdir),
+                                           patterns,
+                                           options)
+
+    if git_status is None:
+        git_status = _get_git_status(repo_path, ignore_files_regex, **options)
+
+    if timings_callback is not None:
+        timings_callback(repo_path, git_status)
+
+    return _check_git_status(git_status, warning_instead_of_error, logger, warning_on_timeout)
+
+
+def default_socket_path():
+    """returns the ``GITCHECKER_SOCKET`` environment variable or a socket
+    of the user in ``XDG_RUNTIME_DIR`` (without it, in a directory of the
+    user in the shared temporary directory)"""
+
+    socket_path = os.environ.get(SOCKET_ENV_VAR)
+    if socket_path:
+        return socket_path
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "gitchecker-{}.sock".format(os.getuid()))
+
+    # created private by the daemon
+    return os.path.join(tempfile.gettempdir(), "gitchecker-{}".format(os.getuid()),
+                        "gitchecker.sock")
+
+
+def serve(socket_path=None, memoize=True):
+    """runs a ``StatusDaemon`` until it's interrupted"""
+
+    with StatusDaemon(socket_path or default_socket_path(), memoize) as daemon:
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    """``gitchecker-daemon`` command line"""
+
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="gitchecker-daemon",
+        description="Checks the GIT repositories that gitchecker clients ask for "
+                    "over a Unix socket.")
+    parser.add_argument("-s", "--socket", default=None, metavar="PATH",
+                        help="Unix socket path (default: ${} or {})"
+                        .format(SOCKET_ENV_VAR, default_socket_path()))
+    parser.add_argument("--no-memoize", action="store_true",
+                        help="don't memoize the statuses of the requests not setting it")
+    args = parser.parse_args(argv)
+
+    serve(args.socket, memoize=not args.no_memoize)
+
+    return 0
+
+
+class StatusDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """server of the status checks of its clients, see the module doc
+
+    Args:
+        socket_path (string): Unix socket to listen at. Its directory is
+            created, only accessible by the current user, if missing, and
+            it can't be modifiable by other users. A stale socket of the
+            current user, left by a daemon that didn't stop cleanly, is
+            replaced.
+        memoize (bool): The ``memoize`` param (see
+            ``check_status_and_get_commit_info()``) of the requests that
+            don't set it, the clients' one is always honored.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, memoize=True):
+        _make_socket_dir(socket_path)
+        _remove_stale_socket(socket_path)
+        self.socket_path = socket_path
+        self.memoize = memoize
+        self._in_flight = _InFlight()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+        # the socket is created with the umask, it's restricted before listening
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler,
+                                               bind_and_activate=False)
+        try:
+            self.server_bind()
+            os.chmod(socket_path, SOCKET_MODE)
+            self.server_activate()
+        except BaseException:
+            self.server_close()
+            raise
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+        # the clients reconnect, to the next daemon or checking in-process
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def add_connection(self, connection):
+        with self._connections_lock:
+            self._connections.add(connection)
+
+    def remove_connection(self, connection):
+        with self._connections_lock:
+            self._connections.discard(connection)
+
+    def get_git_status(self, repo_path, patterns, options):
+        """returns the ``GitStatus`` of a request, running the check unless
+        an identical one is already running"""
+
+        options = {name: value for name, value in options.items() if name in OPTIONS}
+        options.setdefault("memoize", self.memoize)
+        if options.get("paths") is not None and not isinstance(options["paths"], str):
+            options["paths"] = tuple(options["paths"])
+
+        ignore_files_regex = compile_path_matcher(patterns)
+        key = _memo_key(repo_path, ignore_files_regex, *sorted(options.items()))
+
+        return self._in_flight.run(key, lambda: _get_git_status(repo_path,
+                                                                ignore_files_regex,
+                                                                **options))
+
+    def respond(self, line):
+        """returns the response line to the request ``line``"""
+
+        try:
+            request = json.loads(line.decode())
+            git_status = self.get_git_status(request["repo_path"],
+                                             request["patterns"],
+                                             request["options"])
+            response = {"status": _encode_status(git_status)}
+        except Exception as ex:
+            error_type = "ValueError" if isinstance(ex, ValueError) else "Exception"
+            response = {"error": str(ex), "error_type": error_type}
+
+        return _dump_line(response)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.server.add_connection(self.connection)
+        try:
+            # a connection is kept open for many requests
+            for line in self.rfile:
+                self.wfile.write(self.server.respond(line))
+        finally:
+            self.server.remove_connection(self.connection)
+
+
+class _InFlight:
+    """runs the calls of the same key once at a time, the ones made while
+    it's running get its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self._calls[key] = Future()
+
+        if is_owner:
+            try:
+                future.set_result(func())
+            except BaseException as ex:
+                future.set_exception(ex)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+
+        return future.result()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(socket_path):
+    """returns the process-wide ``DaemonClient`` of ``socket_path``"""
+
+    with _clients_lock:
+        client = _clients.get(socket_path)
+        if client is None:
+            client = _clients[socket_path] = DaemonClient(socket_path)
+
+        return client
+
+
+class DaemonClient:
+    """persistent connection to the daemon at ``socket_path``, opened on
+    first use and again after a fork or when the daemon closed it"""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def get_git_status(self, repo_path, patterns, options):
+        """returns the ``GitStatus`` checked by the daemon, ``None`` if
+        there isn't any daemon listening
+
+        Raises:
+            ValueError, Exception: The errors of the check in the daemon.
+        """
+
+        request = _dump_line({"repo_path": repo_path, "patterns": patterns, "options": options})
+        with self._lock:
+            line = self._send(request)
+
+        if line is None:
+            return None
+
+        response = json.loads(line.decode())
+        if "error" in response:
+            error_type = ValueError if response["error_type"] == "ValueError" else Exception
+            raise error_type(response["error"])
+
+        return _decode_status(response["status"])
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _send(self, request):
+        # a connection opened before a restart of the daemon fails once
+        for _ in range(2):
+            try:
+                stream = self._connect()
+                stream.write(request)
+                stream.flush()
+                line = stream.readline()
+                if line:
+                    return line
+            except OSError:
+                pass
+
+            self._close()
+
+        return None
+
+    def _connect(self):
+        if self._file is not None and self._pid == os.getpid():
+            return self._file
+
+        # the connection of the parent process isn't shared with the child
+        self._close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(self.socket_path)
+            # another user could listen at the path, e.g. in a shared directory
+            if _peer_uid(sock, self.socket_path) != os.getuid():
+                raise PermissionError("The daemon at '{}' isn't run by the current user"
+                                      .format(self.socket_path))
+            sock.settimeout(None)
+            self._file = sock.makefile("rwb")
+        finally:
+            # the file keeps its own reference to the socket
+            sock.close()
+
+        self._pid = os.getpid()
+
+        return self._file
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+        self._file = None
+
+
+def _peer_uid(sock, socket_path):
+    """returns the user id of the process at the other end of the
+    connected ``sock``, the owner of the socket file without
+    ``SO_PEERCRED`` (not Linux)"""
+
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid
+
+    return os.stat(socket_path).st_uid
+
+
+def _make_socket_dir(socket_path):
+    """creates the directory of ``socket_path`` if missing and checks that
+    no other user can replace the socket in it"""
+
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_dir, mode=SOCKET_DIR_MODE, exist_ok=True)
+
+    st = os.stat(socket_dir)
+    # a sticky directory, like /tmp, only lets the owners remove their files
+    is_shared = st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not st.st_mode & stat.S_ISVTX
+    if st.st_uid not in (0, os.getuid()) or is_shared:
+        raise Exception("The socket directory '{}' can be modified by other users"
+                        .format(socket_dir))
+
+
+def _remove_stale_socket(socket_path):
+    try:
+        st = os.lstat(socket_path)
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise Exception("'{}' isn't a socket of the current user".format(socket_path))
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+    else:
+        raise Exception("A daemon is already listening at '{}'".format(socket_path))
+    finally:
+        sock.close()
+
+
+def _patterns(ignore_files_regex):
+    """returns the ``ignore_files_regex`` patterns as JSON values, ``None``
+    if some compiled regex can't be sent as its source"""
+
+    if not ignore_files_regex:
+        return []
+
+    if isinstance(ignore_files_regex, (str, re.Pattern)):
+        ignore_files_regex = [ignore_files_regex]
+    elif hasattr(ignore_files_regex, "patterns"):
+        ignore_files_regex = ignore_files_regex.patterns
+
+    default_flags = re.compile("").flags
+    patterns = []
+    for pattern in ignore_files_regex:
+        if isinstance(pattern, re.Pattern):
+            if pattern.flags != default_flags:
+                return None
+            pattern = pattern.pattern
+        patterns.append(pattern)
+
+    return patterns
+
+
+def _dump_line(value):
+    return json.dumps(value, separators=(",", ":")).encode() + b"\n"
+
+
+def _encode_status(git_status):
+    status = git_status._asdict()
+    if git_status.commit_info is not None:
+        status["commit_info"] = {name: _encode_datetime(value) if name in DATETIME_FIELDS
+                                 else value
+                                 for name, value in git_status.commit_info._asdict().items()}
+    if git_status.timings is not None:
+        status["timings"] = [list(timing) for timing in git_status.timings]
+    if git_status.submodules is not None:
+        status["submodules"] = {path: _encode_status(submodule_status)
+                                for path, submodule_status in git_status.submodules.items()}
+
+    return status
+
+
+def _decode_status(status):
+    status = dict(status)
+    if status["commit_info"] is not None:
+        status["commit_info"] = CommitInfo(**{
+            name: _decode_datetime(value) if name in DATETIME_FIELDS else value
+            for name, value in status["commit_info"].items()})
+    if status["completed_phases"] is not None:
+        status["completed_phases"] = tuple(status["completed_phases"])
+    if status["timings"] is not None:
+        status["timings"] = tuple(PhaseTiming(*timing) for timing in status["timings"])
+    if status["submodules"] is not None:
+        status["submodules"] = {path: _decode_status(submodule_status)
+                                for path, submodule_status in status["submodules"].items()}
+
+    return GitStatus(**status)
+
+
+def _encode_datetime(value):
+    """``[timestamp, UTC offset seconds]`` of an aware ``datetime``"""
+
+    return [value.timestamp(), value.utcoffset().total_seconds()]
+
+
+def _decode_datetime(value):
+    timestamp, offset = value
+
+    return datetime.fromtimestamp(timestamp, timezone(timedelta(seconds=offset)))
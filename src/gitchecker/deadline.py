@@ -0,0 +1,129 @@
+"""
+Deadline of a status check with a ``timeout``
+
+The engines check the ``Deadline`` as they go, between the entries of the
+index and the directories of the working tree, and the ``git`` processes
+still running when it expires are killed, so ``DeadlineExceeded`` stops
+the check soon after it. ``PhaseLog`` records which phases of the check
+completed before. ``NO_DEADLINE`` is the never-expiring deadline of the
+checks without a ``timeout``.
+"""
+
+import subprocess
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._end = time.monotonic() + timeout
+
+    def __bool__(self):
+        return True
+
+    def remaining(self):
+        """returns the seconds left, 0 once expired"""
+
+        return max(0, self._end - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self._end
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("The check timed out after {}s".format(self.timeout))
+
+    def checked(self, iterable):
+        """yields the items of ``iterable``, checking the deadline before each one"""
+
+        for item in iterable:
+            self.check()
+            yield item
+
+    def communicate(self, proc):
+        """returns the ``(stdout, stderr)`` of the ``Popen`` process,
+        killing it if it doesn't end in time"""
+
+        try:
+            return proc.communicate(timeout=self.remaining())
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            self.check()
+            raise
+
+    def kill_on_expiry(self, proc):
+        """kills the ``Popen`` process if it's still running when the deadline
+        expires, unless the returned timer is cancelled before"""
+
+        timer = threading.Timer(self.remaining(), proc.kill)
+        timer.daemon = True
+        timer.start()
+
+        return timer
+
+
+class _NoDeadline:
+
+    def __bool__(self):
+        return False
+
+    def remaining(self):
+        return None
+
+    def expired(self):
+        return False
+
+    def check(self):
+        pass
+
+    def checked(self, iterable):
+        return iterable
+
+    def communicate(self, proc):
+        return proc.communicate()
+
+    def kill_on_expiry(self, proc):
+        return _NO_TIMER
+
+
+class _NoTimer:
+
+    def cancel(self):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+NO_DEADLINE = _NoDeadline()
+
+
+class PhaseLog:
+    """``Timings`` (or ``NO_TIMINGS``) also recording the phases completed
+    so far, even when the check isn't timed"""
+
+    def __init__(self, timings):
+        self.completed = []
+        self._timings = timings
+
+    def __bool__(self):
+        return bool(self._timings)
+
+    def lap(self, phase, count=0):
+        self._timings.lap(phase, count)
+        self.completed.append(phase)
+
+    def count(self, phase, count=1):
+        self._timings.count(phase, count)
+
+    def add_nested(self, phase, seconds, count=0):
+        self._timings.add_nested(phase, seconds, count)
+
+    def result(self):
+        return self._timings.result()
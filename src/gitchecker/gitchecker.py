@@ -8,20 +8,51 @@ any pending changes in GIT repository status and returns the last commit info:
     - authored_datetime (datetime): author datetime
     - committer (string): committer name
     - committed_datetime (datetime): committer datetime
-By default it raises an ``Exception`` if there are any pending changes but
-it can be configured to only show a warning instead.
+    - upstream, ahead, behind: with ``ahead_behind=True``, the upstream
+      branch and how many commits ``HEAD`` is ahead of and behind it
+By default it raises an ``Exception`` if there are any pending changes, or
+if the check doesn't complete within its ``timeout``, but it can be
+configured to only show a warning instead.
 """
 
-import re
-from collections import namedtuple
-from git import Repo  # http://gitpython.readthedocs.io/
+import os
+import posixpath
+import time
+from functools import partial
+
+from gitchecker import commitgraph, gitpython, native, porcelain
+from gitchecker.deadline import Deadline, DeadlineExceeded, NO_DEADLINE, PhaseLog
+from gitchecker.matcher import compile_path_matcher
+from gitchecker.memo import status_memo, validity_token
+from gitchecker.repository import find_worktree, iter_submodules
+from gitchecker.status import CommitInfo, FILTER, GitStatus, STAGED, UNSTAGED, UNTRACKED
+from gitchecker.timings import NO_TIMINGS, Timings
+
+
+GITPYTHON_ENGINE = "gitpython"
+PORCELAIN_ENGINE = "porcelain"
+NATIVE_ENGINE = "native"
+ENGINES = (GITPYTHON_ENGINE, PORCELAIN_ENGINE, NATIVE_ENGINE)
+
+# maximum number of submodules checked at the same time
+SUBMODULE_WORKERS = 8
 
 
 def check_status_and_get_commit_info(repo_path="",
                                      warning_instead_of_error=False,
                                      ignore_untracked_files=False,
                                      ignore_files_regex=None,
-                                     logger=None):
+                                     logger=None,
+                                     engine=GITPYTHON_ENGINE,
+                                     stat_cache=False,
+                                     fail_fast=False,
+                                     timings_callback=None,
+                                     recurse_submodules=False,
+                                     paths=None,
+                                     memoize=False,
+                                     ahead_behind=False,
+                                     timeout=None,
+                                     warning_on_timeout=False):
 
     """checks if there is any pending changes in GIT
     repository status and returns the last commit info
@@ -32,13 +63,61 @@ def check_status_and_get_commit_info(repo_path="",
             if there are any pending changes unless this param is truthy
         ignore_untracked_files (bool): If ``True``, untracked files will be
             ignored completely, not raising errors and not showing warnings.
-        ignore_files_regex (string): Files will be ignored if its path matches
-            the regex pattern.
+        ignore_files_regex (string or list): Files will be ignored if its path
+            matches the regex pattern. A list can mix regexes and ``"glob:"``
+            prefixed globs; it's compiled once into a ``PathMatcher``, which
+            can also be passed directly (see ``compile_path_matcher()``).
         logger: If a ``logger`` is provided, it will be used only if it
             has an ``error()`` or ``warning()`` method. The required
             method depends on the value of ``warning_instead_of_error``.
             If no ``logger`` provided or no proper log function exists
             in ``logger`` , ``print()`` will be used instead.
+        engine (string): How the GIT status is read. ``"gitpython"`` uses
+            GitPython diffs, ``"porcelain"`` parses the output of a single
+            ``git status --porcelain=v2`` process as a stream and ``"native"``
+            reads the ``.git`` directory directly, without running ``git``.
+        stat_cache (bool): Only for the ``"native"`` engine. If ``True``, the
+            results are recorded in ``.git/gitchecker-cache`` and the next
+            checks only examine the files and directories whose stat data
+            changed, unless ``HEAD`` or the index moved.
+        fail_fast (bool): Only when an error is raised (falsy
+            ``warning_instead_of_error``). If ``True``, the check stops at
+            the first pending change found, without counting the rest, and
+            the error reports the repository as dirty with at least that
+            number of changes.
+        timings_callback (callable): If provided, the wall time and the
+            count of each phase of the check are recorded (see
+            ``status.PHASES``) and it's called with the ``repo_path`` and
+            the ``GitStatus``, whose ``timings`` holds a ``PhaseTiming``
+            per phase, before checking it.
+        recurse_submodules (bool): If ``True``, every initialized submodule,
+            nested ones included, is also checked, concurrently and with the
+            same params, and its pending changes count as the repository's
+            (once, the repository only counts its moved gitlinks).
+        paths (string or list): If provided, only the files and directories
+            at these paths, relative to the repository root, are checked.
+            Unlike ``ignore_files_regex``, the rest is never read nor
+            walked (the pathspecs are passed to ``git``). Not supported
+            with ``stat_cache``. Only the submodules under them are checked.
+        memoize (bool): If ``True``, the status is memoized in the
+            process-wide ``memo.status_memo`` and the next checks with the
+            same params return it again while the cheap validity token of
+            the repository (``HEAD``, the index and the top-level entries of
+            the working tree) is unchanged, until it expires (the deeper
+            changes are only seen then). Ignored when the check is timed.
+        ahead_behind (bool): If ``True``, the upstream of the current
+            branch and how many commits ``HEAD`` is ahead of and behind it
+            are added to the commit info, counted in-process with the
+            generation numbers of the commit-graph file when there is one.
+        timeout (float): If provided, the seconds the check can take. When
+            they run out, the ``git`` processes are killed and the working
+            tree walk is stopped, and the ``GitStatus`` is flagged as
+            ``timed_out``, with the changes seen so far and its
+            ``completed_phases``. Like the pending changes, a timeout raises
+            an ``Exception`` unless ``warning_on_timeout`` is truthy. The
+            ``"gitpython"`` engine only stops between its diffs.
+        warning_on_timeout (bool): If ``True``, a timeout only shows a
+            warning, even if the pending changes raise an ``Exception``.
     Returns:
         (CommitInfo) Last commit info in a namedtuple format:
             - sha (string): commit SHA (7 digits length)
@@ -46,49 +125,679 @@ def check_status_and_get_commit_info(repo_path="",
             - authored_datetime (datetime): author datetime
             - committer (string): committer name
             - committed_datetime (datetime): committer datetime
+            - upstream (string): short name of the upstream branch (e.g.
+              ``"origin/master"``), only with ``ahead_behind``
+            - ahead (int): commits of ``HEAD`` not in the upstream
+            - behind (int): commits of the upstream not in ``HEAD``
+            All three are ``None`` without ``ahead_behind``, when ``HEAD`` is
+            detached or its branch has no upstream, and the counts are also
+            ``None`` when the upstream ref is gone.
+        It's ``None`` if the check timed out (with ``warning_on_timeout``)
+        before reading it.
     """
 
-    git_status = _get_git_status(repo_path, ignore_files_regex, ignore_untracked_files)
+    git_status = _get_git_status(repo_path,
+                                 ignore_files_regex,
+                                 ignore_untracked_files,
+                                 engine=engine,
+                                 stat_cache=stat_cache,
+                                 fail_fast=fail_fast and not warning_instead_of_error,
+                                 timings=timings_callback is not None,
+                                 recurse_submodules=recurse_submodules,
+                                 paths=paths,
+                                 memoize=memoize,
+                                 ahead_behind=ahead_behind,
+                                 timeout=timeout)
+
+    if timings_callback is not None:
+        timings_callback(repo_path, git_status)
+
+    return _check_git_status(git_status, warning_instead_of_error, logger, warning_on_timeout)
+
+
+async def check_status_and_get_commit_info_async(repo_path="",
+                                                 warning_instead_of_error=False,
+                                                 ignore_untracked_files=False,
+                                                 ignore_files_regex=None,
+                                                 logger=None,
+                                                 engine=GITPYTHON_ENGINE,
+                                                 stat_cache=False,
+                                                 fail_fast=False,
+                                                 timings_callback=None,
+                                                 recurse_submodules=False,
+                                                 paths=None,
+                                                 memoize=False,
+                                                 ahead_behind=False,
+                                                 timeout=None,
+                                                 warning_on_timeout=False):
+
+    """asyncio version of ``check_status_and_get_commit_info()``,
+    with the same params and result
+
+    It doesn't block the event loop: the ``"gitpython"`` and ``"porcelain"``
+    engines both read ``git status --porcelain=v2`` and ``git log`` from
+    asyncio subprocesses, and the ``"native"`` engine, which doesn't run
+    ``git``, is run in the default executor of the loop.
+    """
+
+    git_status = await _get_git_status_async(repo_path,
+                                             ignore_files_regex,
+                                             ignore_untracked_files,
+                                             engine=engine,
+                                             stat_cache=stat_cache,
+                                             fail_fast=fail_fast and not warning_instead_of_error,
+                                             timings=timings_callback is not None,
+                                             recurse_submodules=recurse_submodules,
+                                             paths=paths,
+                                             memoize=memoize,
+                                             ahead_behind=ahead_behind,
+                                             timeout=timeout)
+
+    if timings_callback is not None:
+        timings_callback(repo_path, git_status)
+
+    return _check_git_status(git_status, warning_instead_of_error, logger, warning_on_timeout)
+
 
-    if git_status.total_changes:
+def _check_git_status(git_status, warning_instead_of_error=False, logger=None,
+                      warning_on_timeout=False):
+    if git_status.total_changes or git_status.timed_out:
         status_msg = _get_status_msg(git_status)
-        if warning_instead_of_error:
-            _log_warning(status_msg, logger)
-        else:
+        if _is_error(git_status, warning_instead_of_error, warning_on_timeout):
             _log_and_raise_error(status_msg, logger)
+        else:
+            _log_warning(status_msg, logger)
 
     return git_status.commit_info
 
 
-GitStatus = namedtuple("GitStatus", ["commit_info",
-                                     "staged_files",
-                                     "unstaged_files",
-                                     "untracked_files",
-                                     "total_changes"])
+def _is_error(git_status, warning_instead_of_error=False, warning_on_timeout=False):
+    """returns if the status is an error, its pending changes and its timeout
+    having their own policies"""
+
+    return bool((git_status.total_changes and not warning_instead_of_error) or
+                (git_status.timed_out and not warning_on_timeout))
+
+
+def check_many(repo_paths,
+               max_workers=None,
+               warning_instead_of_error=False,
+               ignore_untracked_files=False,
+               ignore_files_regex=None,
+               logger=None,
+               engine=GITPYTHON_ENGINE,
+               stat_cache=False,
+               fail_fast=False,
+               timings_callback=None,
+               recurse_submodules=False,
+               paths=None,
+               memoize=False,
+               ahead_behind=False,
+               timeout=None,
+               warning_on_timeout=False):
+
+    """runs ``check_status_and_get_commit_info()`` over many GIT
+    repositories concurrently, on a bounded thread pool
+
+    Args:
+        repo_paths (iterable): GIT repository paths.
+        max_workers (int): Maximum number of repositories checked at the
+            same time. By default, the ``ThreadPoolExecutor`` default.
+        The rest of the params are the ones of
+        ``check_status_and_get_commit_info()``, used for every repository
+        (``timings_callback`` is called from the worker threads).
+    Returns:
+        (dict) For each repository path, in the given order, its last
+            ``CommitInfo`` or the ``Exception`` raised checking it (e.g.
+            pending changes). Nothing is raised on the first dirty repository.
+            The ``timeout`` bounds the check of each repository.
+    """
+
+    repo_paths = list(dict.fromkeys(repo_paths))
+    if not repo_paths:
+        return {}
+
+    def check(repo_path):
+        try:
+            return check_status_and_get_commit_info(repo_path,
+                                                    warning_instead_of_error,
+                                                    ignore_untracked_files,
+                                                    ignore_files_regex,
+                                                    logger,
+                                                    engine=engine,
+                                                    stat_cache=stat_cache,
+                                                    fail_fast=fail_fast,
+                                                    timings_callback=timings_callback,
+                                                    recurse_submodules=recurse_submodules,
+                                                    paths=paths,
+                                                    memoize=memoize,
+                                                    ahead_behind=ahead_behind,
+                                                    timeout=timeout,
+                                                    warning_on_timeout=warning_on_timeout)
+        except Exception as ex:
+            return ex
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # checking a repository is mostly waiting for git processes and disk reads
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(repo_paths, executor.map(check, repo_paths)))
+
+
+def iter_changes(repo_path="",
+                 ignore_files_regex=None,
+                 ignore_untracked_files=False,
+                 engine=GITPYTHON_ENGINE,
+                 stat_cache=False,
+                 paths=None):
+
+    """yields the pending changes of a GIT repository as they are read,
+    without building any list of them, so the memory use doesn't depend on
+    the number of changes (e.g. millions of untracked build artifacts)
+
+    Args:
+        repo_path (string): GIT repository path.
+        ignore_files_regex (string or list): The changes whose path matches
+            are skipped, see ``check_status_and_get_commit_info()``.
+        ignore_untracked_files (bool): If ``True``, the untracked files are skipped.
+        engine (string): How the GIT status is read, see
+            ``check_status_and_get_commit_info()``.
+        stat_cache (bool): Only for the ``"native"`` engine, see
+            ``check_status_and_get_commit_info()``.
+        paths (string or list): Only the changes under these paths are
+            read, see ``check_status_and_get_commit_info()``.
+    Yields:
+        (Change) Lightweight namedtuples:
+            - category (string): ``"staged"``, ``"unstaged"`` or ``"untracked"``
+            - path (string): path relative to the repository root
+            - orig_path (string): source path of a rename or copy, or ``None``
+    """
+
+    paths = _normalize_paths(paths)
+    _check_engine(engine, stat_cache, paths)
+    ignore_files_regex = compile_path_matcher(ignore_files_regex)
+    engine_module, engine_options = _get_engine(engine, stat_cache, paths)
+    _, changes = engine_module.get_commit_info_and_changes(repo_path,
+                                                           prune_matcher=ignore_files_regex,
+                                                           **engine_options)
+
+    try:
+        for change in _filter_changes(changes, ignore_files_regex):
+            if _is_counted(change, ignore_untracked_files):
+                yield change
+    finally:
+        # kills the 'git' process or stops the working tree walk if not exhausted
+        changes.close()
+
+
+def _get_git_status(repo_path="",
+                    ignore_files_regex=None,
+                    ignore_untracked_files=False,
+                    engine=GITPYTHON_ENGINE,
+                    stat_cache=False,
+                    fail_fast=False,
+                    timings=False,
+                    recurse_submodules=False,
+                    paths=None,
+                    memoize=False,
+                    ahead_behind=False,
+                    timeout=None):
+
+    paths = _normalize_paths(paths)
+    _check_engine(engine, stat_cache, paths)
+    ignore_files_regex = compile_path_matcher(ignore_files_regex)
+
+    if memoize and not timings:
+        memo_key = _memo_key(repo_path, ignore_files_regex, ignore_untracked_files, engine,
+                             stat_cache, fail_fast, recurse_submodules, paths, ahead_behind,
+                             timeout)
+        # taken before the check: a change made during it invalidates the result
+        token = validity_token(repo_path)
+        git_status = status_memo.get(memo_key, token)
+        if git_status is None:
+            git_status = _get_git_status(repo_path,
+                                         ignore_files_regex,
+                                         ignore_untracked_files,
+                                         engine=engine,
+                                         stat_cache=stat_cache,
+                                         fail_fast=fail_fast,
+                                         recurse_submodules=recurse_submodules,
+                                         paths=paths,
+                                         ahead_behind=ahead_behind,
+                                         timeout=timeout)
+            # a timed out check is tried again
+            if not git_status.timed_out:
+                status_memo.put(memo_key, token, git_status)
+
+        return git_status
+
+    get_repo_git_status = partial(_get_repo_git_status,
+                                  ignore_files_regex=ignore_files_regex,
+                                  ignore_untracked_files=ignore_untracked_files,
+                                  engine=engine,
+                                  stat_cache=stat_cache,
+                                  fail_fast=fail_fast,
+                                  timings=timings,
+                                  ahead_behind=ahead_behind,
+                                  # the submodules count their own changes
+                                  ignore_dirty_submodules=recurse_submodules,
+                                  # shared by the submodules, they run concurrently
+                                  deadline=_deadline(timeout))
+
+    git_status = get_repo_git_status(repo_path, paths=paths)
+    if not recurse_submodules or (fail_fast and git_status.total_changes):
+        return git_status
+
+    worktree = find_worktree(repo_path)
+    submodule_paths = [path for path in iter_submodules(worktree) if _is_in_paths(path, paths)]
+    if not submodule_paths:
+        return _add_submodules(git_status, {})
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # the nested submodules are found from the .gitmodules files, so all the
+    # levels are checked on the same pool
+    max_workers = min(SUBMODULE_WORKERS, len(submodule_paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        submodule_statuses = list(executor.map(get_repo_git_status,
+                                               [os.path.join(worktree, path)
+                                                for path in submodule_paths]))
+
+    return _add_submodules(git_status, dict(zip(submodule_paths, submodule_statuses)))
+
+
+def _get_repo_git_status(repo_path="",
+                         ignore_files_regex=None,
+                         ignore_untracked_files=False,
+                         engine=GITPYTHON_ENGINE,
+                         stat_cache=False,
+                         fail_fast=False,
+                         timings=False,
+                         paths=None,
+                         ahead_behind=False,
+                         ignore_dirty_submodules=False,
+                         deadline=NO_DEADLINE):
+
+    timings = Timings() if timings else NO_TIMINGS
+
+    engine_module, engine_options = _get_engine(engine, stat_cache, paths,
+                                                ignore_dirty_submodules)
+
+    git_status = _get_engine_git_status(engine_module,
+                                        repo_path,
+                                        ignore_files_regex,
+                                        ignore_untracked_files,
+                                        fail_fast,
+                                        timings,
+                                        deadline,
+                                        **engine_options)
+
+    if not ahead_behind or git_status.timed_out:
+        return git_status
+
+    return _add_upstream_info(git_status, repo_path, deadline)
+
+
+async def _get_git_status_async(repo_path="",
+                                ignore_files_regex=None,
+                                ignore_untracked_files=False,
+                                engine=GITPYTHON_ENGINE,
+                                stat_cache=False,
+                                fail_fast=False,
+                                timings=False,
+                                recurse_submodules=False,
+                                paths=None,
+                                memoize=False,
+                                ahead_behind=False,
+                                timeout=None):
+
+    paths = _normalize_paths(paths)
+    _check_engine(engine, stat_cache, paths)
+    ignore_files_regex = compile_path_matcher(ignore_files_regex)
+
+    if memoize and not timings:
+        memo_key = _memo_key(repo_path, ignore_files_regex, ignore_untracked_files, engine,
+                             stat_cache, fail_fast, recurse_submodules, paths, ahead_behind,
+                             timeout)
+        token = validity_token(repo_path)
+        git_status = status_memo.get(memo_key, token)
+        if git_status is None:
+            git_status = await _get_git_status_async(repo_path,
+                                                     ignore_files_regex,
+                                                     ignore_untracked_files,
+                                                     engine=engine,
+                                                     stat_cache=stat_cache,
+                                                     fail_fast=fail_fast,
+                                                     recurse_submodules=recurse_submodules,
+                                                     paths=paths,
+                                                     ahead_behind=ahead_behind,
+                                                     timeout=timeout)
+            if not git_status.timed_out:
+                status_memo.put(memo_key, token, git_status)
+
+        return git_status
+
+    get_repo_git_status = partial(_get_repo_git_status_async,
+                                  ignore_files_regex=ignore_files_regex,
+                                  ignore_untracked_files=ignore_untracked_files,
+                                  engine=engine,
+                                  stat_cache=stat_cache,
+                                  fail_fast=fail_fast,
+                                  timings=timings,
+                                  ahead_behind=ahead_behind,
+                                  ignore_dirty_submodules=recurse_submodules,
+                                  deadline=_deadline(timeout))
+
+    git_status = await get_repo_git_status(repo_path, paths=paths)
+    if not recurse_submodules or (fail_fast and git_status.total_changes):
+        return git_status
+
+    import asyncio
+
+    worktree = find_worktree(repo_path)
+    submodule_paths = [path for path in iter_submodules(worktree) if _is_in_paths(path, paths)]
+    submodule_statuses = await asyncio.gather(*[get_repo_git_status(os.path.join(worktree, path))
+                                                for path in submodule_paths])
+
+    return _add_submodules(git_status, dict(zip(submodule_paths, submodule_statuses)))
+
+
+async def _get_repo_git_status_async(repo_path="",
+                                     ignore_files_regex=None,
+                                     ignore_untracked_files=False,
+                                     engine=GITPYTHON_ENGINE,
+                                     stat_cache=False,
+                                     fail_fast=False,
+                                     timings=False,
+                                     paths=None,
+                                     ahead_behind=False,
+                                     ignore_dirty_submodules=False,
+                                     deadline=NO_DEADLINE):
+
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    if engine == NATIVE_ENGINE:
+        get_repo_git_status = partial(_get_repo_git_status,
+                                      repo_path,
+                                      ignore_files_regex,
+                                      ignore_untracked_files,
+                                      engine=engine,
+                                      stat_cache=stat_cache,
+                                      fail_fast=fail_fast,
+                                      timings=timings,
+                                      paths=paths,
+                                      ahead_behind=ahead_behind,
+                                      ignore_dirty_submodules=ignore_dirty_submodules,
+                                      deadline=deadline)
+        return await loop.run_in_executor(None, get_repo_git_status)
+
+    git_status = await _get_porcelain_git_status_async(repo_path,
+                                                       ignore_files_regex,
+                                                       ignore_untracked_files,
+                                                       fail_fast,
+                                                       timings,
+                                                       paths,
+                                                       deadline,
+                                                       ignore_dirty_submodules)
+    if not ahead_behind or git_status.timed_out:
+        return git_status
+
+    # the history walk reads the objects in-process
+    return await loop.run_in_executor(None, _add_upstream_info, git_status, repo_path, deadline)
+
+
+async def _get_porcelain_git_status_async(repo_path="",
+                                          ignore_files_regex=None,
+                                          ignore_untracked_files=False,
+                                          fail_fast=False,
+                                          timings=False,
+                                          paths=None,
+                                          deadline=NO_DEADLINE,
+                                          ignore_dirty_submodules=False):
+
+    timings = Timings() if timings else NO_TIMINGS
+    phases = PhaseLog(timings) if deadline else timings
+    pruned_dirs = []
+    counts = {STAGED: 0, UNSTAGED: 0, UNTRACKED: 0}
+    build_git_status = partial(_build_counted_git_status,
+                               counts=counts,
+                               ignore_untracked_files=ignore_untracked_files,
+                               pruned_dirs=pruned_dirs,
+                               phases=phases)
+
+    try:
+        commit_info, changes = await porcelain.get_commit_info_and_changes_async(
+            repo_path, ignore_files_regex, pruned_dirs, paths, phases, deadline,
+            ignore_dirty_submodules)
+    except DeadlineExceeded:
+        return build_git_status(None, timed_out=True)
+
+    is_change_kept = partial(_is_timed_change_kept, timings=timings) if timings \
+        else _is_change_kept
+    try:
+        async for change in changes:
+            if is_change_kept(change, ignore_files_regex):
+                counts[change.category] += 1
+                if fail_fast and _is_counted(change, ignore_untracked_files):
+                    # kills the 'git status' process
+                    await changes.aclose()
+                    return build_git_status(commit_info, partial=True)
+    except DeadlineExceeded:
+        return build_git_status(commit_info, timed_out=True)
+
+    return build_git_status(commit_info)
+
+
+def _get_engine(engine, stat_cache=False, paths=None, ignore_dirty_submodules=False):
+    """returns the module of the engine and its options"""
+
+    if engine == PORCELAIN_ENGINE:
+        return porcelain, {"paths": paths, "ignore_dirty_submodules": ignore_dirty_submodules}
+
+    if engine == NATIVE_ENGINE:
+        return native, {"stat_cache": stat_cache,
+                        "paths": paths,
+                        "ignore_dirty_submodules": ignore_dirty_submodules}
+
+    return gitpython, {"paths": paths, "ignore_dirty_submodules": ignore_dirty_submodules}
+
+
+def _check_engine(engine, stat_cache, paths=None):
+    if engine not in ENGINES:
+        raise ValueError("Unknown engine '{}', expected one of: {}"
+                         .format(engine, ", ".join(ENGINES)))
+
+    if stat_cache and engine != NATIVE_ENGINE:
+        raise ValueError("stat_cache is only supported by the '{}' engine".format(NATIVE_ENGINE))
+
+    if stat_cache and paths:
+        raise ValueError("stat_cache can't be limited to paths")
+
+
+def _normalize_paths(paths):
+    """returns the ``paths`` as a sorted tuple of ``/`` separated paths
+    relative to the repository root, without the ones inside others, or
+    ``None`` for the whole repository"""
+
+    if not paths:
+        return None
+
+    if isinstance(paths, str):
+        paths = (paths,)
+
+    normalized = set()
+    for path in paths:
+        path = posixpath.normpath(path.replace(os.sep, "/"))
+        if path.startswith("/") or path == ".." or path.startswith("../"):
+            raise ValueError("'{}' is not relative to the repository root".format(path))
+        if path == ".":
+            return None
+        normalized.add(path)
+
+    return tuple(path for path in sorted(normalized)
+                 if not any(path.startswith(other + "/") for other in normalized))
+
+
+def _deadline(timeout=None):
+    return NO_DEADLINE if timeout is None else Deadline(timeout)
+
+
+def _memo_key(repo_path, ignore_files_regex, *options):
+    patterns = ignore_files_regex.patterns if ignore_files_regex else None
+
+    return (os.path.realpath(repo_path or os.curdir), patterns) + options
+
 
-CommitInfo = namedtuple("CommitInfo", ["sha",
-                                       "author",
-                                       "authored_datetime",
-                                       "committer",
-                                       "committed_datetime"])
+def _is_in_paths(path, paths=None):
+    return not paths or any(path == other or path.startswith(other + "/") for other in paths)
 
 
-def _get_git_status(repo_path="", ignore_files_regex=None, ignore_untracked_files=False):
-    repo = Repo(repo_path)
+def _get_engine_git_status(engine_module,
+                           repo_path="",
+                           ignore_files_regex=None,
+                           ignore_untracked_files=False,
+                           fail_fast=False,
+                           timings=NO_TIMINGS,
+                           deadline=NO_DEADLINE,
+                           **engine_options):
 
-    last_commit     = repo.head.commit
-    commit_info     = CommitInfo(repo.git.rev_parse(last_commit.hexsha, short=7),
-                                 last_commit.author.name,
-                                 last_commit.authored_datetime,
-                                 last_commit.committer.name,
-                                 last_commit.committed_datetime)
+    phases = PhaseLog(timings) if deadline else timings
+    pruned_dirs = []
+    counts = {STAGED: 0, UNSTAGED: 0, UNTRACKED: 0}
+    build_git_status = partial(_build_counted_git_status,
+                               counts=counts,
+                               ignore_untracked_files=ignore_untracked_files,
+                               pruned_dirs=pruned_dirs,
+                               phases=phases)
 
-    filter_diff_fn  = lambda df: __filter_diff_file(df, ignore_files_regex)
-    staged_files    = __filter_diff(repo.index.diff("HEAD"), filter_diff_fn)
-    unstaged_files  = __filter_diff(repo.index.diff(None), filter_diff_fn)
+    try:
+        commit_info, changes = \
+            engine_module.get_commit_info_and_changes(repo_path,
+                                                      prune_matcher=ignore_files_regex,
+                                                      pruned_dirs=pruned_dirs,
+                                                      timings=phases,
+                                                      deadline=deadline,
+                                                      **engine_options)
+    except DeadlineExceeded:
+        return build_git_status(None, timed_out=True)
 
-    filter_files_fn = lambda df: __filter_filename(df, ignore_files_regex)
-    untracked_files = __filter_diff(repo.untracked_files, filter_files_fn)
+    try:
+        for change in _filter_changes(changes, ignore_files_regex, phases):
+            counts[change.category] += 1
+            if fail_fast and _is_counted(change, ignore_untracked_files):
+                # kills the 'git status' process or stops the working tree walk
+                changes.close()
+                return build_git_status(commit_info, partial=True)
+    except DeadlineExceeded:
+        # raised by the engine, its processes are already killed
+        return build_git_status(commit_info, timed_out=True)
+
+    return build_git_status(commit_info)
+
+
+def _is_counted(change, ignore_untracked_files=False):
+    return change.category != UNTRACKED or not ignore_untracked_files
+
+
+def _filter_changes(changes, ignore_files_regex=None, timings=NO_TIMINGS):
+    if timings:
+        yield from _timed_filter_changes(changes, ignore_files_regex, timings)
+        return
+
+    for change in changes:
+        if _is_change_kept(change, ignore_files_regex):
+            yield change
+
+
+def _timed_filter_changes(changes, ignore_files_regex, timings):
+    for change in changes:
+        if _is_timed_change_kept(change, ignore_files_regex, timings):
+            yield change
+
+
+def _is_timed_change_kept(change, ignore_files_regex, timings):
+    timings.count(change.category)
+    start = time.perf_counter()
+    is_kept = _is_change_kept(change, ignore_files_regex)
+    timings.add_nested(FILTER, time.perf_counter() - start, 0 if is_kept else 1)
+
+    return is_kept
+
+
+def _is_change_kept(change, ignore_files_regex=None):
+    return (__filter_filename(change.path, ignore_files_regex) and
+            __filter_filename(change.orig_path, ignore_files_regex))
+
+
+def _add_submodules(git_status, submodules):
+    """adds the counts of the ``{path: GitStatus}`` of the submodules to the
+    ones of the repository"""
+
+    statuses = list(submodules.values())
+
+    return git_status._replace(
+        staged_files=git_status.staged_files + sum(s.staged_files for s in statuses),
+        unstaged_files=git_status.unstaged_files + sum(s.unstaged_files for s in statuses),
+        untracked_files=git_status.untracked_files + sum(s.untracked_files for s in statuses),
+        total_changes=git_status.total_changes + sum(s.total_changes for s in statuses),
+        partial=git_status.partial or any(s.partial for s in statuses),
+        pruned_dirs=git_status.pruned_dirs + sum(s.pruned_dirs for s in statuses),
+        submodules=submodules,
+        timed_out=git_status.timed_out or any(s.timed_out for s in statuses))
+
+
+def _add_upstream_info(git_status, repo_path="", deadline=NO_DEADLINE):
+    try:
+        upstream, ahead, behind = commitgraph.get_upstream_info(repo_path, deadline)
+    except DeadlineExceeded:
+        # the counts are complete, only the upstream info is missing
+        return git_status._replace(timed_out=True)
+
+    commit_info = git_status.commit_info._replace(upstream=upstream, ahead=ahead, behind=behind)
+
+    return git_status._replace(commit_info=commit_info)
+
+
+def _build_counted_git_status(commit_info,
+                              counts,
+                              ignore_untracked_files=False,
+                              pruned_dirs=(),
+                              phases=NO_TIMINGS,
+                              partial=False,
+                              timed_out=False):
+
+    """builds the status of the ``counts`` of each category, so far if
+    ``partial`` or ``timed_out``, recording the phases"""
+
+    return _build_git_status(commit_info,
+                             counts[STAGED],
+                             counts[UNSTAGED],
+                             counts[UNTRACKED],
+                             ignore_untracked_files,
+                             partial=partial,
+                             pruned_dirs=len(pruned_dirs),
+                             timings=phases.result(),
+                             timed_out=timed_out,
+                             completed_phases=_completed_phases(phases))
+
+
+def _completed_phases(phases):
+    """returns the phases completed so far, ``None`` if the check has no deadline"""
+
+    return tuple(phases.completed) if isinstance(phases, PhaseLog) else None
+
+
+def _build_git_status(commit_info,
+                      staged_files,
+                      unstaged_files,
+                      untracked_files,
+                      ignore_untracked_files=False,
+                      partial=False,
+                      pruned_dirs=0,
+                      timings=None,
+                      timed_out=False,
+                      completed_phases=None):
 
     total_changes = staged_files + unstaged_files
 
@@ -99,22 +808,20 @@ def _get_git_status(repo_path="", ignore_files_regex=None, ignore_untracked_file
                      staged_files,
                      unstaged_files,
                      untracked_files,
-                     total_changes)
-
-
-def __filter_diff(diff, filter_diff_fn):
-    return len(list(filter(filter_diff_fn, list(diff))))
-
-
-def __filter_diff_file(diff_file, ignore_files_regex=None):
-    return (__filter_filename(diff_file.a_path, ignore_files_regex) and
-            __filter_filename(diff_file.b_path, ignore_files_regex))
+                     total_changes,
+                     partial or timed_out,
+                     pruned_dirs,
+                     timings,
+                     timed_out=timed_out,
+                     completed_phases=completed_phases)
 
 
 def __filter_filename(filename, ignore_files_regex=None):
-    return (not ignore_files_regex or
+    matcher = compile_path_matcher(ignore_files_regex)
+
+    return (not matcher or
             not filename or
-            not re.match(ignore_files_regex, filename))
+            not matcher.matches(filename))
 
 
 STATUS_MSG_TMPL = "There are " +\
@@ -122,11 +829,40 @@ STATUS_MSG_TMPL = "There are " +\
                   "{} unstaged file(s) and " +\
                   "{} untracked file(s)"
 
+PARTIAL_STATUS_MSG_TMPL = "The repository is dirty (at least {} pending change(s))"
+
+SUBMODULES_MSG_TMPL = ", including the submodule(s): {}"
+
+TIMED_OUT_MSG_TMPL = "The check timed out with at least {} pending change(s) " +\
+                     "(completed phase(s): {})"
+
+TIMED_OUT_SUBMODULES_MSG_TMPL = ", timed out in the submodule(s): {}"
+
 
 def _get_status_msg(git_status):
-    return STATUS_MSG_TMPL.format(git_status.staged_files,
-                                  git_status.unstaged_files,
-                                  git_status.untracked_files)
+    if git_status.timed_out:
+        # the phases of the repository, its submodules may have timed out instead
+        msg = TIMED_OUT_MSG_TMPL.format(git_status.total_changes,
+                                        ", ".join(git_status.completed_phases or ()) or "none")
+    elif git_status.partial:
+        msg = PARTIAL_STATUS_MSG_TMPL.format(git_status.total_changes)
+    else:
+        msg = STATUS_MSG_TMPL.format(git_status.staged_files,
+                                     git_status.unstaged_files,
+                                     git_status.untracked_files)
+
+    dirty_submodules = [path for path, submodule_status in (git_status.submodules or {}).items()
+                        if submodule_status.total_changes]
+    if dirty_submodules:
+        msg += SUBMODULES_MSG_TMPL.format(", ".join(dirty_submodules))
+
+    timed_out_submodules = [path for path, submodule_status
+                            in (git_status.submodules or {}).items()
+                            if submodule_status.timed_out]
+    if timed_out_submodules:
+        msg += TIMED_OUT_SUBMODULES_MSG_TMPL.format(", ".join(timed_out_submodules))
+
+    return msg
 
 
 def _log_and_raise_error(msg, logger=None):
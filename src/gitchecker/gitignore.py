@@ -0,0 +1,173 @@
+"""
+``.gitignore`` rules, as used to find untracked files without running ``git``
+
+See https://git-scm.com/docs/gitignore
+"""
+
+import os
+import re
+
+
+class GitIgnore:
+    """stack of ignore rules for a working tree walk
+
+    The rules of ``core.excludesFile`` and ``info/exclude`` are always
+    loaded; ``push()`` and ``pop()`` add and remove the rules of the
+    ``.gitignore`` file of each directory the walk enters and leaves.
+    A ``rules_cache`` dict can be shared between instances to avoid reading
+    the same files again.
+    """
+
+    def __init__(self, repo, rules_cache=None):
+        self._worktree = repo.worktree
+        self._rules_cache = rules_cache
+
+        excludes_file, info_exclude = exclude_files(repo)
+        self.read_paths = [excludes_file, info_exclude]
+        self._stack = [self._read_rules(excludes_file) + self._read_rules(info_exclude)]
+
+    def push(self, rel_dir):
+        gitignore_path = os.path.join(self._worktree, rel_dir, ".gitignore")
+        self.read_paths.append(gitignore_path)
+        self._stack.append(self._read_rules(gitignore_path, rel_dir))
+
+    def pop(self):
+        self._stack.pop()
+
+    def is_ignored(self, path, is_dir):
+        for rules in reversed(self._stack):
+            for rule in reversed(rules):
+                if rule.matches(path, is_dir):
+                    return not rule.negated
+
+        return False
+
+    def _read_rules(self, path, base=""):
+        if self._rules_cache is None:
+            return read_rules(path, base)
+
+        if path not in self._rules_cache:
+            self._rules_cache[path] = read_rules(path, base)
+
+        return self._rules_cache[path]
+
+
+def exclude_files(repo):
+    """returns the paths of the ``core.excludesFile`` and ``info/exclude``
+    files of the repository, existing or not"""
+
+    xdg_config_home = (os.environ.get("XDG_CONFIG_HOME") or
+                       os.path.join(os.path.expanduser("~"), ".config"))
+    excludes_file = os.path.expanduser(repo.config.get("core.excludesfile") or
+                                       os.path.join(xdg_config_home, "git", "ignore"))
+
+    return excludes_file, os.path.join(repo.common_dir, "info", "exclude")
+
+
+def read_rules(path, base=""):
+    try:
+        with open(path, "rb") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+
+    rules = []
+    for line in lines:
+        rule = _parse_rule(os.fsdecode(line), base)
+        if rule:
+            rules.append(rule)
+
+    return rules
+
+
+def _parse_rule(line, base):
+    line = line.rstrip("\r")
+    while line.endswith(" ") and not line.endswith("\\ "):
+        line = line[:-1]
+
+    if not line or line.startswith("#"):
+        return None
+
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\"):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    anchored = "/" in line
+
+    return _Rule(line.lstrip("/"), base, negated, dir_only, anchored)
+
+
+class _Rule:
+
+    __slots__ = ("regex", "base_prefix", "negated", "dir_only", "anchored")
+
+    def __init__(self, pattern, base, negated, dir_only, anchored):
+        self.regex = re.compile(translate(pattern) + r"\Z", re.DOTALL)
+        self.base_prefix = base + "/" if base else ""
+        self.negated = negated
+        self.dir_only = dir_only
+        self.anchored = anchored
+
+    def matches(self, path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+
+        if self.base_prefix:
+            if not path.startswith(self.base_prefix):
+                return False
+            path = path[len(self.base_prefix):]
+
+        if not self.anchored:
+            path = path[path.rfind("/") + 1:]
+
+        return self.regex.match(path) is not None
+
+
+def translate(pattern):
+    """translates a gitignore glob into a regex (without end anchor):
+    ``*``, ``?`` and ``[...]`` don't match ``/``; ``**`` does"""
+
+    result = []
+    i, length = 0, len(pattern)
+    while i < length:
+        char = pattern[i]
+        at_component_start = i == 0 or pattern[i - 1] == "/"
+
+        if pattern.startswith("**", i) and at_component_start and i + 2 == length:
+            result.append(".*")
+            i += 2
+        elif pattern.startswith("**/", i) and at_component_start:
+            result.append("(?:.*/)?")
+            i += 3
+        elif char == "*":
+            result.append("[^/]*")
+            i += 1
+        elif char == "?":
+            result.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) else i + 1)
+            if end < 0:
+                result.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                result.append("[" + body + "]")
+                i = end + 1
+        elif char == "\\" and i + 1 < length:
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            result.append(re.escape(char))
+            i += 1
+
+    return "".join(result)
@@ -0,0 +1,131 @@
+"""
+GitPython engine
+
+The last commit info is read with GitPython and the staged and unstaged
+changes are its diffs of the index against ``HEAD`` and the working tree.
+The untracked files are streamed from ``git ls-files --others -z`` instead
+of building the whole ``Repo.untracked_files`` list. A ``deadline`` is
+checked before each diff, which can't be stopped, and kills the untracked
+files process. The ``Repo`` handles
+come from the process-wide ``pool.repo_pool``.
+
+GitPython is imported on first use, by ``pool``.
+"""
+
+import os
+
+from gitchecker import porcelain
+from gitchecker.deadline import DeadlineExceeded, NO_DEADLINE
+from gitchecker.status import (Change, CommitInfo, COMMIT_INFO, REPO_OPEN, STAGED, UNSTAGED,
+                               UNTRACKED)
+from gitchecker.timings import NO_TIMINGS
+
+
+UNTRACKED_ARGS = ["ls-files", "--others", "--exclude-standard", "-z"]
+
+
+def get_commit_info_and_changes(repo_path="", prune_matcher=None, pruned_dirs=None,
+                                paths=None, timings=NO_TIMINGS, deadline=NO_DEADLINE,
+                                ignore_dirty_submodules=False):
+    """returns the last commit info and a generator of the ``Change``
+    records of the repository
+
+    The directories whose paths all match ``prune_matcher`` are excluded
+    from the untracked files and, if they exist, they are appended to the
+    ``pruned_dirs`` list. With ``paths`` (normalized, relative to the
+    repository root), only those subtrees are diffed and walked.
+    With ``ignore_dirty_submodules``, the changes inside the submodules
+    are ignored, only their checked out commit is compared.
+    The phases are recorded in ``timings``.
+    """
+
+    from gitchecker.pool import repo_pool
+
+    handle = repo_pool.acquire(repo_path)
+    timings.lap(REPO_OPEN)
+
+    try:
+        commit_info = _read_commit_info(handle.repo)
+    except BaseException:
+        repo_pool.release(handle, discard=True)
+        raise
+
+    timings.lap(COMMIT_INFO)
+    changes = _iter_changes(repo_pool, handle, prune_matcher, pruned_dirs, paths, timings,
+                            deadline, ignore_dirty_submodules)
+
+    return commit_info, changes
+
+
+def _read_commit_info(repo):
+    last_commit = repo.head.commit
+
+    return CommitInfo(repo.git.rev_parse(last_commit.hexsha, short=7),
+                      last_commit.author.name,
+                      last_commit.authored_datetime,
+                      last_commit.committer.name,
+                      last_commit.committed_datetime)
+
+
+def _iter_changes(repo_pool, handle, prune_matcher=None, pruned_dirs=None, paths=None,
+                  timings=NO_TIMINGS, deadline=NO_DEADLINE, ignore_dirty_submodules=False):
+    repo = handle.repo
+    pathspecs = [porcelain.INCLUDE_PATHSPEC_MAGIC + path for path in paths] if paths else None
+    diff_options = {"ignore_submodules": "dirty"} if ignore_dirty_submodules else {}
+    is_usable = True
+    try:
+        deadline.check()
+        yield from _iter_diff(STAGED, repo.index.diff("HEAD", paths=pathspecs, **diff_options),
+                              reverse=True)
+        timings.lap(STAGED)
+        deadline.check()
+        yield from _iter_diff(UNSTAGED, repo.index.diff(None, paths=pathspecs, **diff_options))
+        timings.lap(UNSTAGED)
+        yield from _iter_untracked(repo.working_tree_dir, prune_matcher, pruned_dirs, paths,
+                                   deadline)
+        timings.lap(UNTRACKED)
+    except (GeneratorExit, DeadlineExceeded):
+        # stopped early (fail fast or timed out), the handle is still consistent
+        raise
+    except BaseException:
+        is_usable = False
+        raise
+    finally:
+        repo_pool.release(handle, discard=not is_usable)
+
+
+def _iter_diff(category, diff, reverse=False):
+    """yields the changes of a GitPython diff, ``reverse`` when its ``a``
+    side is the new one (the index diffed against ``HEAD``)"""
+
+    for diff_file in diff:
+        new_path, old_path = diff_file.b_path, diff_file.a_path
+        if reverse:
+            new_path, old_path = old_path, new_path
+
+        path = new_path or old_path
+        orig_path = old_path if old_path != path else None
+        yield Change(category, path, orig_path)
+
+
+def _iter_untracked(worktree, prune_matcher=None, pruned_dirs=None, paths=None,
+                    deadline=NO_DEADLINE):
+    # the fully ignored directories are excluded by pathspec, git doesn't walk them
+    args = UNTRACKED_ARGS + porcelain._pathspec_args(worktree, prune_matcher, pruned_dirs, paths)
+
+    return porcelain._iter_changes(porcelain._popen_git(worktree, args), _UntrackedParser(),
+                                   deadline=deadline)
+
+
+class _UntrackedParser:
+    """incremental parser of the ``\\0`` separated paths of ``git ls-files -z``"""
+
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, data):
+        paths = (self._pending + data).split(b"\0")
+        self._pending = paths.pop()
+
+        for path in paths:
+            yield Change(UNTRACKED, os.fsdecode(path))
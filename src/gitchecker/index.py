@@ -0,0 +1,181 @@
+"""
+Reader of the GIT index file (``.git/index``) versions 2, 3 and 4
+
+See https://git-scm.com/docs/index-format
+"""
+
+import os
+import struct
+from collections import namedtuple
+
+
+IndexEntry = namedtuple("IndexEntry", ["path",
+                                       "ctime_s",
+                                       "ctime_ns",
+                                       "mtime_s",
+                                       "mtime_ns",
+                                       "dev",
+                                       "ino",
+                                       "mode",
+                                       "uid",
+                                       "gid",
+                                       "size",
+                                       "oid",
+                                       "stage",
+                                       "assume_valid",
+                                       "skip_worktree",
+                                       "intent_to_add"])
+
+GitIndex = namedtuple("GitIndex", ["version", "entries", "extensions", "mtime_s", "mtime_ns"])
+
+HEADER = struct.Struct(">4sLL")
+ENTRY = struct.Struct(">10L20sH")
+EXTENDED_FLAGS = struct.Struct(">H")
+EXTENSION_HEADER = struct.Struct(">4sL")
+
+SIGNATURE = b"DIRC"
+SUPPORTED_VERSIONS = (2, 3, 4)
+HASH_SIZE = 20
+
+FLAG_ASSUME_VALID = 0x8000
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+FLAG_STAGE_SHIFT = 12
+EXTENDED_SKIP_WORKTREE = 0x4000
+EXTENDED_INTENT_TO_ADD = 0x2000
+
+CACHE_TREE_EXTENSION = b"TREE"
+SPLIT_INDEX_EXTENSION = b"link"
+SPARSE_INDEX_EXTENSION = b"sdir"
+
+
+def read_index(git_dir):
+    """reads ``<git_dir>/index``; a missing index file is an empty index"""
+
+    index_path = os.path.join(git_dir, "index")
+    try:
+        with open(index_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+    except FileNotFoundError:
+        return GitIndex(2, [], {}, 0, 0)
+
+    version, entries, extensions = parse_index(data)
+
+    return GitIndex(version, entries, extensions, *divmod(st.st_mtime_ns, 10**9))
+
+
+def parse_index(data):
+    """parses the content of an index file into
+    ``(version, [IndexEntry, ...], {signature: bytes})``"""
+
+    signature, version, count = HEADER.unpack_from(data, 0)
+    if signature != SIGNATURE:
+        raise Exception("Invalid index file signature: {!r}".format(signature))
+
+    if version not in SUPPORTED_VERSIONS:
+        raise Exception("Unsupported index file version: {}".format(version))
+
+    view = memoryview(data)
+    offset = HEADER.size
+    entries = []
+    previous_path = b""
+
+    for _ in range(count):
+        entry_start = offset
+        fields = ENTRY.unpack_from(data, offset)
+        flags = fields[11]
+        offset += ENTRY.size
+
+        extended_flags = 0
+        if flags & FLAG_EXTENDED:
+            extended_flags = EXTENDED_FLAGS.unpack_from(data, offset)[0]
+            offset += EXTENDED_FLAGS.size
+
+        if version == 4:
+            strip_len, offset = _read_offset_varint(view, offset)
+            path_end = data.index(b"\0", offset)
+            path = previous_path[:len(previous_path) - strip_len] + data[offset:path_end]
+            offset = path_end + 1
+        else:
+            path_end = data.index(b"\0", offset)
+            path = data[offset:path_end]
+            # 1 to 8 NUL bytes pad the entry to a multiple of 8 bytes
+            offset = entry_start + ((path_end - entry_start) // 8 + 1) * 8
+
+        previous_path = path
+        entries.append(IndexEntry(os.fsdecode(path),
+                                  *fields[:10],
+                                  fields[10].hex(),
+                                  (flags & FLAG_STAGE_MASK) >> FLAG_STAGE_SHIFT,
+                                  bool(flags & FLAG_ASSUME_VALID),
+                                  bool(extended_flags & EXTENDED_SKIP_WORKTREE),
+                                  bool(extended_flags & EXTENDED_INTENT_TO_ADD)))
+
+    extensions = {}
+    extensions_end = len(data) - HASH_SIZE
+    while offset + EXTENSION_HEADER.size <= extensions_end:
+        ext_signature, ext_size = EXTENSION_HEADER.unpack_from(data, offset)
+        offset += EXTENSION_HEADER.size
+        extensions[ext_signature] = data[offset:offset + ext_size]
+        offset += ext_size
+
+    if SPLIT_INDEX_EXTENSION in extensions:
+        raise Exception("Split index files are not supported")
+
+    if SPARSE_INDEX_EXTENSION in extensions:
+        raise Exception("Sparse index files are not supported")
+
+    return version, entries, extensions
+
+
+def parse_cache_tree(data):
+    """parses the cache-tree (``TREE``) extension into the ``{dir path: tree
+    oid}`` of its valid entries, the root directory being ``""``
+
+    A valid entry is a directory whose index entries are exactly the ones
+    of that tree; ``git`` invalidates it and its parents when they change.
+    """
+
+    cache_tree = {}
+    # [path, subtrees left to read] of the directories being read, in
+    # pre-order, the parents first
+    parents = []
+    offset = 0
+    while offset < len(data):
+        name_end = data.index(b"\0", offset)
+        line_end = data.index(b"\n", name_end)
+        entry_count, subtree_count = data[name_end + 1:line_end].split(b" ")
+
+        while parents and not parents[-1][1]:
+            parents.pop()
+        if parents:
+            parent = parents[-1]
+            parent[1] -= 1
+            name = os.fsdecode(data[offset:name_end])
+            path = parent[0] + "/" + name if parent[0] else name
+        else:
+            path = ""
+
+        offset = line_end + 1
+        if int(entry_count) >= 0:
+            cache_tree[path] = data[offset:offset + HASH_SIZE].hex()
+            offset += HASH_SIZE
+
+        parents.append([path, int(subtree_count)])
+
+    return cache_tree
+
+
+def _read_offset_varint(view, offset):
+    """reads the "offset encoding" variable length integer used by index v4"""
+
+    byte = view[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = view[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+
+    return value, offset
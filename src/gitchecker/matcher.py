@@ -0,0 +1,228 @@
+"""
+Compiled matcher of the ``ignore_files_regex`` patterns
+
+The patterns can be regexes, matched from the start of the path like
+``re.match()``, and globs with a ``"glob:"`` prefix, matching the whole
+path (``*`` doesn't match ``/``, ``**`` does). They are compiled once into:
+    - a single alternation regex (the patterns that can't be combined, e.g.
+      with backreferences or global flags, are kept apart)
+    - a trie of their literal prefixes, so a path or a whole directory that
+      can't match any prefix is rejected without running any regex, and one
+      under a pattern that is only a literal prefix (e.g. ``"build/"`` or
+      ``"glob:build/**"``) is accepted
+"""
+
+import re
+from functools import lru_cache
+
+from gitchecker.gitignore import translate
+
+
+GLOB_PREFIX = "glob:"
+
+REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()")
+QUANTIFIER_CHARS = frozenset("*+?{")
+GLOB_SPECIAL_CHARS = frozenset("*?[\\")
+
+# backreferences, named groups and global flags break when patterns are joined
+NOT_COMBINABLE_REGEX = re.compile(r"\\[1-9]|\\g<|\(\?P[<=]|\(\?[aiLmsux]+\)")
+
+# trie node keys, never path characters
+_ACCEPT = 0
+_PARTIAL = 1
+
+
+def compile_path_matcher(patterns):
+    """compiles the ``ignore_files_regex`` patterns into a reusable ``PathMatcher``
+
+    Args:
+        patterns: A regex string, a compiled regex, a ``PathMatcher`` or a
+            list of regexes and ``"glob:"`` prefixed globs.
+    Returns:
+        (PathMatcher) The matcher, ``None`` if there are no patterns.
+            The same patterns return the same matcher.
+    """
+
+    if isinstance(patterns, PathMatcher):
+        return patterns
+
+    if not patterns:
+        return None
+
+    if isinstance(patterns, (str, re.Pattern)):
+        patterns = (patterns,)
+
+    return _compile_cached(tuple(patterns))
+
+
+@lru_cache(maxsize=64)
+def _compile_cached(patterns):
+    return PathMatcher(patterns)
+
+
+class PathMatcher:
+    """matcher of paths against many regexes and globs, see the module doc"""
+
+    def __init__(self, patterns):
+        self.patterns = tuple(pattern for pattern in patterns if pattern)
+        self._trie = {}
+
+        combined = []
+        self._separate = []
+        prefixes = []
+        accept_prefixes = []
+        for pattern in self.patterns:
+            source, prefix, is_prefix_only = _parse_pattern(pattern)
+            if isinstance(source, str) and not NOT_COMBINABLE_REGEX.search(source):
+                combined.append("(?:{})".format(source))
+            else:
+                self._separate.append(re.compile(source))
+
+            prefixes.append(prefix)
+            if is_prefix_only:
+                accept_prefixes.append(prefix)
+            self._insert(prefix, is_prefix_only)
+
+        self._regex = re.compile("|".join(combined)) if combined else None
+        self._accept_prefixes = tuple(accept_prefixes)
+        # str.startswith() of all the prefixes is the fastest rejection of a single path
+        self._prefixes = None if "" in prefixes else tuple(prefixes)
+
+    def __repr__(self):
+        return "PathMatcher({!r})".format(self.patterns)
+
+    def matches(self, path):
+        if path.startswith(self._accept_prefixes):
+            return True
+
+        if self._prefixes is not None and not path.startswith(self._prefixes):
+            return False
+
+        if self._regex is not None and self._regex.match(path):
+            return True
+
+        return any(regex.match(path) for regex in self._separate)
+
+    def dir_prefixes(self):
+        """returns the directories (ending in ``/``) under which every path matches,
+        without the ones nested in another"""
+
+        prefixes = []
+        for prefix in sorted(self._accept_prefixes):
+            if prefix.endswith("/") and not (prefixes and prefix.startswith(prefixes[-1])):
+                prefixes.append(prefix)
+
+        return prefixes
+
+    def matches_dir(self, dir_path):
+        """returns ``True`` if every path under ``dir_path`` matches,
+        ``False`` if none does and ``None`` if it depends on the path"""
+
+        if dir_path and not dir_path.endswith("/"):
+            dir_path += "/"
+
+        node = self._trie
+        is_undecided = False
+        for char in dir_path:
+            if _ACCEPT in node:
+                return True
+            if _PARTIAL in node:
+                is_undecided = True
+
+            node = node.get(char)
+            if node is None:
+                return None if is_undecided else False
+
+        return True if _ACCEPT in node else None
+
+    def _insert(self, prefix, is_prefix_only):
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+
+        node[_ACCEPT if is_prefix_only else _PARTIAL] = True
+
+
+def _parse_pattern(pattern):
+    """returns the regex of the pattern, its literal prefix and if
+    any path starting with that prefix matches"""
+
+    if isinstance(pattern, re.Pattern):
+        if pattern.flags & ~re.UNICODE:
+            return pattern, "", False
+        pattern = pattern.pattern
+
+    if pattern.startswith(GLOB_PREFIX):
+        glob = pattern[len(GLOB_PREFIX):]
+        prefix = _literal_glob_prefix(glob)
+        is_prefix_only = glob[len(prefix):] == "**" and (not prefix or prefix.endswith("/"))
+        return translate(glob) + r"\Z", prefix, is_prefix_only
+
+    prefix, is_literal = _literal_regex_prefix(pattern)
+
+    return pattern, prefix, is_literal
+
+
+def _literal_glob_prefix(glob):
+    for i, char in enumerate(glob):
+        if char in GLOB_SPECIAL_CHARS:
+            return glob[:i]
+
+    return glob
+
+
+def _literal_regex_prefix(pattern):
+    """returns the literal prefix of a regex and if it's the whole regex"""
+
+    if _has_top_level_alternation(pattern):
+        return "", False
+
+    chars = []
+    i = 1 if pattern.startswith("^") else 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            literal, length = pattern[i + 1], 2
+        elif char in REGEX_SPECIAL_CHARS:
+            break
+        else:
+            literal, length = char, 1
+
+        if pattern[i + length:i + length + 1] in QUANTIFIER_CHARS:
+            # the char is optional or repeated
+            break
+
+        chars.append(literal)
+        i += length
+
+    return "".join(chars), i == len(pattern)
+
+
+def _has_top_level_alternation(pattern):
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+
+        if char == "[":
+            # skip the class, a leading "]" is a literal
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+
+        i += 1
+
+    return False
@@ -0,0 +1,124 @@
+"""
+Process-wide memo of the ``GitStatus`` of the last checks (``memoize=True``)
+
+A memoized status is returned again, without any ``git`` work, while the
+validity token of its repository is unchanged and its TTL hasn't expired.
+The token is cheap to compute, a few ``stat()`` calls and two small reads:
+    - the content of ``HEAD`` and of the loose ref it points to, and the
+      stat data of ``packed-refs``
+    - the stat data of the index
+    - the stat data of the working tree directory and of its top-level
+      directories (the files aren't stat'ed, ``scandir()`` tells them apart)
+So a commit, a checkout, a ``git add`` or a file added or removed in the
+top two levels invalidate it at once. A file modified, or added or removed
+deeper in the tree, doesn't change any of them: such changes are only seen
+when the memoized status expires, after ``ttl`` seconds. The least recently used
+statuses are dropped when the memo holds more than ``max_size``.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from gitchecker.repository import find_git_dirs
+from gitchecker.statcache import MISSING, path_key, stat_key
+
+
+DEFAULT_MAX_SIZE = 128
+DEFAULT_TTL = 2.0
+
+SYMREF_PREFIX = b"ref: "
+
+
+class StatusMemo:
+    """LRU memo of ``GitStatus`` results, see the module doc
+
+    Args:
+        max_size (int): Maximum number of statuses kept.
+        ttl (float): Seconds a status is returned again at most.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # {key: (token, expiry time, GitStatus)}, the most recently used last
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, token):
+        """returns the status memoized for ``key`` with the same ``token``,
+        ``None`` if there isn't any or it expired"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            entry_token, expiry, git_status = entry
+            if entry_token != token or expiry <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return git_status
+
+    def put(self, key, token, git_status):
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl, git_status)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def validity_token(repo_path=""):
+    """returns the validity token of the repository, see the module doc"""
+
+    worktree, git_dir, common_dir = find_git_dirs(repo_path)
+
+    head = _read_file(os.path.join(git_dir, "HEAD"))
+    ref = None
+    if head and head.startswith(SYMREF_PREFIX):
+        ref_name = head[len(SYMREF_PREFIX):].strip().decode()
+        ref = _read_file(os.path.join(git_dir, ref_name)) or \
+            _read_file(os.path.join(common_dir, ref_name))
+
+    with os.scandir(worktree) as dir_entries:
+        top_level_dirs = sorted((dir_entry.name, _entry_key(dir_entry))
+                                for dir_entry in dir_entries
+                                if dir_entry.is_dir(follow_symlinks=False) and
+                                dir_entry.name != ".git")
+
+    return (head,
+            ref,
+            path_key(os.path.join(common_dir, "packed-refs")),
+            path_key(os.path.join(git_dir, "index")),
+            path_key(worktree),
+            tuple(top_level_dirs))
+
+
+def _read_file(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _entry_key(dir_entry):
+    try:
+        return stat_key(dir_entry.stat(follow_symlinks=False))
+    except OSError:
+        return MISSING
+
+
+status_memo = StatusMemo()
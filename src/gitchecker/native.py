@@ -0,0 +1,735 @@
+"""
+Native engine, reading the GIT status without running any ``git`` process
+
+The index and the objects are read straight from the ``.git`` directory.
+The staged files are found by joining the index entries with the files of
+the ``HEAD`` tree, read from the memory-mapped packs, without reading the
+subtrees that the cache-tree index extension records as unchanged, nor
+looking at their entries. Unstaged files are detected by comparing the ``lstat()`` of each working
+tree file against the stat data cached in the index, the same way ``git``
+does, and the content is only hashed when that data can't be trusted:
+the stat data changed but not the size, or the entry is racily clean
+(the file was modified in the same second the index was written). Those
+files are hashed last, in a thread pool, as a ``touch`` of the whole tree
+or a fresh copy of it makes every file a candidate.
+
+A submodule is unstaged when its ``HEAD`` isn't the commit of its gitlink
+or, like ``git status``, when it has changes of its own, found by checking
+it with this engine too. With ``ignore_dirty_submodules`` (the submodules
+are checked on their own), only the commit is compared, like
+``git status --ignore-submodules=dirty``.
+
+A ``deadline`` is checked before each index entry, ``HEAD`` file and
+working tree directory, so the check stops soon after it expires.
+
+Not supported: clean/smudge filters and ``core.autocrlf`` conversions,
+split and sparse indexes.
+"""
+
+import hashlib
+import os
+import stat
+from bisect import bisect_left
+
+from gitchecker.deadline import NO_DEADLINE
+from gitchecker.gitignore import GitIgnore
+from gitchecker.index import CACHE_TREE_EXTENSION, parse_cache_tree, read_index
+from gitchecker.objects import ObjectStore, TREE_MODE
+from gitchecker.repository import config_bool, find_repository, read_head
+from gitchecker.statcache import CONSTANT, MISSING, StatCache, path_key, stat_key
+from gitchecker.status import (Change, CommitInfo, COMMIT_INFO, REPO_OPEN, STAGED, UNSTAGED,
+                               UNTRACKED)
+from gitchecker.timings import NO_TIMINGS
+
+
+# minimum length, longer when the abbreviation is ambiguous
+SHORT_SHA_LENGTH = 7
+
+GITLINK_MODE = 0o160000
+STAT_MASK = 0xFFFFFFFF
+READ_SIZE = 64 * 1024
+
+# fewer files are hashed serially, not worth starting the threads
+PARALLEL_HASH_MIN_FILES = 8
+# hashing releases the GIL while reading and for chunks over 2 KiB
+HASH_WORKERS = min(32, (os.cpu_count() or 1) * 2)
+
+
+def get_commit_info(repo_path=""):
+    """returns the last commit info of the repository, without the changes
+
+    ``HEAD`` is resolved through the loose and packed refs and the commit is
+    read from the loose objects or the memory-mapped packs, so no ``git``
+    process is run.
+    """
+
+    repo = find_repository(repo_path)
+    store = ObjectStore(os.path.join(repo.common_dir, "objects"))
+
+    try:
+        return _read_commit_info(repo, store)[0]
+    finally:
+        store.close()
+
+
+def get_commit_info_and_changes(repo_path="", stat_cache=False, prune_matcher=None,
+                                pruned_dirs=None, paths=None, timings=NO_TIMINGS,
+                                deadline=NO_DEADLINE, ignore_dirty_submodules=False):
+    """returns the last commit info and a generator
+    of the ``Change`` records of the repository
+
+    With ``stat_cache``, the results are recorded in ``.git/gitchecker-cache``
+    and only the paths whose stat data changed are examined again.
+    The directories whose paths all match ``prune_matcher`` are not walked
+    looking for untracked files and are appended to the ``pruned_dirs`` list.
+    With ``paths`` (normalized, relative to the repository root, not
+    supported with ``stat_cache``), only those subtrees are read from
+    ``HEAD``, stat'ed and walked.
+    With ``ignore_dirty_submodules``, the changes inside the submodules
+    are ignored, only their checked out commit is compared.
+    The phases are recorded in ``timings``, the last one when the generator ends.
+    The generator raises ``DeadlineExceeded`` once the ``deadline`` expires.
+    """
+
+    if stat_cache and paths:
+        raise ValueError("stat_cache can't be limited to paths")
+
+    repo = find_repository(repo_path)
+    store = ObjectStore(os.path.join(repo.common_dir, "objects"))
+    timings.lap(REPO_OPEN)
+
+    try:
+        commit_info, commit = _read_commit_info(repo, store)
+    except Exception:
+        store.close()
+        raise
+
+    timings.lap(COMMIT_INFO)
+
+    pruning = _Pruning(prune_matcher, pruned_dirs)
+
+    return commit_info, _iter_changes(repo, store, commit, stat_cache, pruning, _Scope(paths),
+                                      timings, deadline, ignore_dirty_submodules)
+
+
+class Snapshot:
+    """index of a repository, read once to examine its working tree one
+    path at a time instead of as a whole (the watcher refreshes the paths
+    reported by inotify with it)
+
+    The untracked files walk skips the directories whose paths all match
+    ``prune_matcher``.
+    """
+
+    def __init__(self, repo_path="", prune_matcher=None):
+        self.repo = find_repository(repo_path)
+        git_index = read_index(self.repo.git_dir)
+        self._options = _StatOptions(self.repo.config, (git_index.mtime_s, git_index.mtime_ns))
+        self._prune_matcher = prune_matcher
+        self._entries = {entry.path: entry for entry in _unique_entries(git_index.entries)}
+        self._paths = sorted(self._entries)
+        self._dirs = _tracked_dirs(self._paths)
+
+    def is_tracked(self, path):
+        """returns if ``path`` is a tracked file or submodule"""
+
+        return path in self._entries
+
+    def is_tracked_dir(self, rel_dir):
+        """returns if ``rel_dir`` contains tracked files"""
+
+        return rel_dir in self._dirs
+
+    def iter_tracked(self, rel_dir):
+        """yields the tracked paths under ``rel_dir``, in order"""
+
+        prefix = rel_dir + "/"
+        i = bisect_left(self._paths, prefix)
+        while i < len(self._paths) and self._paths[i].startswith(prefix):
+            yield self._paths[i]
+            i += 1
+
+    def is_unstaged(self, path):
+        """returns if the tracked ``path`` differs from its index entry"""
+
+        is_dirty, _ = _examine_entry(self.repo.worktree, self._entries[path], self._options)
+
+        return is_dirty
+
+    def iter_untracked(self, rel_dir, gitignore):
+        """yields the ``Change`` records of the untracked files under
+        ``rel_dir``, ``gitignore`` having the rules of its parents pushed"""
+
+        return _walk(self.repo.worktree, rel_dir, self._entries, self._dirs, gitignore,
+                     pruning=_Pruning(self._prune_matcher))
+
+
+def _read_commit_info(repo, store):
+    _, head_sha = read_head(repo)
+    commit = store.read_commit(head_sha)
+
+    commit_info = CommitInfo(store.abbreviate(commit.sha, SHORT_SHA_LENGTH),
+                             commit.author,
+                             commit.authored_datetime,
+                             commit.committer,
+                             commit.committed_datetime)
+
+    return commit_info, commit
+
+
+def _iter_changes(repo, store, commit, stat_cache=False, pruning=None, scope=None,
+                  timings=NO_TIMINGS, deadline=NO_DEADLINE, ignore_dirty_submodules=False):
+    scope = scope or _Scope()
+    try:
+        if stat_cache:
+            yield from _iter_cached_changes(repo, store, commit, pruning, timings, deadline,
+                                            ignore_dirty_submodules)
+        else:
+            git_index = read_index(repo.git_dir)
+            entries = scope.filter_entries(git_index.entries)
+            yield from _iter_staged(store, commit.tree, entries, scope,
+                                    _read_cache_tree(git_index), deadline)
+            timings.lap(STAGED)
+            yield from _iter_unstaged(repo, git_index, entries, deadline,
+                                      ignore_dirty_submodules)
+            timings.lap(UNSTAGED)
+            yield from _iter_untracked(repo,
+                                       (entry.path for entry in entries),
+                                       pruning=pruning,
+                                       scope=scope,
+                                       deadline=deadline)
+        timings.lap(UNTRACKED)
+    finally:
+        store.close()
+
+
+class _Scope:
+    """subtrees the check is limited to, the whole repository without ``paths``"""
+
+    def __init__(self, paths=None):
+        self.paths = paths
+        self._prefixes = tuple(path + "/" for path in paths) if paths else ()
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    def contains(self, path):
+        return not self.paths or path in self.paths or path.startswith(self._prefixes)
+
+    def leads_to(self, rel_dir):
+        """returns if ``rel_dir`` must be walked to reach the subtrees"""
+
+        return not self.paths or any(prefix.startswith(rel_dir + "/") for prefix in self._prefixes)
+
+    def filter_entries(self, entries):
+        if not self.paths:
+            return entries
+
+        return [entry for entry in entries if self.contains(entry.path)]
+
+
+class _Pruning:
+    """directories skipped by the untracked files walk"""
+
+    def __init__(self, matcher=None, pruned_dirs=None):
+        self.matcher = matcher
+        self.pruned_dirs = [] if pruned_dirs is None else pruned_dirs
+
+    def prunes(self, rel_dir):
+        if self.matcher is None or self.matcher.matches_dir(rel_dir) is not True:
+            return False
+
+        self.pruned_dirs.append(rel_dir + "/")
+        return True
+
+
+def _iter_cached_changes(repo, store, commit, pruning=None, timings=NO_TIMINGS,
+                         deadline=NO_DEADLINE, ignore_dirty_submodules=False):
+    index_key = path_key(os.path.join(repo.git_dir, "index"))
+    index_mtime = divmod(index_key[0], 10**9) if index_key else (0, 0)
+    options = _StatOptions(repo.config, index_mtime, ignore_dirty_submodules)
+    cache = StatCache.load(repo.git_dir, (commit.sha,
+                                          index_key,
+                                          repo.worktree,
+                                          repo.config.get("core.excludesfile"),
+                                          options.filemode,
+                                          options.trustctime,
+                                          options.check_ids))
+    git_index = _LazyIndex(repo.git_dir)
+
+    if cache.staged is None:
+        cache.set_staged(_iter_staged(store, commit.tree, git_index.entries,
+                                      cache_tree=_read_cache_tree(git_index.index),
+                                      deadline=deadline))
+
+    for change in cache.staged:
+        yield Change(*change)
+    timings.lap(STAGED)
+
+    if cache.files is None:
+        cache.files = {}
+        paths = [entry.path for entry in _unique_entries(git_index.entries)]
+    else:
+        paths = list(cache.files)
+
+    worktree_prefix = os.path.join(repo.worktree, "")
+    stale_entries = []
+    for path in deadline.checked(paths):
+        cached_key, is_dirty = cache.files.get(path, (False, None))
+        if not _is_cached_key_valid(worktree_prefix + path, cached_key):
+            stale_entries.append(git_index.get(path))
+        elif is_dirty:
+            yield Change(UNSTAGED, path)
+
+    for entry, is_dirty, key in _examine_entries(repo.worktree, stale_entries, options,
+                                                 deadline):
+        cache.set_file(entry.path, key, is_dirty)
+        if is_dirty:
+            yield Change(UNSTAGED, entry.path)
+    timings.lap(UNSTAGED)
+
+    yield from _iter_untracked(repo, paths, cache, pruning, deadline=deadline)
+
+    # not saved when stopped early
+    cache.save()
+
+
+def _is_cached_key_valid(path, cached_key):
+    if cached_key is CONSTANT:
+        return True
+
+    return cached_key is not False and path_key(path) == cached_key
+
+
+class _LazyIndex:
+    """the index, only read when an entry is needed"""
+
+    def __init__(self, git_dir):
+        self._git_dir = git_dir
+        self._index = None
+        self._by_path = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = read_index(self._git_dir)
+
+        return self._index
+
+    @property
+    def entries(self):
+        return self.index.entries
+
+    def get(self, path):
+        if self._by_path is None:
+            self._by_path = {entry.path: entry for entry in _unique_entries(self.entries)}
+
+        return self._by_path[path]
+
+
+def _read_cache_tree(git_index):
+    data = git_index.extensions.get(CACHE_TREE_EXTENSION)
+
+    return parse_cache_tree(data) if data else {}
+
+
+def _iter_staged(store, tree_sha, entries, scope=None, cache_tree=None, deadline=NO_DEADLINE):
+    unchanged_dirs = _UnchangedDirs()
+    head_files = {path: (mode, oid)
+                  for path, mode, oid in deadline.checked(
+                      _iter_head_files(store, tree_sha, scope, cache_tree or {}, unchanged_dirs))}
+
+    added = []
+    unmerged = set()
+    for entry in deadline.checked(entries):
+        if entry.stage:
+            head_files.pop(entry.path, None)
+            if entry.path not in unmerged:
+                unmerged.add(entry.path)
+                yield Change(STAGED, entry.path)
+            continue
+
+        if entry.intent_to_add or unchanged_dirs.contains(entry.path):
+            continue
+
+        head_file = head_files.pop(entry.path, None)
+        if head_file is None:
+            added.append(entry)
+        elif head_file != (entry.mode, entry.oid):
+            yield Change(STAGED, entry.path)
+
+    # like git, an added file with the same content as a deleted one is a rename
+    deleted_by_oid = {}
+    for path, (_, oid) in head_files.items():
+        deleted_by_oid.setdefault(oid, []).append(path)
+
+    for entry in added:
+        deleted_paths = deleted_by_oid.get(entry.oid)
+        if deleted_paths:
+            orig_path = deleted_paths.pop(0)
+            del head_files[orig_path]
+            yield Change(STAGED, entry.path, orig_path)
+        else:
+            yield Change(STAGED, entry.path)
+
+    for path in head_files:
+        yield Change(STAGED, path)
+
+
+def _iter_head_files(store, tree_sha, scope=None, cache_tree=None, unchanged_dirs=None):
+    """yields the files of the ``HEAD`` tree in the scope, only reading its
+    subtrees, except the ones in ``cache_tree``, added to ``unchanged_dirs``"""
+
+    cache_tree = cache_tree or {}
+
+    def skip_tree(path, oid):
+        if cache_tree.get(path) != oid:
+            return False
+
+        if unchanged_dirs is not None:
+            unchanged_dirs.add(path)
+        return True
+
+    if not scope:
+        if not skip_tree("", tree_sha):
+            yield from store.iter_tree_files(tree_sha, skip_tree=skip_tree)
+        return
+
+    for path in scope.paths:
+        entry = store.find_tree_entry(tree_sha, path)
+        if entry is None:
+            continue
+
+        if entry.mode != TREE_MODE:
+            yield path, entry.mode, entry.oid
+        elif not skip_tree(path, entry.oid):
+            yield from store.iter_tree_files(entry.oid, path + "/", skip_tree)
+
+
+class _UnchangedDirs:
+    """directories whose index entries are the files of their ``HEAD`` tree"""
+
+    def __init__(self):
+        self._dirs = set()
+        # the entries of a directory are consecutive in the index
+        self._last_parent = None
+        self._is_last_parent_unchanged = False
+
+    def add(self, rel_dir):
+        self._dirs.add(rel_dir)
+
+    def contains(self, path):
+        if not self._dirs:
+            return False
+
+        parent = path.rpartition("/")[0]
+        if parent != self._last_parent:
+            self._last_parent = parent
+            self._is_last_parent_unchanged = self._contains_dir(parent)
+
+        return self._is_last_parent_unchanged
+
+    def _contains_dir(self, rel_dir):
+        while rel_dir not in self._dirs:
+            if not rel_dir:
+                return False
+            rel_dir = rel_dir.rpartition("/")[0]
+
+        return True
+
+
+def _iter_unstaged(repo, git_index, entries=None, deadline=NO_DEADLINE,
+                   ignore_dirty_submodules=False):
+    options = _StatOptions(repo.config, (git_index.mtime_s, git_index.mtime_ns),
+                           ignore_dirty_submodules)
+
+    entries = _unique_entries(git_index.entries if entries is None else entries)
+    for entry, is_dirty, _ in _examine_entries(repo.worktree, entries, options, deadline):
+        if is_dirty:
+            yield Change(UNSTAGED, entry.path)
+
+
+def _unique_entries(entries):
+    """skips all but the first stage of the unmerged entries"""
+
+    previous_path = None
+    for entry in entries:
+        if entry.path != previous_path:
+            yield entry
+        previous_path = entry.path
+
+
+class _StatOptions:
+
+    def __init__(self, config, index_mtime, ignore_dirty_submodules=False):
+        self.filemode = config_bool(config, "core.filemode", True)
+        self.trustctime = config_bool(config, "core.trustctime", True)
+        self.check_ids = config.get("core.checkstat", "default") != "minimal"
+        self.index_mtime = index_mtime
+        self.ignore_dirty_submodules = ignore_dirty_submodules
+
+
+def _examine_entries(worktree, entries, options, deadline=NO_DEADLINE):
+    """yields the ``(entry, is_dirty, key)`` of each entry, like
+    ``_examine_entry()``, the ones whose content is hashed coming last"""
+
+    to_hash = []
+    for entry in deadline.checked(entries):
+        is_dirty, key, st = _examine_entry_stat(worktree, entry, options)
+        if is_dirty is None:
+            to_hash.append((entry, key, st))
+        else:
+            yield entry, is_dirty, key
+
+    paths = [os.path.join(worktree, entry.path) for entry, _, _ in to_hash]
+    stats = [st for _, _, st in to_hash]
+    for (entry, key, _), sha in zip(deadline.checked(to_hash), _hash_blobs(paths, stats)):
+        yield entry, sha != entry.oid, key
+
+
+def _examine_entry(worktree, entry, options):
+    """returns if the entry is unstaged and the stat key of its file"""
+
+    is_dirty, key, st = _examine_entry_stat(worktree, entry, options)
+    if is_dirty is None:
+        is_dirty = _hash_file(os.path.join(worktree, entry.path), st) != entry.oid
+
+    return is_dirty, key
+
+
+def _examine_entry_stat(worktree, entry, options):
+    """returns if the entry is unstaged, or ``None`` if only its content
+    can tell, the stat key of its file and its stat result"""
+
+    if entry.stage or entry.intent_to_add:
+        return True, CONSTANT, None
+
+    if entry.assume_valid or entry.skip_worktree:
+        return False, CONSTANT, None
+
+    path = os.path.join(worktree, entry.path)
+    try:
+        st = os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return True, MISSING, None
+
+    if entry.mode == GITLINK_MODE:
+        # the submodule HEAD moves without changing the stat data, never cached
+        return _is_gitlink_modified(path, entry, st, options), False, st
+
+    return _is_modified(entry, st, options), stat_key(st), st
+
+
+def _is_gitlink_modified(path, entry, st, options):
+    """returns if the submodule at ``path`` doesn't have the commit of its
+    gitlink checked out or, unless ``options.ignore_dirty_submodules``, it
+    has changes of its own"""
+
+    if not stat.S_ISDIR(st.st_mode):
+        return True
+
+    # not initialized (or not checked out) submodules are empty directories
+    if not os.path.lexists(os.path.join(path, ".git")):
+        return False
+
+    _, head_sha = read_head(find_repository(path))
+    if head_sha != entry.oid:
+        return True
+
+    return not options.ignore_dirty_submodules and _has_changes(path)
+
+
+def _has_changes(repo_path):
+    """returns if the repository has any staged, unstaged or untracked
+    change, stopping at the first one"""
+
+    _, changes = get_commit_info_and_changes(repo_path)
+    try:
+        return next(changes, None) is not None
+    finally:
+        changes.close()
+
+
+def _is_modified(entry, st, options):
+    """returns if the file is modified, or ``None`` if it must be hashed"""
+
+    if stat.S_IFMT(entry.mode) != stat.S_IFMT(st.st_mode):
+        return True
+
+    if (options.filemode and stat.S_ISREG(st.st_mode) and
+            bool(entry.mode & stat.S_IXUSR) != bool(st.st_mode & stat.S_IXUSR)):
+        return True
+
+    if not _stat_changed(entry, st, options) and not _is_racy(entry, options):
+        return False
+
+    if entry.size and entry.size != st.st_size & STAT_MASK:
+        return True
+
+    return None
+
+
+def _stat_changed(entry, st, options):
+    if (entry.mtime_s, entry.mtime_ns) != divmod(st.st_mtime_ns, 10**9):
+        return True
+
+    if options.trustctime and (entry.ctime_s, entry.ctime_ns) != divmod(st.st_ctime_ns, 10**9):
+        return True
+
+    if options.check_ids and (entry.ino != st.st_ino & STAT_MASK or
+                              entry.uid != st.st_uid & STAT_MASK or
+                              entry.gid != st.st_gid & STAT_MASK):
+        return True
+
+    return entry.size != st.st_size & STAT_MASK
+
+
+def _is_racy(entry, options):
+    return options.index_mtime <= (entry.mtime_s, entry.mtime_ns)
+
+
+def hash_blob(path, st):
+    """returns the GIT blob SHA of the file (or symlink) at ``path``"""
+
+    if stat.S_ISLNK(st.st_mode):
+        data = os.fsencode(os.readlink(path))
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    # chunked unbuffered reads rather than mmap: a working tree file can be
+    # truncated while it's read, which is a SIGBUS with mmap
+    sha = hashlib.sha1(b"blob %d\0" % st.st_size)
+    with open(path, "rb", buffering=0) as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def _hash_file(path, st):
+    """returns the blob SHA of a working tree file, ``None`` if it can't be
+    read anymore (deleted or replaced since its ``lstat()``), which makes it
+    unstaged like ``git`` does"""
+
+    try:
+        return hash_blob(path, st)
+    except OSError:
+        return None
+
+
+def _hash_blobs(paths, stats):
+    """yields the blob SHAs of the files, in order, hashed in parallel if
+    there are many"""
+
+    if len(paths) < PARALLEL_HASH_MIN_FILES:
+        yield from map(_hash_file, paths, stats)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(paths)))
+    futures = [executor.submit(_hash_file, path, st) for path, st in zip(paths, stats)]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # stopped early (fail fast or an error): the pending files aren't hashed
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _iter_untracked(repo, tracked_paths, cache=None, pruning=None, scope=None,
+                    deadline=NO_DEADLINE):
+    tracked = set(tracked_paths)
+    tracked_dirs = _tracked_dirs(tracked)
+
+    gitignore = GitIgnore(repo)
+    yield from _walk(repo.worktree, "", tracked, tracked_dirs, gitignore, cache,
+                     pruning or _Pruning(), scope or _Scope(), deadline)
+
+    if cache is not None:
+        for path in gitignore.read_paths:
+            cache.set_ignore_file(path, path_key(path))
+
+
+def _tracked_dirs(tracked_paths):
+    tracked_dirs = set()
+    for path in tracked_paths:
+        parent = path.rpartition("/")[0]
+        while parent and parent not in tracked_dirs:
+            tracked_dirs.add(parent)
+            parent = parent.rpartition("/")[0]
+
+    return tracked_dirs
+
+
+def _walk(worktree, rel_dir, tracked, tracked_dirs, gitignore, cache=None, pruning=None,
+          scope=None, deadline=NO_DEADLINE):
+    if pruning is None:
+        pruning = _Pruning()
+    if scope is None:
+        scope = _Scope()
+
+    deadline.check()
+
+    gitignore.push(rel_dir)
+    dir_path = os.path.join(worktree, rel_dir)
+
+    if cache is not None:
+        dir_key = path_key(dir_path)
+        cached_dir = cache.dirs.get(rel_dir)
+        if cached_dir and cached_dir[0] == dir_key:
+            # no entry was added or removed: only the subdirectories can have changed
+            for name in cached_dir[1]:
+                path = rel_dir + "/" + name if rel_dir else name
+                if not pruning.prunes(path):
+                    yield from _walk(worktree, path, tracked, tracked_dirs, gitignore, cache,
+                                     pruning, scope, deadline)
+            gitignore.pop()
+            return
+
+    try:
+        dir_entries = list(os.scandir(dir_path))
+    except OSError:
+        dir_entries = []
+
+    subdirs = []
+    has_untracked = False
+    for dir_entry in dir_entries:
+        if dir_entry.name == ".git":
+            continue
+
+        path = rel_dir + "/" + dir_entry.name if rel_dir else dir_entry.name
+        if path in tracked:
+            continue
+
+        # out of the scope, unless on the way to it: not even stat'ed
+        is_in_scope = scope.contains(path)
+        if not is_in_scope and not scope.leads_to(path):
+            continue
+
+        if dir_entry.is_dir(follow_symlinks=False):
+            if gitignore.is_ignored(path, True):
+                continue
+
+            if path not in tracked_dirs and os.path.lexists(os.path.join(dir_entry.path, ".git")):
+                # nested repository, reported as a whole like git does
+                has_untracked = True
+                if is_in_scope and not pruning.prunes(path):
+                    yield Change(UNTRACKED, path + "/")
+            elif pruning.prunes(path):
+                # still cached as a subdirectory: the next check may not prune it
+                subdirs.append(dir_entry.name)
+            else:
+                subdirs.append(dir_entry.name)
+                yield from _walk(worktree, path, tracked, tracked_dirs, gitignore, cache,
+                                 pruning, scope, deadline)
+
+        elif is_in_scope and not gitignore.is_ignored(path, False):
+            has_untracked = True
+            yield Change(UNTRACKED, path)
+
+    if cache is not None:
+        cache.set_dir(rel_dir, None if has_untracked else dir_key, subdirs)
+
+    gitignore.pop()
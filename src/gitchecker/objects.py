@@ -0,0 +1,421 @@
+"""
+Reader of GIT objects from loose object files and packfiles
+
+The ``.idx`` and ``.pack`` files are memory-mapped, so finding an object is
+a binary search in the mapped index and reading it only touches its pages.
+
+See https://git-scm.com/docs/pack-format
+"""
+
+import glob
+import mmap
+import os
+import struct
+import zlib
+from collections import namedtuple, OrderedDict
+
+from gitchecker.status import _git_datetime
+
+
+Commit = namedtuple("Commit", ["sha",
+                               "tree",
+                               "parents",
+                               "author",
+                               "authored_datetime",
+                               "committer",
+                               "committed_datetime"])
+
+TreeEntry = namedtuple("TreeEntry", ["mode", "name", "oid"])
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NAMES = {b"commit": OBJ_COMMIT, b"tree": OBJ_TREE, b"blob": OBJ_BLOB, b"tag": OBJ_TAG}
+
+TREE_MODE = 0o040000
+
+IDX_SIGNATURE = b"\377tOc"
+IDX_HEADER = struct.Struct(">4sL")
+IDX_FANOUT = struct.Struct(">256L")
+IDX_OFFSET = struct.Struct(">L")
+IDX_LARGE_OFFSET = struct.Struct(">Q")
+IDX_LARGE_OFFSET_FLAG = 0x80000000
+
+HASH_SIZE = 20
+READ_SIZE = 16 * 1024
+DELTA_CACHE_SIZE = 256
+
+
+class ObjectStore:
+    """reads objects from ``objects_dir``, its alternates and their packs"""
+
+    def __init__(self, objects_dir):
+        self.objects_dirs = [objects_dir] + _read_alternates(objects_dir)
+        self._packs = None
+
+    @property
+    def packs(self):
+        if self._packs is None:
+            self._packs = [_Pack(idx_path)
+                           for objects_dir in self.objects_dirs
+                           for idx_path in sorted(glob.glob(os.path.join(objects_dir,
+                                                                         "pack",
+                                                                         "*.idx")))]
+        return self._packs
+
+    def close(self):
+        for pack in self._packs or []:
+            pack.close()
+
+        self._packs = None
+
+    def read(self, sha):
+        """returns the ``(type, data)`` of the object ``sha``"""
+
+        for objects_dir in self.objects_dirs:
+            try:
+                with open(os.path.join(objects_dir, sha[:2], sha[2:]), "rb") as f:
+                    return _parse_loose_object(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                pass
+
+        binsha = bytes.fromhex(sha)
+        for pack in self.packs:
+            offset = pack.find_offset(binsha)
+            if offset is not None:
+                return pack.read_object(offset, self)
+
+        raise Exception("Object {} not found".format(sha))
+
+    def abbreviate(self, sha, min_length=7):
+        """returns the shortest prefix of ``sha``, of at least ``min_length``
+        hex digits, that no other object of the store shares (like
+        ``git rev-parse --short``)"""
+
+        longest_shared = 0
+        for objects_dir in self.objects_dirs:
+            try:
+                names = os.listdir(os.path.join(objects_dir, sha[:2]))
+            except OSError:
+                continue
+
+            for name in names:
+                if name != sha[2:] and len(name) == 2 * HASH_SIZE - 2:
+                    longest_shared = max(longest_shared,
+                                         2 + len(os.path.commonprefix([name, sha[2:]])))
+
+        binsha = bytes.fromhex(sha)
+        for pack in self.packs:
+            longest_shared = max(longest_shared, pack.longest_shared_prefix(binsha))
+
+        return sha[:max(min_length, longest_shared + 1)]
+
+    def read_commit(self, sha):
+        obj_type, data = self.read(sha)
+        if obj_type != OBJ_COMMIT:
+            raise Exception("Object {} is not a commit".format(sha))
+
+        return parse_commit(sha, data)
+
+    def read_tree(self, sha):
+        obj_type, data = self.read(sha)
+        if obj_type != OBJ_TREE:
+            raise Exception("Object {} is not a tree".format(sha))
+
+        return parse_tree(data)
+
+    def find_tree_entry(self, sha, path):
+        """returns the ``TreeEntry`` at the ``/`` separated ``path`` under
+        the tree ``sha``, ``None`` if there isn't any"""
+
+        entry = None
+        for name in path.split("/"):
+            if entry is not None:
+                if entry.mode != TREE_MODE:
+                    return None
+                sha = entry.oid
+
+            entry = next((child for child in self.read_tree(sha) if child.name == name), None)
+            if entry is None:
+                return None
+
+        return entry
+
+    def iter_tree_files(self, sha, prefix="", skip_tree=None):
+        """yields ``(path, mode, oid)`` of every non-tree entry of the tree
+        ``sha``, recursively, without reading the subtrees for which
+        ``skip_tree(path, oid)`` is true"""
+
+        for entry in self.read_tree(sha):
+            path = prefix + entry.name
+            if entry.mode != TREE_MODE:
+                yield path, entry.mode, entry.oid
+            elif skip_tree is None or not skip_tree(path, entry.oid):
+                yield from self.iter_tree_files(entry.oid, path + "/", skip_tree)
+
+
+def _read_alternates(objects_dir):
+    try:
+        with open(os.path.join(objects_dir, "info", "alternates")) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+
+    return [os.path.normpath(os.path.join(objects_dir, line.strip()))
+            for line in lines
+            if line.strip() and not line.startswith("#")]
+
+
+def _parse_loose_object(raw):
+    header, _, data = raw.partition(b"\0")
+    type_name, _, _ = header.partition(b" ")
+
+    return TYPE_NAMES[type_name], data
+
+
+def parse_commit(sha, data):
+    headers, _, _ = data.partition(b"\n\n")
+
+    tree = None
+    parents = []
+    people = {}
+    for line in headers.split(b"\n"):
+        key, _, value = line.partition(b" ")
+        if key == b"tree":
+            tree = value.decode()
+        elif key == b"parent":
+            parents.append(value.decode())
+        elif key in (b"author", b"committer"):
+            people[key] = _parse_person(value)
+
+    author, authored_datetime = people[b"author"]
+    committer, committed_datetime = people[b"committer"]
+
+    return Commit(sha, tree, parents, author, authored_datetime, committer, committed_datetime)
+
+
+def _parse_person(value):
+    ident, timestamp, tz_offset = value.rsplit(b" ", 2)
+    name = ident[:ident.rfind(b"<")].strip().decode(errors="replace")
+
+    return name, _git_datetime(timestamp, tz_offset.decode())
+
+
+def parse_tree(data):
+    entries = []
+    offset = 0
+    while offset < len(data):
+        name_end = data.index(b"\0", offset)
+        mode, _, name = data[offset:name_end].partition(b" ")
+        oid = data[name_end + 1:name_end + 1 + HASH_SIZE].hex()
+        entries.append(TreeEntry(int(mode, 8), os.fsdecode(name), oid))
+        offset = name_end + 1 + HASH_SIZE
+
+    return entries
+
+
+class _Pack:
+    """a memory-mapped ``.pack`` file and its version 2 ``.idx`` file"""
+
+    def __init__(self, idx_path):
+        self._idx = _map_file(idx_path)
+
+        signature, version = IDX_HEADER.unpack_from(self._idx, 0)
+        if signature != IDX_SIGNATURE or version != 2:
+            self._idx.close()
+            raise Exception("Unsupported pack index: {}".format(idx_path))
+
+        self._fanout = IDX_FANOUT.unpack_from(self._idx, IDX_HEADER.size)
+        self.count = self._fanout[-1]
+        self._names_offset = IDX_HEADER.size + IDX_FANOUT.size
+        self._offsets_offset = self._names_offset + self.count * (HASH_SIZE + 4)
+        self._large_offsets_offset = self._offsets_offset + self.count * 4
+
+        self.pack_path = idx_path[:-len(".idx")] + ".pack"
+        self._pack = None
+        self._cache = OrderedDict()
+
+    def close(self):
+        for mapped in (self._idx, self._pack):
+            if mapped is not None:
+                mapped.close()
+
+        self._idx = self._pack = None
+
+    def find_offset(self, binsha):
+        """binary searches ``binsha`` in the index, returning
+        its offset in the pack or ``None``"""
+
+        position = self._lower_bound(binsha)
+        if position < self.count and self._name(position) == binsha:
+            return self._object_offset(position)
+
+        return None
+
+    def longest_shared_prefix(self, binsha):
+        """returns the length of the longest hex prefix that
+        ``binsha`` shares with another object of the pack"""
+
+        position = self._lower_bound(binsha)
+        next_position = position
+        if position < self.count and self._name(position) == binsha:
+            next_position += 1
+
+        longest = 0
+        for neighbor in (position - 1, next_position):
+            if 0 <= neighbor < self.count:
+                longest = max(longest, _shared_hex_prefix(binsha, self._name(neighbor)))
+
+        return longest
+
+    def _lower_bound(self, binsha):
+        # the names sharing the first byte are between its fanout entries
+        first_byte = binsha[0]
+        low = self._fanout[first_byte - 1] if first_byte else 0
+        high = self._fanout[first_byte]
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(middle) < binsha:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _name(self, position):
+        name_offset = self._names_offset + position * HASH_SIZE
+        return self._idx[name_offset:name_offset + HASH_SIZE]
+
+    def _object_offset(self, position):
+        offset = IDX_OFFSET.unpack_from(self._idx, self._offsets_offset + position * 4)[0]
+        if offset & IDX_LARGE_OFFSET_FLAG:
+            large_position = offset & ~IDX_LARGE_OFFSET_FLAG
+            offset = IDX_LARGE_OFFSET.unpack_from(self._idx,
+                                                  self._large_offsets_offset +
+                                                  large_position * 8)[0]
+        return offset
+
+    def read_object(self, offset, store):
+        """returns the ``(type, data)`` of the object at ``offset``,
+        resolving deltas against their base objects"""
+
+        if offset in self._cache:
+            self._cache.move_to_end(offset)
+            return self._cache[offset]
+
+        obj_type, data_offset, base = self._read_header(offset)
+        data = self._inflate(data_offset)
+
+        if obj_type == OBJ_OFS_DELTA:
+            obj_type, base_data = self.read_object(base, store)
+            data = _apply_delta(base_data, data)
+        elif obj_type == OBJ_REF_DELTA:
+            obj_type, base_data = store.read(base)
+            data = _apply_delta(base_data, data)
+
+        self._cache[offset] = (obj_type, data)
+        if len(self._cache) > DELTA_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+        return obj_type, data
+
+    def _read(self, offset, size):
+        if self._pack is None:
+            self._pack = _map_file(self.pack_path)
+
+        return self._pack[offset:offset + size]
+
+    def _read_header(self, offset):
+        header = self._read(offset, 32)
+        byte = header[0]
+        obj_type = (byte >> 4) & 0x07
+        position = 1
+        while byte & 0x80:
+            byte = header[position]
+            position += 1
+
+        base = None
+        if obj_type == OBJ_OFS_DELTA:
+            byte = header[position]
+            position += 1
+            relative_offset = byte & 0x7F
+            while byte & 0x80:
+                byte = header[position]
+                position += 1
+                relative_offset = ((relative_offset + 1) << 7) | (byte & 0x7F)
+            base = offset - relative_offset
+        elif obj_type == OBJ_REF_DELTA:
+            base = header[position:position + HASH_SIZE].hex()
+            position += HASH_SIZE
+
+        return obj_type, offset + position, base
+
+    def _inflate(self, offset):
+        decompressor = zlib.decompressobj()
+        chunks = []
+        while not decompressor.eof:
+            compressed = self._read(offset, READ_SIZE)
+            if not compressed:
+                raise Exception("Truncated pack file: {}".format(self.pack_path))
+            chunks.append(decompressor.decompress(compressed))
+            offset += len(compressed)
+
+        return b"".join(chunks)
+
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _shared_hex_prefix(binsha, other):
+    for i, (byte, other_byte) in enumerate(zip(binsha, other)):
+        if byte != other_byte:
+            return 2 * i + (byte >> 4 == other_byte >> 4)
+
+    return 2 * len(binsha)
+
+
+def _apply_delta(base, delta):
+    _, position = _read_delta_size(delta, 0)
+    _, position = _read_delta_size(delta, position)
+
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+
+        if opcode & 0x80:
+            copy_offset = copy_size = 0
+            for shift in range(4):
+                if opcode & (0x01 << shift):
+                    copy_offset |= delta[position] << (shift * 8)
+                    position += 1
+            for shift in range(3):
+                if opcode & (0x10 << shift):
+                    copy_size |= delta[position] << (shift * 8)
+                    position += 1
+            result += base[copy_offset:copy_offset + (copy_size or 0x10000)]
+        elif opcode:
+            result += delta[position:position + opcode]
+            position += opcode
+        else:
+            raise Exception("Invalid delta opcode")
+
+    return bytes(result)
+
+
+def _read_delta_size(delta, position):
+    size = shift = 0
+    while True:
+        byte = delta[position]
+        position += 1
+        size |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, position
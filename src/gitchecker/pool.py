@@ -0,0 +1,150 @@
+"""
+Process-wide pool of GitPython ``Repo`` handles of the ``"gitpython"`` engine
+
+Creating a ``Repo`` reads its config and, on the first object read, spawns
+the ``git cat-file --batch`` and ``--batch-check`` workers that GitPython
+keeps alive for the lifetime of the handle. The pool keeps the idle handles
+of the most recently checked repositories, keyed by their resolved path, so
+the next checks reuse them and their workers instead of paying those costs
+again. A handle is discarded when ``HEAD`` or the index of its repository
+moved since it was created, and the least recently used ones are closed
+when the pool holds more than ``max_size``.
+
+A handle is only used by one check at a time: concurrent checks of the same
+repository get their own handles.
+"""
+
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from git import Repo  # http://gitpython.readthedocs.io/
+
+from gitchecker.statcache import path_key
+
+
+DEFAULT_MAX_SIZE = 16
+
+
+class RepoPool:
+    """LRU pool of the idle ``Repo`` handles, see the module doc
+
+    Args:
+        max_size (int): Maximum number of idle handles kept open.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # {resolved path: [idle handles, the most recently used last]}
+        self._idle = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(handles) for handles in self._idle.values())
+
+    def acquire(self, repo_path=""):
+        """returns an idle handle of ``repo_path``, or a new one, whose
+        ``repo`` is used until it's given back with ``release()``"""
+
+        key = os.path.realpath(repo_path or os.curdir)
+
+        return self._take(key) or _RepoHandle(repo_path, key)
+
+    def release(self, handle, discard=False):
+        """returns the handle to the pool, or closes it if ``discard``
+        (e.g. it may be in an inconsistent state after an error)"""
+
+        if discard:
+            handle.close()
+        else:
+            self._put(handle.key, handle)
+
+    @contextmanager
+    def repo(self, repo_path=""):
+        """context manager lending a ``Repo`` of ``repo_path``, returned to
+        the pool on exit unless an exception was raised"""
+
+        handle = self.acquire(repo_path)
+
+        try:
+            yield handle.repo
+        except BaseException:
+            self.release(handle, discard=True)
+            raise
+
+        self.release(handle)
+
+    def close(self):
+        """closes all the idle handles"""
+
+        with self._lock:
+            handles = [handle for handles in self._idle.values() for handle in handles]
+            self._idle.clear()
+
+        for handle in handles:
+            handle.close()
+
+    def _take(self, key):
+        stale = []
+        with self._lock:
+            handles = self._idle.get(key, [])
+            while handles:
+                handle = handles.pop()
+                if handle.is_valid():
+                    break
+                stale.append(handle)
+            else:
+                handle = None
+
+            if not handles:
+                self._idle.pop(key, None)
+
+        for stale_handle in stale:
+            stale_handle.close()
+
+        return handle
+
+    def _put(self, key, handle):
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(handle)
+            self._idle.move_to_end(key)
+
+            idle_count = sum(len(handles) for handles in self._idle.values())
+            while idle_count > self.max_size:
+                oldest_key, handles = next(iter(self._idle.items()))
+                evicted.append(handles.pop(0))
+                if not handles:
+                    del self._idle[oldest_key]
+                idle_count -= 1
+
+        for evicted_handle in evicted:
+            evicted_handle.close()
+
+
+class _RepoHandle:
+    """a ``Repo`` and the stat data of its ``HEAD`` and index when created"""
+
+    def __init__(self, repo_path, key):
+        self.repo = Repo(repo_path)
+        self.key = key
+        self._key = self._stat_key()
+
+    def is_valid(self):
+        return self._key == self._stat_key()
+
+    def close(self):
+        self.repo.close()
+
+    def _stat_key(self):
+        git_dir = self.repo.git_dir
+
+        return (path_key(os.path.join(git_dir, "HEAD")),
+                path_key(os.path.join(git_dir, "index")))
+
+
+repo_pool = RepoPool()
+atexit.register(repo_pool.close)
@@ -0,0 +1,367 @@
+"""
+``git status --porcelain=v2`` engine
+
+Gets the staged, unstaged and untracked entries from a single
+``git status --porcelain=v2 -z`` process, parsing its output as a
+stream instead of building GitPython ``Diff`` objects. The last commit info
+is read by one ``git log`` process that runs concurrently with the status.
+``get_commit_info_and_changes_async()`` does the same with asyncio
+subprocesses, without blocking the event loop.
+
+The directories fully matched by the ``ignore_files_regex`` patterns are
+excluded with ``:(exclude)`` pathspecs and the check is limited to its
+``paths`` with pathspecs too, so ``git`` never walks the rest.
+
+With ``ignore_dirty_submodules``, a submodule is only changed when its
+``HEAD`` isn't the commit recorded by the superproject, its own changes
+being counted by the check of the submodule.
+
+With a ``deadline``, the ``git`` processes still running when it expires
+are killed.
+
+``get_refs_commit_info()`` reads the commit info of many refs from a single
+``git for-each-ref`` stream, one line per ref.
+"""
+
+import os
+import subprocess
+
+from gitchecker.deadline import NO_DEADLINE
+from gitchecker.repository import find_worktree
+from gitchecker.status import (Change, CommitInfo, COMMIT_INFO, STAGED, STATUS, UNSTAGED,
+                               UNTRACKED, _git_datetime)
+from gitchecker.timings import NO_TIMINGS
+
+
+CHUNK_SIZE = 64 * 1024
+
+# paths relative to the repository root, even when run from a subdirectory
+GIT_OPTIONS = ["-c", "status.relativePaths=false"]
+
+INCLUDE_PATHSPEC_MAGIC = ":(top,literal)"
+EXCLUDE_PATHSPEC_MAGIC = ":(top,exclude,literal)"
+
+STATUS_ARGS = ["status", "--porcelain=v2", "-z", "--untracked-files=all"]
+
+IGNORE_DIRTY_SUBMODULES_ARGS = ["--ignore-submodules=dirty"]
+
+COMMIT_ARGS = ["log", "-1", "--no-show-signature", "--no-color", "--abbrev=7",
+               "--format=%h%x00%an%x00%at%x00%ai%x00%cn%x00%ct%x00%ci", "HEAD"]
+
+DEFAULT_REF_PATTERNS = ["refs/heads", "refs/tags"]
+
+# the fields of the ref object and, prefixed by "*", of the commit an annotated tag points to
+REF_FIELDS = ["objecttype", "objectname:short=7", "authorname", "authordate:raw",
+              "committername", "committerdate:raw"]
+REFS_ARGS = ["for-each-ref", "--format=%(refname)" + "".join(
+    "%00%({}{})".format(peeled, field) for peeled in ["", "*"] for field in REF_FIELDS)]
+
+
+def get_commit_info_and_changes(repo_path="", prune_matcher=None, pruned_dirs=None,
+                                paths=None, timings=NO_TIMINGS, deadline=NO_DEADLINE,
+                                ignore_dirty_submodules=False):
+    """starts ``git log`` and ``git status`` and returns the last commit info
+    and a generator of ``Change`` records parsed from the status stream
+
+    The directories whose paths all match ``prune_matcher`` are not walked
+    and, if they exist, they are appended to the ``pruned_dirs`` list.
+    With ``paths`` (normalized, relative to the repository root), only
+    those subtrees are checked.
+    With ``ignore_dirty_submodules``, the changes inside the submodules
+    are ignored, only their checked out commit is compared.
+    The whole ``git status`` is recorded in ``timings`` as a single phase.
+    Both processes are killed when the ``deadline`` expires.
+    """
+
+    status_args = _status_args(repo_path, prune_matcher, pruned_dirs, paths,
+                               ignore_dirty_submodules)
+    commit_proc = _popen_git(repo_path, COMMIT_ARGS)
+    status_proc = _popen_git(repo_path, status_args)
+
+    try:
+        commit_info = _read_commit_info(commit_proc, deadline)
+    except Exception:
+        _close_git(status_proc, kill=True)
+        raise
+
+    timings.lap(COMMIT_INFO)
+
+    return commit_info, _iter_changes(status_proc, _StatusParser(), timings, deadline)
+
+
+async def get_commit_info_and_changes_async(repo_path="", prune_matcher=None, pruned_dirs=None,
+                                            paths=None, timings=NO_TIMINGS,
+                                            deadline=NO_DEADLINE,
+                                            ignore_dirty_submodules=False):
+    """asyncio version of ``get_commit_info_and_changes()``,
+    the changes are returned as an async generator"""
+
+    status_args = _status_args(repo_path, prune_matcher, pruned_dirs, paths,
+                               ignore_dirty_submodules)
+    commit_proc = await _create_git_subprocess(repo_path, COMMIT_ARGS)
+    status_proc = await _create_git_subprocess(repo_path, status_args)
+
+    try:
+        stdout, stderr = await _communicate_async(commit_proc, deadline)
+        _check_git_result(COMMIT_ARGS, commit_proc.returncode, stderr)
+        commit_info = _parse_commit_info(stdout)
+    except BaseException:
+        await _close_git_async(status_proc, kill=True)
+        raise
+
+    timings.lap(COMMIT_INFO)
+
+    return commit_info, _aiter_changes(status_proc, _StatusParser(), timings, deadline)
+
+
+def get_refs_commit_info(repo_path="", patterns=None):
+    """returns the commit info of many refs at once, read from a single
+    ``git for-each-ref`` stream
+
+    The output is parsed as it's read, one line per ref, so it scales to
+    repositories with tens of thousands of tags. Annotated tags are peeled
+    to the commit they point to and the refs of any other object (e.g. a
+    tag of a tree) are left out.
+
+    Args:
+        repo_path (string): GIT repository path.
+        patterns (string or list): ``git for-each-ref`` patterns, full ref
+            prefixes like ``"refs/tags"`` or globs like
+            ``"refs/heads/release-*"``. By default, the branches and tags.
+    Returns:
+        (dict) For each ref name (e.g. ``"refs/tags/v1.0"``), sorted, the
+            ``CommitInfo`` of the commit it points to.
+    """
+
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    args = REFS_ARGS + ["--"] + list(patterns or DEFAULT_REF_PATTERNS)
+    proc = _popen_git(repo_path, args)
+    completed = False
+    try:
+        refs = dict(ref for ref in map(_parse_ref_commit_info, proc.stdout) if ref)
+        completed = True
+    finally:
+        stderr = _close_git(proc, kill=not completed)
+
+    _check_git(proc, stderr)
+
+    return refs
+
+
+def _parse_ref_commit_info(line):
+    """returns the ``(ref name, CommitInfo)`` pair of a ``REFS_ARGS`` output
+    line, None if the ref doesn't point to a commit"""
+
+    fields = line.rstrip(b"\n").decode(errors="replace").split("\0")
+    ref = fields[0]
+    # a peeled annotated tag has its own fields empty but the commit ones
+    for start in (7, 1):
+        object_type, sha, author, authored, committer, committed = fields[start:start + 6]
+        if object_type == "commit":
+            return ref, CommitInfo(sha,
+                                   author,
+                                   _git_datetime(*authored.split(" ")),
+                                   committer,
+                                   _git_datetime(*committed.split(" ")))
+
+    return None
+
+
+def _status_args(repo_path, prune_matcher, pruned_dirs, paths=None,
+                 ignore_dirty_submodules=False):
+    args = STATUS_ARGS + IGNORE_DIRTY_SUBMODULES_ARGS if ignore_dirty_submodules else STATUS_ARGS
+
+    return args + _pathspec_args(repo_path, prune_matcher, pruned_dirs, paths)
+
+
+def _pathspec_args(repo_path, prune_matcher, pruned_dirs, paths=None):
+    """returns the pathspecs limiting the check to ``paths`` and excluding
+    the directories fully matched by ``prune_matcher``, appending the
+    existing ones to ``pruned_dirs``"""
+
+    pathspecs = [INCLUDE_PATHSPEC_MAGIC + path for path in paths or ()]
+
+    dir_prefixes = prune_matcher.dir_prefixes() if prune_matcher else []
+    if dir_prefixes and pruned_dirs is not None:
+        worktree = find_worktree(repo_path)
+        pruned_dirs.extend(dir_prefix for dir_prefix in dir_prefixes
+                           if os.path.isdir(os.path.join(worktree, dir_prefix)))
+    pathspecs += [EXCLUDE_PATHSPEC_MAGIC + dir_prefix for dir_prefix in dir_prefixes]
+
+    return ["--"] + pathspecs if pathspecs else []
+
+
+def _popen_git(repo_path, args):
+    return subprocess.Popen(["git"] + GIT_OPTIONS + args,
+                            cwd=repo_path or None,
+                            env=_git_env(),
+                            stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+
+def _create_git_subprocess(repo_path, args):
+    # asyncio is only imported by its users, it's slow to import
+    import asyncio
+
+    return asyncio.create_subprocess_exec("git", *(GIT_OPTIONS + args),
+                                          cwd=repo_path or None,
+                                          env=_git_env(),
+                                          stdin=subprocess.DEVNULL,
+                                          stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE)
+
+
+def _git_env():
+    return dict(os.environ, GIT_OPTIONAL_LOCKS="0")
+
+
+def _close_git(proc, kill=False):
+    if kill and proc.poll() is None:
+        proc.kill()
+
+    _, stderr = proc.communicate()
+
+    return stderr
+
+
+async def _close_git_async(proc, kill=False):
+    if kill and proc.returncode is None:
+        proc.kill()
+
+    _, stderr = await proc.communicate()
+
+    return stderr
+
+
+async def _communicate_async(proc, deadline=NO_DEADLINE):
+    import asyncio
+
+    try:
+        return await asyncio.wait_for(proc.communicate(), deadline.remaining())
+    except asyncio.TimeoutError:
+        await _close_git_async(proc, kill=True)
+        deadline.check()
+        raise
+
+
+async def _read_async(proc, deadline=NO_DEADLINE):
+    import asyncio
+
+    try:
+        return await asyncio.wait_for(proc.stdout.read(CHUNK_SIZE), deadline.remaining())
+    except asyncio.TimeoutError:
+        # the process is killed by the caller, it didn't complete
+        deadline.check()
+        raise
+
+
+def _check_git(proc, stderr):
+    _check_git_result(proc.args[1 + len(GIT_OPTIONS):], proc.returncode, stderr)
+
+
+def _check_git_result(args, returncode, stderr):
+    if returncode:
+        cmd = " ".join(["git"] + args[:1])
+        raise Exception("'{}' failed: {}".format(cmd, stderr.decode(errors="replace").strip()))
+
+
+def _read_commit_info(proc, deadline=NO_DEADLINE):
+    stdout, stderr = deadline.communicate(proc)
+    _check_git(proc, stderr)
+
+    return _parse_commit_info(stdout)
+
+
+def _parse_commit_info(output):
+    fields = output.rstrip(b"\n").decode(errors="replace").split("\0")
+    sha, author, authored_ts, authored_iso, committer, committed_ts, committed_iso = fields
+
+    return CommitInfo(sha,
+                      author,
+                      _git_datetime(authored_ts, authored_iso.rsplit(" ", 1)[-1]),
+                      committer,
+                      _git_datetime(committed_ts, committed_iso.rsplit(" ", 1)[-1]))
+
+
+def _iter_changes(proc, parser, timings=NO_TIMINGS, deadline=NO_DEADLINE):
+    timer = deadline.kill_on_expiry(proc)
+    completed = False
+    try:
+        for data in iter(lambda: proc.stdout.read1(CHUNK_SIZE), b""):
+            yield from parser.feed(data)
+        completed = True
+    finally:
+        timer.cancel()
+        stderr = _close_git(proc, kill=not completed)
+
+    if proc.returncode:
+        # killed by the timer, the stream ended early
+        deadline.check()
+    _check_git(proc, stderr)
+    timings.lap(STATUS)
+
+
+async def _aiter_changes(proc, parser, timings=NO_TIMINGS, deadline=NO_DEADLINE):
+    completed = False
+    try:
+        while True:
+            data = await _read_async(proc, deadline)
+            if not data:
+                break
+            for change in parser.feed(data):
+                yield change
+        completed = True
+    finally:
+        stderr = await _close_git_async(proc, kill=not completed)
+
+    _check_git_result(STATUS_ARGS, proc.returncode, stderr)
+    timings.lap(STATUS)
+
+
+class _StatusParser:
+    """incremental parser of ``git status --porcelain=v2 -z`` output
+
+    ``feed()`` accepts arbitrary chunks of the stream and yields the ``Change``
+    records of every complete entry.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._rename = None
+
+    def feed(self, data):
+        fields = (self._pending + data).split(b"\0")
+        self._pending = fields.pop()
+
+        for field in fields:
+            yield from self._parse_field(field)
+
+    def _parse_field(self, field):
+        if self._rename:
+            xy, path = self._rename
+            self._rename = None
+            yield from _tracked_changes(xy, path, os.fsdecode(field))
+            return
+
+        kind = field[:1]
+        if kind == b"1":
+            parts = field.split(b" ", 8)
+            yield from _tracked_changes(parts[1], os.fsdecode(parts[8]))
+        elif kind == b"2":
+            parts = field.split(b" ", 9)
+            self._rename = (parts[1], os.fsdecode(parts[9]))
+        elif kind == b"u":
+            parts = field.split(b" ", 10)
+            yield from _tracked_changes(parts[1], os.fsdecode(parts[10]))
+        elif kind == b"?":
+            yield Change(UNTRACKED, os.fsdecode(field[2:]))
+
+
+def _tracked_changes(xy, path, orig_path=None):
+    if xy[:1] != b".":
+        yield Change(STAGED, path, orig_path)
+    if xy[1:2] != b".":
+        yield Change(UNSTAGED, path)
@@ -0,0 +1,212 @@
+"""
+GIT repository layout, config and refs, read straight from the filesystem
+"""
+
+import os
+from collections import namedtuple
+
+
+Repository = namedtuple("Repository", ["worktree", "git_dir", "common_dir", "config"])
+
+SYMREF_PREFIX = b"ref: "
+
+
+def find_repository(repo_path=""):
+    """finds the repository containing ``repo_path``, searching its parent
+    directories like ``git`` does, and reads its config"""
+
+    path, git_dir, common_dir = find_git_dirs(repo_path)
+
+    config = read_config(os.path.join(common_dir, "config"))
+    _check_supported(config)
+
+    return Repository(path, git_dir, common_dir, config)
+
+
+def find_git_dirs(repo_path=""):
+    """returns the working tree, the git directory and the common git
+    directory (of the main working tree) of ``repo_path``, without reading
+    the config"""
+
+    path = find_worktree(repo_path)
+    dot_git = os.path.join(path, ".git")
+    git_dir = dot_git if os.path.isdir(dot_git) else _read_gitdir_file(dot_git, path)
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file) as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+
+    return path, git_dir, common_dir
+
+
+def find_worktree(repo_path=""):
+    """returns the top directory of the working tree containing ``repo_path``"""
+
+    path = os.path.abspath(repo_path or os.curdir)
+
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git) or os.path.isfile(dot_git):
+            return path
+
+        parent = os.path.dirname(path)
+        if parent == path:
+            raise Exception("'{}' is not a git repository".format(repo_path))
+
+        path = parent
+
+
+def iter_submodules(worktree):
+    """yields the paths, relative to ``worktree``, of its initialized
+    submodules and of theirs, parents first"""
+
+    config = _read_config_file(os.path.join(worktree, ".gitmodules"))
+    paths = sorted(value.strip("/") for key, value in config.items()
+                   if key.startswith("submodule.") and key.endswith(".path"))
+
+    for path in paths:
+        submodule_worktree = os.path.join(worktree, path)
+        # not initialized (or not checked out) submodules are empty directories
+        if not os.path.lexists(os.path.join(submodule_worktree, ".git")):
+            continue
+
+        yield path
+        for nested_path in iter_submodules(submodule_worktree):
+            yield path + "/" + nested_path
+
+
+def _read_gitdir_file(dot_git, worktree):
+    with open(dot_git) as f:
+        content = f.read().strip()
+
+    if not content.startswith("gitdir:"):
+        raise Exception("Invalid gitfile format: {}".format(dot_git))
+
+    return os.path.normpath(os.path.join(worktree, content[len("gitdir:"):].strip()))
+
+
+def _check_supported(config):
+    object_format = config.get("extensions.objectformat", "sha1")
+    if object_format != "sha1":
+        raise Exception("Unsupported object format: {}".format(object_format))
+
+    ref_storage = config.get("extensions.refstorage", "files")
+    if ref_storage != "files":
+        raise Exception("Unsupported ref storage: {}".format(ref_storage))
+
+
+def read_config(repo_config_path):
+    """reads the system, global and repository config files into a flat
+    ``{"section.key": value}`` dict; later files override earlier ones"""
+
+    home = os.path.expanduser("~")
+    xdg_config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    paths = ["/etc/gitconfig",
+             os.path.join(xdg_config_home, "git", "config"),
+             os.path.join(home, ".gitconfig"),
+             repo_config_path]
+
+    config = {}
+    for path in paths:
+        config.update(_read_config_file(path))
+
+    return config
+
+
+def _read_config_file(path):
+    config = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        return config
+
+    section = ""
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+
+        if line.startswith("["):
+            header = line[1:line.find("]")].strip()
+            name, _, subsection = header.partition(" ")
+            section = name.lower()
+            if subsection:
+                section += "." + subsection.strip().strip('"')
+            continue
+
+        key, sep, value = line.partition("=")
+        value = value.split(" #")[0].split(" ;")[0].strip().strip('"') if sep else "true"
+        config["{}.{}".format(section, key.strip().lower())] = value
+
+    return config
+
+
+def config_bool(config, key, default):
+    value = config.get(key)
+    if value is None:
+        return default
+
+    return value.lower() in ("true", "yes", "on", "1")
+
+
+def read_head(repo):
+    """returns the ref ``HEAD`` points to (``None`` if detached)
+    and the commit SHA it resolves to"""
+
+    head = _read_ref_file(os.path.join(repo.git_dir, "HEAD"))
+    if head.startswith(SYMREF_PREFIX):
+        ref_name = head[len(SYMREF_PREFIX):].decode()
+        return ref_name, resolve_ref(repo, ref_name)
+
+    return None, head.decode()
+
+
+def resolve_ref(repo, ref_name, depth=0):
+    """resolves ``ref_name`` (e.g. ``refs/heads/master``) to a commit SHA,
+    following symbolic refs and looking up ``packed-refs``"""
+
+    if depth > 5:
+        raise Exception("Symbolic ref loop: {}".format(ref_name))
+
+    for base_dir in (repo.git_dir, repo.common_dir):
+        try:
+            value = _read_ref_file(os.path.join(base_dir, ref_name))
+        except OSError:
+            continue
+
+        if value.startswith(SYMREF_PREFIX):
+            return resolve_ref(repo, value[len(SYMREF_PREFIX):].decode(), depth + 1)
+
+        return value.decode()
+
+    sha = read_packed_refs(repo).get(ref_name)
+    if not sha:
+        raise Exception("Reference at '{}' does not exist".format(ref_name))
+
+    return sha
+
+
+def _read_ref_file(path):
+    with open(path, "rb") as f:
+        return f.read().strip()
+
+
+def read_packed_refs(repo):
+    """returns the ``{ref_name: sha}`` mapping of ``packed-refs``"""
+
+    refs = {}
+    try:
+        with open(os.path.join(repo.common_dir, "packed-refs"), "rb") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return refs
+
+    for line in lines:
+        if line and line[:1] not in b"#^":
+            sha, _, ref_name = line.partition(b" ")
+            refs[ref_name.decode()] = sha.decode()
+
+    return refs
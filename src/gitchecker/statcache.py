@@ -0,0 +1,138 @@
+"""
+Persistent stat cache of the native engine (``.git/gitchecker-cache``)
+
+It records, for the last check of a repository:
+    - the staged changes, valid while ``HEAD`` and the index don't move
+    - the verdict (unstaged or not) of every tracked path, with the stat
+      data of the file when it was examined
+    - the mtime and the subdirectories of every directory without
+      untracked files, with the stat data of the ignore files
+So a later check only re-examines the files and directories whose stat data
+changed. The whole cache is discarded when ``HEAD``, the index file or the
+relevant config move.
+"""
+
+import marshal
+import os
+import time
+
+
+CACHE_FILENAME = "gitchecker-cache"
+CACHE_VERSION = 1
+
+# stat data this close to the scan start can't be trusted: the file could be
+# modified again without changing it (coarse filesystem timestamps)
+RACY_MARGIN_NS = 2 * 10**9
+
+# the verdict doesn't depend on the working tree (unmerged, skip-worktree...)
+CONSTANT = None
+# the path doesn't exist in the working tree
+MISSING = ()
+
+
+def stat_key(st):
+    return (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino, st.st_mode)
+
+
+def path_key(path):
+    try:
+        return stat_key(os.lstat(path))
+    except OSError:
+        return MISSING
+
+
+class StatCache:
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.staged = None
+        self.files = None
+        self.dirs = {}
+        self.ignore_files = {}
+        self.changed = True
+        self.scan_start_ns = int(time.time() * 10**9)
+
+    @classmethod
+    def load(cls, git_dir, key):
+        """loads the cache of ``git_dir``, empty unless it was saved with the same ``key``"""
+
+        cache = cls(os.path.join(git_dir, CACHE_FILENAME), key)
+        try:
+            with open(cache.path, "rb") as f:
+                # much faster than marshal.load(f), which reads in small chunks
+                data = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return cache
+
+        if (not isinstance(data, dict) or
+                data.get("version") != CACHE_VERSION or
+                data.get("key") != key):
+            return cache
+
+        cache.staged = data["staged"]
+        cache.files = data["files"]
+        cache.dirs = data["dirs"]
+        cache.ignore_files = data["ignore_files"]
+        cache.changed = False
+
+        if any(path_key(path) != ignore_key for path, ignore_key in cache.ignore_files.items()):
+            cache.dirs = {}
+            cache.ignore_files = {}
+            cache.changed = True
+
+        return cache
+
+    def save(self):
+        if not self.changed:
+            return
+
+        data = {"version": CACHE_VERSION,
+                "key": self.key,
+                "staged": self.staged,
+                "files": self.files,
+                "dirs": self.dirs,
+                "ignore_files": self.ignore_files}
+
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(marshal.dumps(data))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # the cache is an optimization, a read-only .git dir is fine
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def set_staged(self, changes):
+        self.staged = [tuple(change) for change in changes]
+        self.changed = True
+
+    def is_trusted(self, key):
+        return bool(key) and max(key[0], key[1]) < self.scan_start_ns - RACY_MARGIN_NS
+
+    def set_file(self, path, key, is_dirty):
+        if key not in (CONSTANT, MISSING) and not self.is_trusted(key):
+            # re-examined next time
+            key = False
+
+        if self.files.get(path) != (key, is_dirty):
+            self.files[path] = (key, is_dirty)
+            self.changed = True
+
+    def set_dir(self, rel_dir, key, subdirs):
+        value = (key, subdirs) if self.is_trusted(key) else None
+        if self.dirs.get(rel_dir) != value:
+            if value:
+                self.dirs[rel_dir] = value
+            else:
+                self.dirs.pop(rel_dir, None)
+            self.changed = True
+
+    def set_ignore_file(self, path, key):
+        if key != MISSING and not self.is_trusted(key):
+            key = False
+
+        if self.ignore_files.get(path, False) != key:
+            self.ignore_files[path] = key
+            self.changed = True
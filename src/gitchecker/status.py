@@ -0,0 +1,71 @@
+"""
+Result types shared by ``gitchecker`` and its status engines
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+
+# partial: the counting stopped early (fail fast or timeout), they are lower bounds
+# pruned_dirs: directories not walked for untracked files, all their paths are ignored
+# timings: the ``PhaseTiming`` of each phase when the check is timed, otherwise ``None``
+# submodules: when recursing, the ``{path: GitStatus}`` of every initialized submodule, nested
+#     ones included, each with only its own changes (the counts above include them all)
+# timed_out: the check stopped at its ``timeout``, the counts are the changes seen so far and
+#     it's also ``partial`` (``commit_info`` is ``None`` if it wasn't read yet)
+# completed_phases: with a ``timeout``, the phases completed before it (all of them unless
+#     ``timed_out``), otherwise ``None``
+GitStatus = namedtuple("GitStatus", ["commit_info",
+                                     "staged_files",
+                                     "unstaged_files",
+                                     "untracked_files",
+                                     "total_changes",
+                                     "partial",
+                                     "pruned_dirs",
+                                     "timings",
+                                     "submodules",
+                                     "timed_out",
+                                     "completed_phases"])
+GitStatus.__new__.__defaults__ = (False, 0, None, None, False, None)
+
+# upstream, ahead, behind: only with ``ahead_behind``, the short name of the upstream of the
+#     current branch and how many commits ``HEAD`` is ahead of and behind it, otherwise ``None``
+#     (also the counts if its ref is gone)
+CommitInfo = namedtuple("CommitInfo", ["sha",
+                                       "author",
+                                       "authored_datetime",
+                                       "committer",
+                                       "committed_datetime",
+                                       "upstream",
+                                       "ahead",
+                                       "behind"])
+CommitInfo.__new__.__defaults__ = (None, None, None)
+
+UPSTREAM_FIELDS = ("upstream", "ahead", "behind")
+
+STAGED = "staged"
+UNSTAGED = "unstaged"
+UNTRACKED = "untracked"
+
+Change = namedtuple("Change", ["category", "path", "orig_path"])
+Change.__new__.__defaults__ = (None,)
+
+# phases of a status check, besides the STAGED, UNSTAGED and UNTRACKED changes
+REPO_OPEN = "repo_open"
+COMMIT_INFO = "commit_info"
+STATUS = "status"
+FILTER = "filter"
+
+PHASES = (REPO_OPEN, COMMIT_INFO, STAGED, UNSTAGED, UNTRACKED, STATUS, FILTER)
+
+# count: the changes found by the phase, before filtering (the ignored paths for FILTER)
+PhaseTiming = namedtuple("PhaseTiming", ["phase", "seconds", "count"])
+
+
+def _git_datetime(timestamp, tz_offset):
+    """builds an aware ``datetime`` from a GIT ``<timestamp> <+hhmm>`` pair"""
+
+    sign = -1 if tz_offset.startswith("-") else 1
+    offset = timedelta(hours=int(tz_offset[-4:-2]), minutes=int(tz_offset[-2:]))
+
+    return datetime.fromtimestamp(int(timestamp), timezone(sign * offset))
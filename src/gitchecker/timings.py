@@ -0,0 +1,73 @@
+"""
+Opt-in instrumentation of a status check: wall time and count of each phase
+
+A check is a sequence of phases (``status.PHASES``); ``lap()`` ends the
+current one and starts the next. The time spent filtering the changes with
+``ignore_files_regex`` is interleaved with the changes stream, so it's
+measured apart with ``add_nested()`` and left out of the phase it happens in.
+``NO_TIMINGS`` is the do-nothing recorder used when the check isn't timed.
+"""
+
+import time
+from collections import OrderedDict
+
+from gitchecker.status import PhaseTiming
+
+
+class Timings:
+
+    def __init__(self):
+        # {phase: [seconds, count]}, in the order they were first recorded
+        self._phases = OrderedDict()
+        self._start = time.perf_counter()
+        self._nested_seconds = 0
+
+    def __bool__(self):
+        return True
+
+    def lap(self, phase, count=0):
+        """ends ``phase``, started by the previous lap"""
+
+        now = time.perf_counter()
+        self._add(phase, now - self._start - self._nested_seconds, count)
+        self._start = now
+        self._nested_seconds = 0
+
+    def count(self, phase, count=1):
+        self._add(phase, 0, count)
+
+    def add_nested(self, phase, seconds, count=0):
+        """adds ``seconds`` to ``phase``, subtracting them from the current one"""
+
+        self._add(phase, seconds, count)
+        self._nested_seconds += seconds
+
+    def result(self):
+        return tuple(PhaseTiming(phase, seconds, count)
+                     for phase, (seconds, count) in self._phases.items())
+
+    def _add(self, phase, seconds, count):
+        totals = self._phases.setdefault(phase, [0, 0])
+        totals[0] += seconds
+        totals[1] += count
+
+
+class _NoTimings:
+
+    def __bool__(self):
+        return False
+
+    def lap(self, phase, count=0):
+        pass
+
+    def count(self, phase, count=1):
+        pass
+
+    def add_nested(self, phase, seconds, count=0):
+        pass
+
+    def result(self):
+        return None
+
+
+NO_TIMINGS = _NoTimings()
@@ -0,0 +1,394 @@
+"""
+Watch mode: a GIT status kept up to date with Linux inotify
+
+``watch()`` computes the status once with ``iter_changes()`` and the
+native engine, then a background thread follows the inotify events of the
+working tree directories and only re-examines the paths they report, with
+a ``native.Snapshot`` of the index, so ``status()`` returns the current
+``GitStatus`` without touching the filesystem.
+Any change of ``HEAD``, the current branch, the index, ``packed-refs``,
+the config, ``info/exclude``, ``core.excludesFile`` or a ``.gitignore``
+file, or an overflow of the event queue, computes the whole status again.
+"""
+
+import os
+import select
+import stat
+import threading
+import time
+
+from gitchecker import native
+from gitchecker.gitchecker import iter_changes, NATIVE_ENGINE
+from gitchecker.gitignore import exclude_files, GitIgnore
+from gitchecker.inotify import (Inotify, IN_ATTRIB, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE,
+                                IN_DONT_FOLLOW, IN_EXCL_UNLINK, IN_ISDIR, IN_MODIFY,
+                                IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, IN_Q_OVERFLOW)
+from gitchecker.matcher import compile_path_matcher
+from gitchecker.repository import find_repository, read_head
+from gitchecker.status import Change, GitStatus, STAGED, UNSTAGED, UNTRACKED
+
+
+# events are processed in batches, git writes several files per command
+DEBOUNCE = 0.05
+
+WORKTREE_EVENTS = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE |
+                   IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+GIT_DIR_EVENTS = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_TO | IN_ONLYDIR
+
+# files of the git dirs that invalidate the whole status
+GIT_FILES = ("HEAD", "index", "packed-refs", "config")
+
+
+def watch(repo_path="",
+          ignore_files_regex=None,
+          ignore_untracked_files=False,
+          debounce=DEBOUNCE):
+
+    """starts watching the GIT repository status (Linux only)
+
+    Args:
+        repo_path (string): GIT repository path.
+        ignore_files_regex (string): Files will be ignored if its path matches
+            the regex pattern.
+        ignore_untracked_files (bool): If ``True``, untracked files are not
+            counted in ``total_changes``.
+        debounce (float): Seconds to wait for more events before updating
+            the status.
+    Returns:
+        (Watcher) Started watcher. ``status()`` returns the current
+            ``GitStatus`` and ``close()`` stops watching; it can be used
+            as a context manager.
+    """
+
+    return Watcher(repo_path, ignore_files_regex, ignore_untracked_files, debounce).start()
+
+
+class Watcher:
+    """GIT status of a repository, updated in a background thread"""
+
+    def __init__(self,
+                 repo_path="",
+                 ignore_files_regex=None,
+                 ignore_untracked_files=False,
+                 debounce=DEBOUNCE):
+
+        self._repo_path = repo_path
+        self._ignore_files_regex = compile_path_matcher(ignore_files_regex)
+        self._ignore_untracked_files = ignore_untracked_files
+        self._debounce = debounce
+
+        self._status = None
+        self._error = None
+        self._inotify = None
+        self._thread = None
+        self._stop_pipe = None
+
+        self._repo = None
+        self._git_dirs_by_wd = {}
+        self._ref_name = None
+        self._watched_git_paths = []
+        self._dirs_by_wd = {}
+        self._snapshot = None
+        self._ignore_rules = {}
+        self._commit_info = None
+        self._changes = {}
+
+    def start(self):
+        self._inotify = Inotify()
+        self._stop_pipe = os.pipe()
+        try:
+            self._resync()
+        except Exception:
+            self.close()
+            raise
+
+        self._thread = threading.Thread(target=self._run, name="gitchecker-watcher", daemon=True)
+        self._thread.start()
+
+        return self
+
+    def status(self):
+        """returns the current ``GitStatus``, without examining the repository"""
+
+        if self._error is not None:
+            raise self._error
+
+        return self._status
+
+    def close(self):
+        if self._thread is not None:
+            os.write(self._stop_pipe[1], b"\0")
+            self._thread.join()
+            self._thread = None
+
+        if self._stop_pipe is not None:
+            for fd in self._stop_pipe:
+                os.close(fd)
+            self._stop_pipe = None
+
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        needs_resync = False
+        while True:
+            readable, _, _ = select.select([self._inotify, self._stop_pipe[0]], [], [])
+            if self._stop_pipe[0] in readable:
+                return
+
+            # wait for the rest of the burst: 'git checkout' touches many files
+            time.sleep(self._debounce)
+
+            events = []
+            batch = self._inotify.read_events()
+            while batch:
+                events.extend(batch)
+                batch = self._inotify.read_events()
+
+            try:
+                if needs_resync:
+                    self._resync()
+                else:
+                    self._process(events)
+                self._error = None
+                needs_resync = False
+            except Exception as ex:
+                # e.g. a ref read while git was writing it: computed again on the next event
+                self._error = ex
+                needs_resync = True
+
+    def _resync(self):
+        for wd in list(self._git_dirs_by_wd) + list(self._dirs_by_wd):
+            self._inotify.rm_watch(wd)
+        self._git_dirs_by_wd = {}
+        self._dirs_by_wd = {}
+        self._ignore_rules = {}
+
+        # watches first: a change made while the status is computed triggers a new resync
+        self._repo = find_repository(self._repo_path)
+        self._watch_git_dirs()
+
+        self._snapshot = native.Snapshot(self._repo.worktree, self._ignore_files_regex)
+
+        self._watch_tree("", self._new_gitignore())
+
+        self._commit_info = native.get_commit_info(self._repo.worktree)
+        # {path: change} by category
+        self._changes = {STAGED: {}, UNSTAGED: {}, UNTRACKED: {}}
+        for change in iter_changes(self._repo.worktree, self._ignore_files_regex,
+                                   engine=NATIVE_ENGINE):
+            self._changes[change.category][change.path] = change
+
+        self._update_status()
+
+    def _watch_git_dirs(self):
+        repo = self._repo
+        self._ref_name, _ = read_head(repo)
+
+        # the files of the current branch and of the excluded paths, outside the working tree
+        self._watched_git_paths = list(exclude_files(repo))
+        if self._ref_name:
+            self._watched_git_paths.append(os.path.join(repo.common_dir, self._ref_name))
+
+        watched_dirs = {repo.git_dir, repo.common_dir}
+        for path in self._watched_git_paths:
+            # the closest existing dir: a packed ref or a missing file may have none
+            watched_dir = os.path.dirname(path)
+            while not os.path.isdir(watched_dir):
+                watched_dir = os.path.dirname(watched_dir)
+            watched_dirs.add(watched_dir)
+
+        for git_dir in watched_dirs:
+            wd = self._inotify.add_watch(git_dir, GIT_DIR_EVENTS)
+            self._git_dirs_by_wd[wd] = git_dir
+
+    def _is_git_dir_event(self, event):
+        if event.name in GIT_FILES:
+            return True
+
+        event_path = os.path.join(self._git_dirs_by_wd[event.wd], event.name)
+        return any(path == event_path or path.startswith(event_path + os.sep)
+                   for path in self._watched_git_paths)
+
+    def _process(self, events):
+        paths = {}
+        dirs = {}
+        for event in events:
+            if event.mask & IN_Q_OVERFLOW:
+                self._resync()
+                return
+
+            if event.wd in self._git_dirs_by_wd:
+                if self._is_git_dir_event(event):
+                    self._resync()
+                    return
+                continue
+
+            rel_dir = self._dirs_by_wd.get(event.wd)
+            if rel_dir is None or not event.name:
+                continue
+
+            path = rel_dir + "/" + event.name if rel_dir else event.name
+            if event.name == ".gitignore":
+                self._resync()
+                return
+            elif event.name == ".git":
+                # a nested repository appeared or disappeared
+                if rel_dir:
+                    dirs[rel_dir] = True
+            elif event.mask & IN_ISDIR:
+                dirs[path] = True
+            else:
+                paths[path] = True
+
+        # all the watches of the moved away dirs must go before adding the new ones
+        for path in dirs:
+            self._remove_dir(path)
+
+        for path in dirs:
+            if os.path.isdir(os.path.join(self._repo.worktree, path)):
+                self._add_dir(path)
+            for tracked_path in self._snapshot.iter_tracked(path):
+                self._refresh_path(tracked_path)
+
+        for path in paths:
+            self._refresh_path(path)
+
+        self._update_status()
+
+    def _update_status(self):
+        staged_files = len(self._changes[STAGED])
+        unstaged_files = len(self._changes[UNSTAGED])
+        untracked_files = len(self._changes[UNTRACKED])
+        total_changes = staged_files + unstaged_files
+        if not self._ignore_untracked_files:
+            total_changes += untracked_files
+
+        self._status = GitStatus(self._commit_info,
+                                 staged_files,
+                                 unstaged_files,
+                                 untracked_files,
+                                 total_changes)
+
+    def _is_ignored(self, path):
+        return self._ignore_files_regex is not None and self._ignore_files_regex.matches(path)
+
+    def _new_gitignore(self):
+        return GitIgnore(self._repo, self._ignore_rules)
+
+    def _gitignore_for(self, rel_dir):
+        """returns a ``GitIgnore`` with the rules of ``rel_dir`` and all
+        its ancestors pushed, ``None`` if any of them is ignored"""
+
+        gitignore = self._new_gitignore()
+        gitignore.push("")
+        current = ""
+        for name in rel_dir.split("/") if rel_dir else []:
+            current = current + "/" + name if current else name
+            if gitignore.is_ignored(current, True):
+                return None
+            gitignore.push(current)
+
+        return gitignore
+
+    def _watch_tree(self, rel_dir, gitignore):
+        """watches ``rel_dir`` and its subdirectories that can contain
+        changes; ``gitignore`` is ``None`` inside ignored directories"""
+
+        dir_path = os.path.join(self._repo.worktree, rel_dir)
+        try:
+            wd = self._inotify.add_watch(dir_path, WORKTREE_EVENTS)
+            dir_entries = list(os.scandir(dir_path))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        self._dirs_by_wd[wd] = rel_dir
+
+        if gitignore is not None:
+            gitignore.push(rel_dir)
+
+        for dir_entry in dir_entries:
+            if dir_entry.name == ".git" or not dir_entry.is_dir(follow_symlinks=False):
+                continue
+
+            path = rel_dir + "/" + dir_entry.name if rel_dir else dir_entry.name
+            if self._snapshot.is_tracked(path):
+                # submodule
+                continue
+
+            if self._ignore_files_regex and self._ignore_files_regex.matches_dir(path) is True:
+                # none of its changes would be counted
+                continue
+
+            if self._snapshot.is_tracked_dir(path):
+                is_ignored = gitignore is None or gitignore.is_ignored(path, True)
+                self._watch_tree(path, None if is_ignored else gitignore)
+            elif (gitignore is not None and not gitignore.is_ignored(path, True) and
+                  not os.path.lexists(os.path.join(dir_entry.path, ".git"))):
+                self._watch_tree(path, gitignore)
+
+        if gitignore is not None:
+            gitignore.pop()
+
+    def _remove_dir(self, rel_dir):
+        prefix = rel_dir + "/"
+        for wd, watched_dir in list(self._dirs_by_wd.items()):
+            if watched_dir == rel_dir or watched_dir.startswith(prefix):
+                self._inotify.rm_watch(wd)
+                del self._dirs_by_wd[wd]
+
+        untracked = self._changes[UNTRACKED]
+        for path in [path for path in untracked if path.startswith(prefix)]:
+            del untracked[path]
+
+    def _add_dir(self, rel_dir):
+        parent = rel_dir.rpartition("/")[0]
+        gitignore = self._gitignore_for(parent)
+        is_ignored = gitignore is None or gitignore.is_ignored(rel_dir, True)
+        if is_ignored:
+            if self._snapshot.is_tracked_dir(rel_dir):
+                self._watch_tree(rel_dir, None)
+            return
+
+        if (not self._snapshot.is_tracked_dir(rel_dir) and
+                os.path.lexists(os.path.join(self._repo.worktree, rel_dir, ".git"))):
+            # nested repository, reported as a whole like git does
+            changes = [Change(UNTRACKED, rel_dir + "/")]
+        else:
+            self._watch_tree(rel_dir, gitignore)
+            changes = self._snapshot.iter_untracked(rel_dir, gitignore)
+
+        for change in changes:
+            if not self._is_ignored(change.path):
+                self._changes[UNTRACKED][change.path] = change
+
+    def _refresh_path(self, path):
+        self._changes[UNSTAGED].pop(path, None)
+        self._changes[UNTRACKED].pop(path, None)
+
+        if self._is_ignored(path):
+            return
+
+        if self._snapshot.is_tracked(path):
+            if self._snapshot.is_unstaged(path):
+                self._changes[UNSTAGED][path] = Change(UNSTAGED, path)
+        elif self._is_untracked(path):
+            self._changes[UNTRACKED][path] = Change(UNTRACKED, path)
+
+    def _is_untracked(self, path):
+        try:
+            st = os.lstat(os.path.join(self._repo.worktree, path))
+        except OSError:
+            return False
+
+        if stat.S_ISDIR(st.st_mode):
+            return False
+
+        gitignore = self._gitignore_for(path.rpartition("/")[0])
+        return gitignore is not None and not gitignore.is_ignored(path, False)
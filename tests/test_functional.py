@@ -1,3 +1,4 @@
+import asyncio
 import itertools
 import os
 from time import time
@@ -10,13 +11,21 @@ from tests.functional_config import FuncTestConfig, test_configs
 
 
 error_warning_params = [True, False]
-functional_test_params = itertools.product(test_configs, error_warning_params)
+engine_params = ([{"engine": engine} for engine in gitchecker.ENGINES] +
+                 [{"engine": gitchecker.NATIVE_ENGINE, "stat_cache": True},
+                  {"engine": gitchecker.PORCELAIN_ENGINE, "run_async": True}])
+native_engine_params = [options for options in engine_params
+                        if options["engine"] == gitchecker.NATIVE_ENGINE]
+functional_test_params = itertools.product(test_configs, engine_params, error_warning_params)
 
 
 def get_test_param_id(param):
     if isinstance(param, FuncTestConfig):
         return param.id
 
+    if isinstance(param, dict):
+        return "+".join(str(value) if value is not True else key for key, value in param.items())
+
     return "WARN" if param else "ERROR"
 
 
@@ -39,10 +48,10 @@ class TestFunctionalGitChecker:
             # self.repo.git.add(u=True)
             # self._commit("auto-commit: functional testing development")
 
-    @pytest.mark.parametrize("test_config,is_warning",
+    @pytest.mark.parametrize("test_config,engine_options,is_warning",
                              functional_test_params,
                              ids=get_test_param_id)
-    def test_run(self, print_mock, test_config, is_warning):
+    def test_run(self, print_mock, test_config, engine_options, is_warning):
         # test setup
         test_config_state = test_config.setup(self)
 
@@ -52,7 +61,10 @@ class TestFunctionalGitChecker:
         expected_commit_info = self._get_expected_commit_info(is_warning, expected_total_changes)
 
         # act
-        commit_info, exception = self._act(is_warning, expected_total_changes, test_config)
+        commit_info, exception = self._act(is_warning,
+                                           expected_total_changes,
+                                           test_config,
+                                           engine_options)
 
         # assert
         if expected_commit_info:
@@ -79,31 +91,38 @@ class TestFunctionalGitChecker:
 
         return None
 
-    def _act(self, is_warning, expected_total_changes, test_config):
+    def _act(self, is_warning, expected_total_changes, test_config, engine_options):
         ignore_untracked_files = test_config.ignore_untracked_files
         ignore_files_regex = test_config.ignore_files_regex
         warning_instead_of_error = is_warning
 
         if is_warning or not expected_total_changes:
-            commit_info =\
-                gitchecker.check_status_and_get_commit_info(self.repo_path,
-                                                            warning_instead_of_error,
-                                                            ignore_untracked_files,
-                                                            ignore_files_regex)
+            commit_info = self._check(warning_instead_of_error,
+                                      ignore_untracked_files,
+                                      ignore_files_regex,
+                                      **engine_options)
 
             return commit_info, None
 
         with pytest.raises(Exception) as ex:
-            commit_info =\
-                gitchecker.check_status_and_get_commit_info(self.repo_path,
-                                                            warning_instead_of_error,
-                                                            ignore_untracked_files,
-                                                            ignore_files_regex)
+            commit_info = self._check(warning_instead_of_error,
+                                      ignore_untracked_files,
+                                      ignore_files_regex,
+                                      **engine_options)
 
             return commit_info, None
 
         return None, ex
 
+    def _check(self, *args, run_async=False, **engine_options):
+        if run_async:
+            check = gitchecker.check_status_and_get_commit_info_async(self.repo_path,
+                                                                      *args,
+                                                                      **engine_options)
+            return asyncio.run(check)
+
+        return gitchecker.check_status_and_get_commit_info(self.repo_path, *args, **engine_options)
+
     def _assert(self, expected_results, expected_total_changes, exception, print_mock, is_warning):
         if expected_total_changes:
             expected_print_msg, expected_ex_msg = self._get_msgs(expected_results, is_warning)
@@ -176,3 +195,68 @@ class TestFunctionalGitChecker:
 
     def _commit(self, commit_msg):
         self.repo.index.commit(commit_msg, author=self.author, committer=self.committer)
+
+
+class TestFunctionalGitChecker_Submodules:
+
+    author = Actor("Test Actor", "author@test.com")
+
+    @pytest.mark.parametrize("engine_options", engine_params, ids=get_test_param_id)
+    @pytest.mark.parametrize("moved", [False, True], ids=["checked-out", "moved"])
+    def test_dirty_submodule_counted_once(self, tmp_path, engine_options, moved):
+        # arrange
+        self._arrange_dirty_submodule(tmp_path, moved, modified=True, untracked=True)
+
+        # act
+        git_status = self._get_git_status(str(tmp_path), recurse_submodules=True,
+                                          **engine_options)
+
+        # assert
+        submodule_status = git_status.submodules["sm"]
+        assert (0, 1 + moved, 1, 2 + moved) == self._counts(git_status)
+        assert (0, 1, 1, 2) == self._counts(submodule_status)
+
+    @pytest.mark.parametrize("engine_options", native_engine_params, ids=get_test_param_id)
+    @pytest.mark.parametrize("modified,untracked", [(True, False), (False, True), (False, False)],
+                             ids=["modified", "untracked", "clean"])
+    def test_native_dirty_submodule_not_recursed(self, tmp_path, engine_options, modified,
+                                                 untracked):
+        # arrange
+        self._arrange_dirty_submodule(tmp_path, False, modified, untracked)
+
+        # act
+        git_status = self._get_git_status(str(tmp_path), **engine_options)
+
+        # assert
+        porcelain_status = self._get_git_status(str(tmp_path), engine=gitchecker.PORCELAIN_ENGINE)
+        is_dirty = int(modified or untracked)
+        assert (0, is_dirty, 0, is_dirty) == self._counts(git_status)
+        assert self._counts(porcelain_status) == self._counts(git_status)
+
+    def _arrange_dirty_submodule(self, tmp_path, moved, modified, untracked):
+        repo = Repo.init(str(tmp_path))
+        submodule = Repo.init(str(tmp_path / "sm"))
+        (tmp_path / "sm" / "modified.txt").write_text("foo\n")
+        submodule.index.add(["modified.txt"])
+        submodule.index.commit("submodule commit", author=self.author, committer=self.author)
+        (tmp_path / ".gitmodules").write_text('[submodule "sm"]\n\tpath = sm\n\turl = ./sm\n')
+        repo.git.add(".gitmodules", "sm")
+        repo.index.commit("superproject commit", author=self.author, committer=self.author)
+        if moved:
+            submodule.index.commit("moved", author=self.author, committer=self.author)
+        if modified:
+            (tmp_path / "sm" / "modified.txt").write_text("more-foo\n")
+        if untracked:
+            (tmp_path / "sm" / "untracked.txt").write_text("foo\n")
+
+    @staticmethod
+    def _counts(git_status):
+        return (git_status.staged_files, git_status.unstaged_files, git_status.untracked_files,
+                git_status.total_changes)
+
+    @staticmethod
+    def _get_git_status(repo_path, run_async=False, **options):
+        if run_async:
+            return asyncio.run(gitchecker._get_git_status_async(repo_path, **options))
+
+        return gitchecker._get_git_status(repo_path, **options)
@@ -1,20 +1,34 @@
+import asyncio
+from inspect import GEN_CLOSED, getgeneratorstate
 from unittest.mock import call, MagicMock, patch
 import pytest
+from git import Actor, Repo
 
-from gitchecker import gitchecker
+from gitchecker import gitchecker, gitpython, memo, pool
+from gitchecker.deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+from gitchecker.status import (Change, CommitInfo, COMMIT_INFO, FILTER, REPO_OPEN, STAGED,
+                               UNSTAGED, UNTRACKED)
+from gitchecker.timings import NO_TIMINGS, Timings
+
+
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
 
 
 def _get_git_status(commit_info="foo-commit-info",
                     staged_files="foo-staged-files",
                     unstaged_files="foo-unstaged-files",
                     untracked_files="foo-untracked-files",
-                    total_changes=0):
+                    total_changes=0,
+                    partial=False,
+                    pruned_dirs=0):
 
     return gitchecker.GitStatus(commit_info,
                                 staged_files,
                                 unstaged_files,
                                 untracked_files,
-                                total_changes)
+                                total_changes,
+                                partial,
+                                pruned_dirs)
 
 
 @patch("gitchecker.gitchecker._log_warning")
@@ -47,7 +61,18 @@ class TestUnitGitChecker_CheckCleanStatus:
 
         # assert
         assert commit_info is self.foo_commit_info
-        _get_git_status_mock.assert_called_once_with(self.foo_repo_path, self.foo_ifr, self.foo_iuf)
+        _get_git_status_mock.assert_called_once_with(self.foo_repo_path,
+                                                     self.foo_ifr,
+                                                     self.foo_iuf,
+                                                     engine=gitchecker.GITPYTHON_ENGINE,
+                                                     stat_cache=False,
+                                                     fail_fast=False,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     memoize=False,
+                                                     ahead_behind=False,
+                                                     timeout=None)
         _get_status_msg_mock.assert_not_called()
         _log_and_raise_error_mock.assert_not_called()
         _log_warning_mock.assert_not_called()
@@ -72,7 +97,18 @@ class TestUnitGitChecker_CheckCleanStatus:
 
         # assert
         assert self.foo_commit_info is commit_info
-        _get_git_status_mock.assert_called_once_with(self.foo_repo_path, self.foo_ifr, self.foo_iuf)
+        _get_git_status_mock.assert_called_once_with(self.foo_repo_path,
+                                                     self.foo_ifr,
+                                                     self.foo_iuf,
+                                                     engine=gitchecker.GITPYTHON_ENGINE,
+                                                     stat_cache=False,
+                                                     fail_fast=False,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     memoize=False,
+                                                     ahead_behind=False,
+                                                     timeout=None)
         _get_status_msg_mock.assert_called_once_with(foo_git_status)
         _log_and_raise_error_mock.assert_not_called()
         _log_warning_mock.assert_called_once_with(foo_status_msg, self.foo_logger)
@@ -97,7 +133,18 @@ class TestUnitGitChecker_CheckCleanStatus:
 
         # assert
         assert self.foo_commit_info is commit_info
-        _get_git_status_mock.assert_called_once_with(self.foo_repo_path, self.foo_ifr, self.foo_iuf)
+        _get_git_status_mock.assert_called_once_with(self.foo_repo_path,
+                                                     self.foo_ifr,
+                                                     self.foo_iuf,
+                                                     engine=gitchecker.GITPYTHON_ENGINE,
+                                                     stat_cache=False,
+                                                     fail_fast=False,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     memoize=False,
+                                                     ahead_behind=False,
+                                                     timeout=None)
         _get_status_msg_mock.assert_called_once_with(foo_git_status)
         _log_and_raise_error_mock.assert_called_once_with(foo_status_msg, self.foo_logger)
         _log_warning_mock.assert_not_called()
@@ -115,7 +162,13 @@ def _get_foo_filename(file_type, i):
     return "foo-{}/file-{}.py".format(file_type, i)
 
 
-@patch.object(gitchecker, "Repo")
+def _iter_foo_untracked(*args):
+    return (Change(UNTRACKED, _get_foo_filename("untracked", i)) for i in range(7))
+
+
+@patch.object(pool, "repo_pool", pool.RepoPool(max_size=0))
+@patch.object(gitpython, "_iter_untracked", _iter_foo_untracked)
+@patch.object(pool, "Repo")
 class TestUnitGitChecker_GetGitStatus:
 
     foo_commit_sha = "f00c0mm1t"
@@ -124,7 +177,6 @@ class TestUnitGitChecker_GetGitStatus:
 
     foo_staged_files    = [_get_diff_file_mock("staged", i) for i in range(3)]
     foo_unstaged_files  = [_get_diff_file_mock("unstaged", i) for i in range(5)]
-    foo_untracked_files = [_get_foo_filename("untracked", i) for i in range(7)]
 
     def test_not_ignoring(self, RepoMock):
         # arrange
@@ -168,12 +220,57 @@ class TestUnitGitChecker_GetGitStatus:
                      foo_commit_info,
                      expected_git_status=expected_git_status)
 
+    def test_ignoring_files_regexes_and_globs(self, RepoMock):
+        # arrange
+        ignore_files_regex = [r"^foo-staged/file-[23]\.py$", "glob:foo-un*/file-[23].py"]
+        repo_mock = self._arrange_repo_mock(RepoMock)
+        foo_commit_info = self._arrange_foo_commit_info(repo_mock)
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                ignore_files_regex=ignore_files_regex)
+
+        # assert
+        expected_git_status = _get_git_status(foo_commit_info, 2, 3, 5, 10)
+        self._assert(RepoMock,
+                     repo_mock,
+                     git_status,
+                     foo_commit_info,
+                     expected_git_status=expected_git_status)
+
+    def test_fail_fast(self, RepoMock):
+        # arrange
+        repo_mock = self._arrange_repo_mock(RepoMock)
+        foo_commit_info = self._arrange_foo_commit_info(repo_mock)
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path, fail_fast=True)
+
+        # assert
+        assert _get_git_status(foo_commit_info, 1, 0, 0, 1, partial=True) == git_status
+        repo_mock.index.diff.assert_called_once_with("HEAD", paths=None)
+
+    def test_timings(self, RepoMock):
+        # arrange
+        repo_mock = self._arrange_repo_mock(RepoMock)
+        self._arrange_foo_commit_info(repo_mock)
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                ignore_files_regex=".*file-[23]",
+                                                timings=True)
+
+        # assert
+        assert [(REPO_OPEN, 0), (COMMIT_INFO, 0), (STAGED, 3), (FILTER, 5), (UNSTAGED, 5),
+                (UNTRACKED, 7)] == [(timing.phase, timing.count) for timing in git_status.timings]
+        assert all(timing.seconds >= 0 for timing in git_status.timings)
+
     def _arrange_repo_mock(self, RepoMock):
         repo_mock = RepoMock.return_value
+        repo_mock.git_dir = "foo/repo/path/.git"
         repo_mock.index.diff.side_effect = [
             self.foo_staged_files, self.foo_unstaged_files
         ]
-        repo_mock.untracked_files = self.foo_untracked_files
         repo_mock.git.rev_parse.return_value = self.foo_commit_sha
 
         return repo_mock
@@ -202,7 +299,7 @@ class TestUnitGitChecker_GetGitStatus:
                 _get_git_status(foo_commit_info, 3, 5, 7, expected_total_changes)
 
         assert expected_git_status == git_status
-        expected_diff_calls = [call("HEAD"), call(None)]
+        expected_diff_calls = [call("HEAD", paths=None), call(None, paths=None)]
         repo_mock.index.diff.assert_has_calls(expected_diff_calls)
 
 
@@ -222,6 +319,58 @@ class TestUnitGitChecker_GetStatusMsg:
         assert expected_msg == msg
         gitchecker.STATUS_MSG_TMPL = original_tmpl
 
+    def test_partial(self):
+        # arrange
+        foo_git_status = _get_git_status(total_changes=1, partial=True)
+
+        # act
+        msg = gitchecker._get_status_msg(foo_git_status)
+
+        # assert
+        assert "The repository is dirty (at least 1 pending change(s))" == msg
+
+    def test_dirty_submodules(self):
+        # arrange
+        foo_git_status = _get_git_status("foo-commit-info", 1, 2, 3, 6)._replace(submodules={
+            "foo-clean": _get_git_status(total_changes=0),
+            "foo-dirty": _get_git_status(total_changes=6),
+            "foo-dirty/foo-nested": _get_git_status(total_changes=1)})
+
+        # act
+        msg = gitchecker._get_status_msg(foo_git_status)
+
+        # assert
+        assert ("There are 1 staged file(s), 2 unstaged file(s) and 3 untracked file(s), "
+                "including the submodule(s): foo-dirty, foo-dirty/foo-nested") == msg
+
+    def test_timed_out(self):
+        # arrange
+        foo_git_status = _get_git_status("foo-commit-info", 1, 0, 0, 1, partial=True)._replace(
+            timed_out=True,
+            completed_phases=(COMMIT_INFO, STAGED),
+            submodules={"foo-timed-out": _get_git_status(total_changes=0)._replace(
+                timed_out=True)})
+
+        # act
+        msg = gitchecker._get_status_msg(foo_git_status)
+
+        # assert
+        assert ("The check timed out with at least 1 pending change(s) (completed phase(s): "
+                "commit_info, staged), timed out in the submodule(s): foo-timed-out") == msg
+
+    def test_timed_out_before_any_phase(self):
+        # arrange
+        foo_git_status = _get_git_status(None, 0, 0, 0, 0, partial=True)._replace(
+            timed_out=True,
+            completed_phases=())
+
+        # act
+        msg = gitchecker._get_status_msg(foo_git_status)
+
+        # assert
+        assert ("The check timed out with at least 0 pending change(s) "
+                "(completed phase(s): none)") == msg
+
 
 class TestUnitGitChecker_LogAndRaiseError:
 
@@ -281,3 +430,536 @@ class TestUnitGitChecker_Log:
         sep_msg = "*" * (1 + len(expected_warning_msg))
         expected_print_msg = sep_msg + "\n" + expected_warning_msg + "\n" + sep_msg
         print_mock.assert_called_once_with(expected_print_msg)
+
+
+@patch("gitchecker.gitchecker.porcelain")
+class TestUnitGitChecker_GetPorcelainGitStatus:
+
+    foo_repo_path = "foo/repo/path"
+    foo_changes = [Change(gitchecker.STAGED, "foo-staged/file-1.py"),
+                   Change(gitchecker.STAGED, "foo-staged/file-2.py", "foo-old.py"),
+                   Change(gitchecker.UNSTAGED, "foo-unstaged/file-1.py"),
+                   Change(gitchecker.UNTRACKED, "foo-untracked/file-1.py"),
+                   Change(gitchecker.UNTRACKED, "foo-untracked/file-2.py")]
+
+    def test_not_ignoring(self, porcelain_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   iter(self.foo_changes))
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                engine=gitchecker.PORCELAIN_ENGINE)
+
+        # assert
+        assert _get_git_status("foo-commit-info", 2, 1, 2, 5) == git_status
+        porcelain_mock.get_commit_info_and_changes.assert_called_once_with(
+            self.foo_repo_path, prune_matcher=None, pruned_dirs=[], timings=NO_TIMINGS,
+            deadline=NO_DEADLINE, paths=None, ignore_dirty_submodules=False)
+
+    def test_ignoring_files_regex_and_untracked(self, porcelain_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   iter(self.foo_changes))
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                ignore_files_regex=r"^foo-old\.py$|.*file-2",
+                                                ignore_untracked_files=True,
+                                                engine=gitchecker.PORCELAIN_ENGINE)
+
+        # assert
+        assert _get_git_status("foo-commit-info", 1, 1, 1, 2) == git_status
+
+    def test_timings(self, porcelain_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   iter(self.foo_changes))
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                ignore_files_regex=".*file-2",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                timings=True)
+
+        # assert
+        counts = {timing.phase: timing.count for timing in git_status.timings}
+        assert {STAGED: 2, UNSTAGED: 1, UNTRACKED: 2, FILTER: 2} == counts
+        assert isinstance(porcelain_mock.get_commit_info_and_changes.call_args[1]["timings"],
+                          Timings)
+
+    def test_fail_fast(self, porcelain_mock):
+        # arrange
+        foo_changes = (change for change in self.foo_changes)
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   foo_changes)
+
+        # act
+        git_status = gitchecker._get_git_status(self.foo_repo_path,
+                                                ignore_files_regex="foo-staged/file-1",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                fail_fast=True)
+
+        # assert
+        assert _get_git_status("foo-commit-info", 1, 0, 0, 1, partial=True) == git_status
+        assert GEN_CLOSED == getgeneratorstate(foo_changes)
+
+    def test_unknown_engine(self, porcelain_mock):
+        # act
+        with pytest.raises(ValueError):
+            gitchecker._get_git_status(self.foo_repo_path, engine="foo-engine")
+
+        # assert
+        porcelain_mock.get_commit_info_and_changes.assert_not_called()
+
+    def test_stat_cache_requires_native_engine(self, porcelain_mock):
+        # act
+        with pytest.raises(ValueError):
+            gitchecker._get_git_status(self.foo_repo_path,
+                                       engine=gitchecker.PORCELAIN_ENGINE,
+                                       stat_cache=True)
+
+        # assert
+        porcelain_mock.get_commit_info_and_changes.assert_not_called()
+
+
+@patch("gitchecker.gitchecker.porcelain")
+class TestUnitGitChecker_IterChanges:
+
+    foo_repo_path = "foo/repo/path"
+
+    def test_filtering(self, porcelain_mock):
+        # arrange
+        foo_changes = (change for change in TestUnitGitChecker_GetPorcelainGitStatus.foo_changes)
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   foo_changes)
+
+        # act
+        changes = list(gitchecker.iter_changes(self.foo_repo_path,
+                                               ignore_files_regex=".*file-2",
+                                               ignore_untracked_files=True,
+                                               engine=gitchecker.PORCELAIN_ENGINE))
+
+        # assert
+        assert [Change(gitchecker.STAGED, "foo-staged/file-1.py"),
+                Change(gitchecker.UNSTAGED, "foo-unstaged/file-1.py")] == changes
+
+    def test_close(self, porcelain_mock):
+        # arrange
+        foo_changes = (change for change in TestUnitGitChecker_GetPorcelainGitStatus.foo_changes)
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info",
+                                                                   foo_changes)
+        changes = gitchecker.iter_changes(self.foo_repo_path, engine=gitchecker.PORCELAIN_ENGINE)
+
+        # act
+        first_change = next(changes)
+        changes.close()
+
+        # assert
+        assert Change(gitchecker.STAGED, "foo-staged/file-1.py") == first_change
+        assert GEN_CLOSED == getgeneratorstate(foo_changes)
+
+
+class TestUnitGitChecker_IterChangesRenamed:
+
+    @pytest.mark.parametrize("engine", gitchecker.ENGINES)
+    def test_staged_rename(self, tmp_path, engine):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "foo-dir").mkdir()
+        (tmp_path / "foo-dir" / "foo-file.txt").write_text("foo-content\n")
+        repo.index.add(["foo-dir/foo-file.txt"])
+        repo.index.commit("foo-commit", author=FOO_ACTOR, committer=FOO_ACTOR)
+        repo.git.mv("foo-dir/foo-file.txt", "foo-dir/foo-renamed.txt")
+
+        # act
+        changes = list(gitchecker.iter_changes(str(tmp_path), engine=engine))
+
+        # assert
+        assert [Change(STAGED, "foo-dir/foo-renamed.txt", "foo-dir/foo-file.txt")] == changes
+
+
+@patch("gitchecker.gitchecker.iter_submodules")
+@patch("gitchecker.gitchecker.find_worktree")
+@patch("gitchecker.gitchecker._get_repo_git_status")
+class TestUnitGitChecker_RecurseSubmodules:
+
+    foo_statuses = {"foo/repo": _get_git_status("foo-commit-info", 1, 0, 2, 3, pruned_dirs=1),
+                    "foo/repo/foo-sub": _get_git_status("foo-sub-info", 0, 1, 0, 1),
+                    "foo/repo/foo-sub/foo-nested": _get_git_status("foo-nested-info", 0, 0, 4, 4,
+                                                                   partial=True)}
+
+    def test_counts_added(self, _get_repo_git_status_mock, find_worktree_mock,
+                          iter_submodules_mock):
+        # arrange
+        _get_repo_git_status_mock.side_effect = lambda path, **kwargs: self.foo_statuses[path]
+        find_worktree_mock.return_value = "foo/repo"
+        iter_submodules_mock.return_value = iter(["foo-sub", "foo-sub/foo-nested"])
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo",
+                                                ignore_untracked_files=True,
+                                                recurse_submodules=True)
+
+        # assert
+        expected_submodules = {"foo-sub": self.foo_statuses["foo/repo/foo-sub"],
+                               "foo-sub/foo-nested":
+                                   self.foo_statuses["foo/repo/foo-sub/foo-nested"]}
+        expected_git_status = _get_git_status("foo-commit-info", 1, 1, 6, 8, partial=True,
+                                              pruned_dirs=1)
+        assert expected_git_status._replace(submodules=expected_submodules) == git_status
+        assert all(kwargs["ignore_untracked_files"]
+                   for _, kwargs in _get_repo_git_status_mock.call_args_list)
+
+    def test_fail_fast_skips_submodules(self, _get_repo_git_status_mock, find_worktree_mock,
+                                        iter_submodules_mock):
+        # arrange
+        _get_repo_git_status_mock.return_value = self.foo_statuses["foo/repo"]
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo", fail_fast=True,
+                                                recurse_submodules=True)
+
+        # assert
+        assert self.foo_statuses["foo/repo"] == git_status
+        iter_submodules_mock.assert_not_called()
+
+
+@patch("gitchecker.gitchecker.commitgraph.get_upstream_info")
+@patch("gitchecker.gitchecker.porcelain")
+class TestUnitGitChecker_AheadBehind:
+
+    foo_commit_info = CommitInfo("f00c0mm", "foo-author", None, "foo-committer", None)
+
+    def test(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = (self.foo_commit_info, iter([]))
+        get_upstream_info_mock.return_value = ("origin/foo-branch", 2, 3)
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                ahead_behind=True)
+
+        # assert
+        expected_commit_info = self.foo_commit_info._replace(upstream="origin/foo-branch",
+                                                             ahead=2,
+                                                             behind=3)
+        assert expected_commit_info == git_status.commit_info
+        get_upstream_info_mock.assert_called_once_with("foo/repo/path", NO_DEADLINE)
+
+    def test_not_requested(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = (self.foo_commit_info, iter([]))
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE)
+
+        # assert
+        assert git_status.commit_info.upstream is None
+        get_upstream_info_mock.assert_not_called()
+
+
+@patch("gitchecker.gitchecker.status_memo", new_callable=memo.StatusMemo)
+@patch("gitchecker.gitchecker.validity_token")
+@patch("gitchecker.gitchecker._get_repo_git_status")
+class TestUnitGitChecker_Memoize:
+
+    foo_git_status = _get_git_status("foo-commit-info", 1, 0, 0, 1)
+
+    def test_memoized(self, _get_repo_git_status_mock, validity_token_mock, status_memo):
+        # arrange
+        _get_repo_git_status_mock.return_value = self.foo_git_status
+        validity_token_mock.side_effect = ["foo-token", "foo-token", "foo-token", "foo-new-token"]
+
+        # act
+        git_statuses = [gitchecker._get_git_status("foo/repo", memoize=True),
+                        gitchecker._get_git_status("foo/repo", memoize=True),
+                        gitchecker._get_git_status("foo/repo", memoize=True, fail_fast=True),
+                        gitchecker._get_git_status("foo/repo", memoize=True)]
+
+        # assert
+        assert [self.foo_git_status] * 4 == git_statuses
+        assert 3 == _get_repo_git_status_mock.call_count
+
+    def test_not_memoized_when_timed_out(self, _get_repo_git_status_mock, validity_token_mock,
+                                         status_memo):
+        # arrange
+        _get_repo_git_status_mock.return_value = self.foo_git_status._replace(timed_out=True)
+        validity_token_mock.return_value = "foo-token"
+
+        # act
+        gitchecker._get_git_status("foo/repo", memoize=True, timeout=1)
+        gitchecker._get_git_status("foo/repo", memoize=True, timeout=1)
+
+        # assert
+        assert 2 == _get_repo_git_status_mock.call_count
+        assert 0 == len(status_memo)
+
+    def test_not_memoized_when_timed(self, _get_repo_git_status_mock, validity_token_mock,
+                                     status_memo):
+        # act
+        gitchecker._get_git_status("foo/repo", memoize=True, timings=True)
+
+        # assert
+        validity_token_mock.assert_not_called()
+        assert 0 == len(status_memo)
+
+
+class TestUnitGitChecker_NormalizePaths:
+
+    def test(self):
+        # act
+        paths = gitchecker._normalize_paths(["foo/b/", "./foo/a", "foo/b/c", "foo/a", "bar"])
+
+        # assert
+        assert ("bar", "foo/a", "foo/b") == paths
+
+    def test_whole_repository(self):
+        # act
+        paths = [gitchecker._normalize_paths(None),
+                 gitchecker._normalize_paths([]),
+                 gitchecker._normalize_paths(["foo", "."])]
+
+        # assert
+        assert [None, None, None] == paths
+
+    def test_not_relative(self):
+        # act
+        with pytest.raises(ValueError):
+            gitchecker._normalize_paths(["foo/../../bar"])
+
+
+@patch("gitchecker.gitchecker.check_status_and_get_commit_info")
+class TestUnitGitChecker_CheckMany:
+
+    foo_error = Exception("foo-error")
+
+    def test_results_and_errors(self, check_mock):
+        # arrange
+        results = {"foo/clean": "foo-commit-info", "foo/dirty": self.foo_error}
+
+        def check(repo_path, *args, **kwargs):
+            if isinstance(results[repo_path], Exception):
+                raise results[repo_path]
+            return results[repo_path]
+        check_mock.side_effect = check
+
+        # act
+        checked = gitchecker.check_many(["foo/dirty", "foo/clean", "foo/dirty"],
+                                        max_workers=2,
+                                        ignore_untracked_files=True)
+
+        # assert
+        assert {"foo/dirty": self.foo_error, "foo/clean": "foo-commit-info"} == checked
+        assert ["foo/dirty", "foo/clean"] == list(checked)
+        assert 2 == check_mock.call_count
+        check_mock.assert_any_call("foo/clean", False, True, None, None,
+                                   engine=gitchecker.GITPYTHON_ENGINE,
+                                   stat_cache=False,
+                                   fail_fast=False,
+                                   timings_callback=None,
+                                   recurse_submodules=False,
+                                   paths=None,
+                                   memoize=False,
+                                   ahead_behind=False,
+                                   timeout=None,
+                                   warning_on_timeout=False)
+
+    def test_no_repositories(self, check_mock):
+        # act
+        checked = gitchecker.check_many([])
+
+        # assert
+        assert {} == checked
+        check_mock.assert_not_called()
+
+
+def _timing_out_engine(*changes, commit_info="foo-commit-info"):
+    """``get_commit_info_and_changes()`` of an engine whose deadline expires
+    after reading the commit info and yielding ``changes``, or before
+    reading it without ``commit_info``"""
+
+    def get_commit_info_and_changes(repo_path, timings, deadline, **kwargs):
+        if commit_info is None:
+            raise DeadlineExceeded("foo-timeout")
+
+        timings.lap(COMMIT_INFO)
+
+        def iter_changes():
+            yield from changes
+            raise DeadlineExceeded("foo-timeout")
+
+        return commit_info, iter_changes()
+
+    return get_commit_info_and_changes
+
+
+@patch("gitchecker.gitchecker.commitgraph.get_upstream_info")
+@patch("gitchecker.gitchecker.porcelain")
+class TestUnitGitChecker_Timeout:
+
+    def test_partial_counts(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.side_effect = _timing_out_engine(
+            Change(STAGED, "foo-staged.py"), Change(UNTRACKED, "foo-untracked.py"))
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                ahead_behind=True,
+                                                timeout=5)
+
+        # assert
+        assert _get_git_status("foo-commit-info", 1, 0, 1, 2, partial=True)._replace(
+            timed_out=True, completed_phases=(COMMIT_INFO,)) == git_status
+        assert isinstance(porcelain_mock.get_commit_info_and_changes.call_args[1]["deadline"],
+                          Deadline)
+        get_upstream_info_mock.assert_not_called()
+
+    def test_before_the_commit_info(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.side_effect = _timing_out_engine(
+            commit_info=None)
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                timeout=5)
+
+        # assert
+        assert git_status.commit_info is None
+        assert git_status.timed_out
+        assert () == git_status.completed_phases
+
+    def test_in_time(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        def get_commit_info_and_changes(repo_path, timings, **kwargs):
+            timings.lap(COMMIT_INFO)
+            return "foo-commit-info", iter([Change(UNSTAGED, "foo-unstaged.py")])
+
+        porcelain_mock.get_commit_info_and_changes.side_effect = get_commit_info_and_changes
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                timeout=5)
+
+        # assert
+        assert not git_status.timed_out
+        assert not git_status.partial
+        assert (COMMIT_INFO,) == git_status.completed_phases
+
+    def test_without_timeout(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        porcelain_mock.get_commit_info_and_changes.return_value = ("foo-commit-info", iter([]))
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE)
+
+        # assert
+        assert git_status.completed_phases is None
+        assert porcelain_mock.get_commit_info_and_changes.call_args[1]["deadline"] is NO_DEADLINE
+
+    def test_ahead_behind(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        def get_commit_info_and_changes(repo_path, timings, **kwargs):
+            timings.lap(COMMIT_INFO)
+            return "foo-commit-info", iter([Change(UNSTAGED, "foo-unstaged.py")])
+
+        porcelain_mock.get_commit_info_and_changes.side_effect = get_commit_info_and_changes
+        get_upstream_info_mock.side_effect = DeadlineExceeded("foo-timeout")
+
+        # act
+        git_status = gitchecker._get_git_status("foo/repo/path",
+                                                engine=gitchecker.PORCELAIN_ENGINE,
+                                                ahead_behind=True,
+                                                timeout=5)
+
+        # assert
+        assert _get_git_status("foo-commit-info", 0, 1, 0, 1)._replace(
+            timed_out=True, completed_phases=(COMMIT_INFO,)) == git_status
+        assert isinstance(get_upstream_info_mock.call_args[0][1], Deadline)
+
+    def test_ahead_behind_async(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        async def get_commit_info_and_changes_async(repo_path, prune_matcher, pruned_dirs, paths,
+                                                    timings, deadline, ignore_dirty_submodules):
+            timings.lap(COMMIT_INFO)
+
+            async def aiter_changes():
+                yield Change(UNSTAGED, "foo-unstaged.py")
+
+            return "foo-commit-info", aiter_changes()
+
+        porcelain_mock.get_commit_info_and_changes_async.side_effect = \
+            get_commit_info_and_changes_async
+        get_upstream_info_mock.side_effect = DeadlineExceeded("foo-timeout")
+
+        # act
+        git_status = asyncio.run(gitchecker._get_git_status_async(
+            "foo/repo/path", engine=gitchecker.PORCELAIN_ENGINE, ahead_behind=True, timeout=5))
+
+        # assert
+        assert _get_git_status("foo-commit-info", 0, 1, 0, 1)._replace(
+            timed_out=True, completed_phases=(COMMIT_INFO,)) == git_status
+        assert isinstance(get_upstream_info_mock.call_args[0][1], Deadline)
+
+    def test_async(self, porcelain_mock, get_upstream_info_mock):
+        # arrange
+        async def get_commit_info_and_changes_async(repo_path, prune_matcher, pruned_dirs, paths,
+                                                    timings, deadline, ignore_dirty_submodules):
+            timings.lap(COMMIT_INFO)
+
+            async def aiter_changes():
+                yield Change(STAGED, "foo-staged.py")
+                raise DeadlineExceeded("foo-timeout")
+
+            return "foo-commit-info", aiter_changes()
+
+        porcelain_mock.get_commit_info_and_changes_async.side_effect = \
+            get_commit_info_and_changes_async
+
+        # act
+        git_status = asyncio.run(gitchecker._get_git_status_async(
+            "foo/repo/path", engine=gitchecker.PORCELAIN_ENGINE, timeout=5))
+
+        # assert
+        assert _get_git_status("foo-commit-info", 1, 0, 0, 1, partial=True)._replace(
+            timed_out=True, completed_phases=(COMMIT_INFO,)) == git_status
+
+
+class TestUnitGitChecker_CheckGitStatus:
+
+    @pytest.mark.parametrize("total_changes,timed_out,warning_instead_of_error,"
+                             "warning_on_timeout,expected", [
+                                 (0, False, False, False, None),
+                                 (1, False, False, True, "error"),
+                                 (1, False, True, False, "warning"),
+                                 (0, True, False, False, "error"),
+                                 (0, True, False, True, "warning"),
+                                 (1, True, True, False, "error"),
+                                 (1, True, False, True, "error"),
+                                 (1, True, True, True, "warning"),
+                             ])
+    @patch("gitchecker.gitchecker._log_warning")
+    @patch("gitchecker.gitchecker._log_and_raise_error")
+    def test_policies(self, _log_and_raise_error_mock, _log_warning_mock, total_changes,
+                      timed_out, warning_instead_of_error, warning_on_timeout, expected):
+        # arrange
+        foo_git_status = _get_git_status("foo-commit-info", total_changes, 0, 0, total_changes)
+        foo_git_status = foo_git_status._replace(timed_out=timed_out,
+                                                 partial=timed_out,
+                                                 completed_phases=())
+
+        # act
+        commit_info = gitchecker._check_git_status(foo_git_status,
+                                                   warning_instead_of_error,
+                                                   warning_on_timeout=warning_on_timeout)
+
+        # assert
+        assert "foo-commit-info" == commit_info
+        assert (expected == "error") == _log_and_raise_error_mock.called
+        assert (expected == "warning") == _log_warning_mock.called
@@ -0,0 +1,197 @@
+from datetime import datetime, timezone
+import json
+from unittest.mock import patch
+import pytest
+
+from gitchecker import cli
+from gitchecker.status import CommitInfo, GitStatus, PhaseTiming
+
+
+FOO_DATETIME = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+FOO_COMMIT_INFO = CommitInfo("f00c0mm", "foo-author", FOO_DATETIME, "foo-committer", FOO_DATETIME)
+FOO_CLEAN_STATUS = GitStatus(FOO_COMMIT_INFO, 0, 0, 0, 0)
+FOO_DIRTY_STATUS = GitStatus(FOO_COMMIT_INFO, 1, 2, 3, 6)
+
+
+@patch.object(cli, "_get_git_status")
+class TestUnitCli_Main:
+
+    def test_clean(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_CLEAN_STATUS
+
+        # act
+        exit_code = cli.main(["foo/repo/path"])
+
+        # assert
+        stdout, stderr = capsys.readouterr()
+        assert cli.EXIT_OK == exit_code
+        assert "sha: f00c0mm\n" in stdout
+        assert "authored_datetime: 2020-01-02T03:04:05+00:00\n" in stdout
+        assert "" == stderr
+        _get_git_status_mock.assert_called_once_with("foo/repo/path", None, False,
+                                                     engine=cli.NATIVE_ENGINE,
+                                                     stat_cache=False,
+                                                     fail_fast=False,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     ahead_behind=False,
+                                                     timeout=None)
+
+    def test_dirty(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_DIRTY_STATUS
+
+        # act
+        exit_code = cli.main(["-u", "-i", "foo-regex", "-i", "glob:foo-glob",
+                              "-e", "porcelain", "--fail-fast"])
+
+        # assert
+        _, stderr = capsys.readouterr()
+        assert cli.EXIT_DIRTY == exit_code
+        assert stderr.startswith("ERROR: There are 1 staged file(s)")
+        _get_git_status_mock.assert_called_once_with("", ["foo-regex", "glob:foo-glob"], True,
+                                                     engine="porcelain",
+                                                     stat_cache=False,
+                                                     fail_fast=True,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     ahead_behind=False,
+                                                     timeout=None)
+
+    def test_dirty_with_warning(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_DIRTY_STATUS
+
+        # act
+        exit_code = cli.main(["--warning-instead-of-error", "--fail-fast"])
+
+        # assert
+        _, stderr = capsys.readouterr()
+        assert cli.EXIT_OK == exit_code
+        assert stderr.startswith("WARNING: ")
+        assert not _get_git_status_mock.call_args[1]["fail_fast"]
+
+    def test_timed_out(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_CLEAN_STATUS._replace(
+            commit_info=None, partial=True, timed_out=True, completed_phases=())
+
+        # act
+        exit_code = cli.main(["--timeout", "2.5", "--warning-instead-of-error"])
+
+        # assert
+        stdout, stderr = capsys.readouterr()
+        assert cli.EXIT_TIMEOUT == exit_code
+        assert "" == stdout
+        assert stderr.startswith("ERROR: The check timed out")
+        assert 2.5 == _get_git_status_mock.call_args[1]["timeout"]
+
+    def test_timed_out_with_warning(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_CLEAN_STATUS._replace(
+            partial=True, timed_out=True, completed_phases=("repo_open", "commit_info"))
+
+        # act
+        exit_code = cli.main(["--timeout", "1", "--warning-on-timeout", "--format", "json"])
+
+        # assert
+        stdout, stderr = capsys.readouterr()
+        assert cli.EXIT_OK == exit_code
+        assert ["repo_open", "commit_info"] == json.loads(stdout)["completed_phases"]
+        assert stderr.startswith("WARNING: The check timed out")
+
+    def test_dirty_and_timed_out(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_DIRTY_STATUS._replace(
+            partial=True, timed_out=True, completed_phases=())
+
+        # act
+        exit_code = cli.main(["--timeout", "1", "--warning-on-timeout"])
+
+        # assert
+        assert cli.EXIT_DIRTY == exit_code
+
+    def test_ahead_behind(self, _get_git_status_mock, capsys):
+        # arrange
+        commit_info = FOO_COMMIT_INFO._replace(upstream="origin/foo-branch", ahead=2, behind=0)
+        _get_git_status_mock.return_value = FOO_CLEAN_STATUS._replace(commit_info=commit_info)
+
+        # act
+        exit_code = cli.main(["--ahead-behind"])
+
+        # assert
+        stdout, _ = capsys.readouterr()
+        assert cli.EXIT_OK == exit_code
+        assert "upstream: origin/foo-branch\nahead: 2\nbehind: 0\n" in stdout
+        assert _get_git_status_mock.call_args[1]["ahead_behind"]
+
+    def test_no_upstream_fields(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_CLEAN_STATUS
+
+        # act
+        cli.main([])
+
+        # assert
+        stdout, _ = capsys.readouterr()
+        assert "upstream" not in stdout
+        assert "ahead" not in stdout
+
+    def test_json(self, _get_git_status_mock, capsys):
+        # arrange
+        timings = (PhaseTiming("foo-phase", 0.5, 3),)
+        _get_git_status_mock.return_value = FOO_DIRTY_STATUS._replace(timings=timings)
+
+        # act
+        exit_code = cli.main(["--format", "json", "--timings"])
+
+        # assert
+        stdout, _ = capsys.readouterr()
+        output = json.loads(stdout)
+        assert cli.EXIT_DIRTY == exit_code
+        assert "f00c0mm" == output["commit_info"]["sha"]
+        assert "2020-01-02T03:04:05+00:00" == output["commit_info"]["committed_datetime"]
+        assert 6 == output["total_changes"]
+        assert [{"phase": "foo-phase", "seconds": 0.5, "count": 3}] == output["timings"]
+
+    def test_json_submodules(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.return_value = FOO_DIRTY_STATUS._replace(
+            submodules={"foo/submodule": FOO_DIRTY_STATUS})
+
+        # act
+        exit_code = cli.main(["--format", "json", "--recurse-submodules"])
+
+        # assert
+        stdout, _ = capsys.readouterr()
+        output = json.loads(stdout)
+        assert cli.EXIT_DIRTY == exit_code
+        assert 6 == output["submodules"]["foo/submodule"]["total_changes"]
+        assert "f00c0mm" == output["submodules"]["foo/submodule"]["commit_info"]["sha"]
+        assert _get_git_status_mock.call_args[1]["recurse_submodules"]
+
+    def test_error(self, _get_git_status_mock, capsys):
+        # arrange
+        _get_git_status_mock.side_effect = Exception("foo-error")
+
+        # act
+        exit_code = cli.main([])
+
+        # assert
+        _, stderr = capsys.readouterr()
+        assert cli.EXIT_ERROR == exit_code
+        assert "ERROR: foo-error\n" == stderr
+
+    @pytest.mark.parametrize("argv", [["--stat-cache", "--engine", "gitpython"],
+                                      ["--stat-cache", "--path", "foo-dir"]])
+    def test_usage_error(self, _get_git_status_mock, argv):
+        # act
+        with pytest.raises(SystemExit) as ex:
+            cli.main(argv)
+
+        # assert
+        assert cli.EXIT_USAGE == ex.value.code
+        _get_git_status_mock.assert_not_called()
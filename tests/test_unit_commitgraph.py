@@ -0,0 +1,142 @@
+from git import Actor, Repo
+import pytest
+
+from gitchecker import commitgraph
+from gitchecker.deadline import Deadline, DeadlineExceeded
+
+
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+FOO_TIMESTAMP = 1500000000
+
+
+def _commit(repo, worktree, content, parents, timestamp=FOO_TIMESTAMP):
+    (worktree / "foo.py").write_text(content)
+    repo.index.add(["foo.py"])
+    date = "{} +0000".format(timestamp)
+
+    return repo.index.commit(content, parent_commits=parents, head=False,
+                             author=FOO_ACTOR, committer=FOO_ACTOR,
+                             author_date=date, commit_date=date)
+
+
+@pytest.fixture(params=[0, 60], ids=["same-dates", "newer-head"])
+def diverged_repo(request, tmp_path):
+    """``master`` 3 commits ahead (one of them a merge) and 2 behind
+    ``foo-upstream``, all of them committed in the same second or the
+    ``master`` ones later"""
+
+    repo = Repo.init(str(tmp_path))
+    base = _commit(repo, tmp_path, "base", [])
+    for i in range(5):
+        base = _commit(repo, tmp_path, "base {}".format(i), [base])
+    upstream = _commit(repo, tmp_path, "upstream 1", [base])
+    upstream = _commit(repo, tmp_path, "upstream 2", [upstream])
+    head_timestamp = FOO_TIMESTAMP + request.param
+    side = _commit(repo, tmp_path, "side", [base], head_timestamp)
+    head = _commit(repo, tmp_path, "head", [base], head_timestamp)
+    head = _commit(repo, tmp_path, "merge", [head, side], head_timestamp)
+    repo.create_head("foo-upstream", upstream)
+    repo.head.reference = repo.create_head("master", head, force=True)
+    with repo.config_writer() as config:
+        config.set_value('branch "master"', "remote", ".")
+        config.set_value('branch "master"', "merge", "refs/heads/foo-upstream")
+
+    return repo
+
+
+class TestUnitCommitGraph_GetUpstreamInfo:
+
+    @pytest.mark.parametrize("graph_args", [None,
+                                            ["--reachable"],
+                                            ["--reachable", "--split"]],
+                             ids=["objects", "commit-graph", "commit-graph-chain"])
+    def test_diverged(self, diverged_repo, graph_args):
+        # arrange
+        if graph_args:
+            diverged_repo.git.commit_graph("write", *graph_args)
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(diverged_repo.working_tree_dir)
+
+        # assert
+        assert ("foo-upstream", 3, 2) == upstream_info
+
+    def test_commits_newer_than_the_graph(self, diverged_repo, tmp_path):
+        # arrange
+        diverged_repo.git.commit_graph("write", "--reachable")
+        head = _commit(diverged_repo, tmp_path, "after the graph", [diverged_repo.head.commit])
+        diverged_repo.head.reference.commit = head
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(str(tmp_path))
+
+        # assert
+        assert ("foo-upstream", 4, 2) == upstream_info
+
+    def test_up_to_date(self, diverged_repo):
+        # arrange
+        diverged_repo.heads["foo-upstream"].commit = diverged_repo.head.commit
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(diverged_repo.working_tree_dir)
+
+        # assert
+        assert ("foo-upstream", 0, 0) == upstream_info
+
+    def test_remote_tracking_branch(self, diverged_repo):
+        # arrange
+        diverged_repo.git.update_ref("refs/remotes/foo-remote/master",
+                                     diverged_repo.heads["foo-upstream"].commit.hexsha)
+        with diverged_repo.config_writer() as config:
+            config.set_value('branch "master"', "remote", "foo-remote")
+            config.set_value('branch "master"', "merge", "refs/heads/master")
+            config.set_value('remote "foo-remote"', "fetch",
+                             "+refs/heads/*:refs/remotes/foo-remote/*")
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(diverged_repo.working_tree_dir)
+
+        # assert
+        assert ("foo-remote/master", 3, 2) == upstream_info
+
+    def test_upstream_gone(self, diverged_repo):
+        # arrange
+        diverged_repo.delete_head("foo-upstream", force=True)
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(diverged_repo.working_tree_dir)
+
+        # assert
+        assert ("foo-upstream", None, None) == upstream_info
+
+    def test_detached_head(self, diverged_repo):
+        # arrange
+        diverged_repo.head.reference = diverged_repo.head.commit
+
+        # act
+        upstream_info = commitgraph.get_upstream_info(diverged_repo.working_tree_dir)
+
+        # assert
+        assert (None, None, None) == upstream_info
+
+    def test_deadline_expired(self, diverged_repo):
+        # act
+        with pytest.raises(DeadlineExceeded):
+            commitgraph.get_upstream_info(diverged_repo.working_tree_dir, Deadline(0))
+
+
+class TestUnitCommitGraph_MapRefspec:
+
+    @pytest.mark.parametrize("refspec,ref,expected", [
+        ("+refs/heads/*:refs/remotes/origin/*", "refs/heads/foo", "refs/remotes/origin/foo"),
+        ("refs/heads/foo:refs/remotes/origin/bar", "refs/heads/foo", "refs/remotes/origin/bar"),
+        ("refs/heads/foo:refs/remotes/origin/bar", "refs/heads/baz", None),
+        ("refs/heads/foo-*-x:refs/foo/*", "refs/heads/foo-1-x", "refs/foo/1"),
+        ("refs/heads/foo-*-x:refs/foo/*", "refs/heads/foo-x", None),
+    ])
+    def test(self, refspec, ref, expected):
+        # act
+        destination = commitgraph._map_refspec(refspec, ref)
+
+        # assert
+        assert expected == destination
@@ -0,0 +1,394 @@
+from datetime import datetime, timedelta, timezone
+import os
+import re
+import socket
+import stat
+import threading
+from unittest.mock import patch
+from git import Actor, Repo
+import pytest
+
+from gitchecker import daemon, gitchecker, memo
+from gitchecker.status import CommitInfo, GitStatus, PhaseTiming
+
+
+FOO_DATETIME = datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone(-timedelta(hours=3, minutes=30)))
+FOO_COMMIT_INFO = CommitInfo("f00c0mm", "foo-author", FOO_DATETIME, "foo-committer", FOO_DATETIME)
+FOO_STATUS = GitStatus(FOO_COMMIT_INFO, 1, 2, 3, 6)
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+
+@pytest.fixture
+def status_daemon(tmp_path):
+    status_daemon = daemon.StatusDaemon(str(tmp_path / "foo.sock"))
+    thread = threading.Thread(target=status_daemon.serve_forever, daemon=True)
+    thread.start()
+    yield status_daemon
+    status_daemon.shutdown()
+    status_daemon.server_close()
+
+
+class TestUnitDaemon_EncodeStatus:
+
+    def test_round_trip(self):
+        # arrange
+        git_status = FOO_STATUS._replace(
+            commit_info=FOO_COMMIT_INFO._replace(upstream="origin/foo", ahead=1, behind=0),
+            timings=(PhaseTiming("foo-phase", 0.5, 3),),
+            submodules={"foo-sub": GitStatus(FOO_COMMIT_INFO, 0, 0, 1, 1)})
+
+        # act
+        decoded = daemon._decode_status(daemon._encode_status(git_status))
+
+        # assert
+        assert git_status == decoded
+        assert FOO_DATETIME.utcoffset() == decoded.commit_info.authored_datetime.utcoffset()
+
+    def test_round_trip_timed_out(self):
+        # arrange
+        git_status = GitStatus(None, 0, 0, 0, 0, True, timed_out=True, completed_phases=())
+
+        # act
+        decoded = daemon._decode_status(daemon._encode_status(git_status))
+
+        # assert
+        assert git_status == decoded
+
+
+class TestUnitDaemon_Patterns:
+
+    @pytest.mark.parametrize("ignore_files_regex,expected", [
+        (None, []),
+        ("foo-regex", ["foo-regex"]),
+        (["foo-regex", "glob:foo/**", re.compile("foo-compiled")],
+         ["foo-regex", "glob:foo/**", "foo-compiled"]),
+        (re.compile("foo", re.IGNORECASE), None),
+    ])
+    def test(self, ignore_files_regex, expected):
+        # act
+        patterns = daemon._patterns(ignore_files_regex)
+
+        # assert
+        assert expected == patterns
+
+
+@patch("gitchecker.daemon._get_git_status")
+class TestUnitDaemon_CheckStatusAndGetCommitInfo:
+
+    def test_asks_the_daemon(self, _get_git_status_mock, status_daemon):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS
+        timings_callback_calls = []
+
+        # act
+        commit_info = daemon.check_status_and_get_commit_info(
+            "/foo/repo",
+            warning_instead_of_error=True,
+            ignore_files_regex="foo-regex",
+            paths=["foo-dir"],
+            timings_callback=lambda *args: timings_callback_calls.append(args),
+            socket_path=status_daemon.socket_path)
+
+        # assert
+        assert FOO_COMMIT_INFO == commit_info
+        assert [("/foo/repo", FOO_STATUS)] == timings_callback_calls
+        args, kwargs = _get_git_status_mock.call_args
+        assert "/foo/repo" == args[0]
+        assert ("foo-regex",) == args[1].patterns
+        assert ("foo-dir",) == kwargs["paths"]
+        assert kwargs["timings"]
+        assert kwargs["memoize"]
+        assert not kwargs["fail_fast"]
+
+    def test_dirty_raises_in_the_client(self, _get_git_status_mock, status_daemon):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS
+
+        # act
+        with pytest.raises(Exception) as ex:
+            daemon.check_status_and_get_commit_info("/foo/repo", logger=FooLogger(),
+                                                    socket_path=status_daemon.socket_path)
+
+        # assert
+        assert str(ex.value).startswith("ERROR: There are 1 staged file(s)")
+
+    def test_timed_out_warns_in_the_client(self, _get_git_status_mock, status_daemon):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS._replace(
+            total_changes=0, partial=True, timed_out=True, completed_phases=("commit_info",))
+        logger = FooLogger()
+
+        # act
+        commit_info = daemon.check_status_and_get_commit_info(
+            "/foo/repo", logger=logger, timeout=2, warning_on_timeout=True,
+            socket_path=status_daemon.socket_path)
+
+        # assert
+        assert FOO_COMMIT_INFO == commit_info
+        assert 2 == _get_git_status_mock.call_args[1]["timeout"]
+        assert logger.warnings[0].startswith("The check timed out")
+
+    def test_daemon_error(self, _get_git_status_mock, status_daemon):
+        # arrange
+        _get_git_status_mock.side_effect = ValueError("foo-error")
+
+        # act
+        with pytest.raises(ValueError) as ex:
+            daemon.check_status_and_get_commit_info("/foo/repo",
+                                                    socket_path=status_daemon.socket_path)
+
+        # assert
+        assert "foo-error" == str(ex.value)
+
+    def test_connection_reused_and_reopened(self, _get_git_status_mock, tmp_path):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS._replace(total_changes=0)
+        socket_path = str(tmp_path / "foo-restarted.sock")
+        client = daemon.get_client(socket_path)
+        connections = []
+
+        # act
+        for _ in range(2):
+            status_daemon = daemon.StatusDaemon(socket_path)
+            thread = threading.Thread(target=status_daemon.serve_forever, daemon=True)
+            thread.start()
+            try:
+                for _ in range(2):
+                    daemon.check_status_and_get_commit_info("/foo/repo", socket_path=socket_path)
+                    connections.append(client._file)
+            finally:
+                status_daemon.shutdown()
+                status_daemon.server_close()
+
+        # assert
+        assert 4 == _get_git_status_mock.call_count
+        assert 2 == len(set(map(id, connections)))
+
+    @patch("gitchecker.daemon._peer_uid")
+    def test_in_process_with_daemon_of_another_user(self, _peer_uid_mock, _get_git_status_mock,
+                                                    status_daemon):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS._replace(total_changes=0)
+        _peer_uid_mock.return_value = os.getuid() + 1
+
+        # act
+        commit_info = daemon.check_status_and_get_commit_info(
+            "foo/repo", socket_path=status_daemon.socket_path)
+
+        # assert
+        assert FOO_COMMIT_INFO == commit_info
+        # the ignore_files_regex isn't compiled by the daemon
+        assert ("foo/repo", None) == _get_git_status_mock.call_args[0]
+        _get_git_status_mock.assert_called_once()
+
+    def test_in_process_without_daemon(self, _get_git_status_mock, tmp_path):
+        # arrange
+        _get_git_status_mock.return_value = FOO_STATUS._replace(total_changes=0)
+
+        # act
+        commit_info = daemon.check_status_and_get_commit_info(
+            "foo/repo", socket_path=str(tmp_path / "foo-missing.sock"))
+
+        # assert
+        assert FOO_COMMIT_INFO == commit_info
+        _get_git_status_mock.assert_called_once_with("foo/repo", None,
+                                                     ignore_untracked_files=False,
+                                                     engine=daemon.GITPYTHON_ENGINE,
+                                                     stat_cache=False,
+                                                     fail_fast=False,
+                                                     timings=False,
+                                                     recurse_submodules=False,
+                                                     paths=None,
+                                                     ahead_behind=False,
+                                                     timeout=None)
+
+
+class FooLogger:
+
+    def __init__(self):
+        self.warnings = []
+
+    def error(self, msg):
+        pass
+
+    def warning(self, msg):
+        self.warnings.append(msg)
+
+
+class TestUnitDaemon_DefaultSocketPath:
+
+    @patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/foo/runtime"})
+    def test_runtime_dir(self):
+        # arrange
+        os.environ.pop(daemon.SOCKET_ENV_VAR, None)
+
+        # act
+        socket_path = daemon.default_socket_path()
+
+        # assert
+        assert "/foo/runtime/gitchecker-{}.sock".format(os.getuid()) == socket_path
+
+    @patch.dict(os.environ, {})
+    @patch("gitchecker.daemon.tempfile.gettempdir")
+    def test_private_dir_without_runtime_dir(self, gettempdir_mock):
+        # arrange
+        os.environ.pop(daemon.SOCKET_ENV_VAR, None)
+        os.environ.pop("XDG_RUNTIME_DIR", None)
+        gettempdir_mock.return_value = "/foo/tmp"
+
+        # act
+        socket_path = daemon.default_socket_path()
+
+        # assert
+        assert "/foo/tmp/gitchecker-{}/gitchecker.sock".format(os.getuid()) == socket_path
+
+
+class TestUnitDaemon_StatusDaemon:
+
+    def test_identical_checks_run_once(self, status_daemon):
+        # arrange
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_check(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return FOO_STATUS
+
+        results = []
+
+        def get_git_status():
+            results.append(status_daemon.get_git_status("/foo/repo", [], {"engine": "native"}))
+
+        # act
+        with patch("gitchecker.daemon._get_git_status", side_effect=slow_check) as check_mock:
+            first = threading.Thread(target=get_git_status)
+            first.start()
+            started.wait(5)
+            second = threading.Thread(target=get_git_status)
+            second.start()
+            # the second request waits for the check of the first one
+            second.join(0.1)
+            release.set()
+            first.join(5)
+            second.join(5)
+
+        # assert
+        assert [FOO_STATUS, FOO_STATUS] == results
+        assert 1 == check_mock.call_count
+
+    @pytest.mark.parametrize("client_memoize,daemon_memoize,expected_memoize", [
+        (False, True, False),
+        (True, False, True),
+        (None, True, True),
+        (None, False, False),
+    ])
+    def test_memoize_honored(self, tmp_path, client_memoize, daemon_memoize, expected_memoize):
+        # arrange
+        status_daemon = daemon.StatusDaemon(str(tmp_path / "foo.sock"), memoize=daemon_memoize)
+        options = {} if client_memoize is None else {"memoize": client_memoize}
+
+        # act
+        try:
+            with patch("gitchecker.daemon._get_git_status", return_value=FOO_STATUS) as check_mock:
+                status_daemon.get_git_status("/foo/repo", [], options)
+        finally:
+            status_daemon.server_close()
+
+        # assert
+        assert expected_memoize is check_mock.call_args[1]["memoize"]
+
+    @patch("gitchecker.gitchecker.status_memo", new_callable=memo.StatusMemo)
+    def test_default_request_memoized(self, status_memo, status_daemon, tmp_path):
+        # arrange
+        repo_path = tmp_path / "foo-repo"
+        repo = Repo.init(str(repo_path))
+        (repo_path / "foo.txt").write_text("foo\n")
+        repo.index.add(["foo.txt"])
+        repo.index.commit("foo-commit", author=FOO_ACTOR, committer=FOO_ACTOR)
+        commit_infos = []
+
+        # act
+        with patch("gitchecker.gitchecker._get_repo_git_status",
+                   wraps=gitchecker._get_repo_git_status) as _get_repo_git_status_mock:
+            for _ in range(2):
+                # no git process refreshing the racily clean index
+                commit_infos.append(daemon.check_status_and_get_commit_info(
+                    str(repo_path), engine=gitchecker.NATIVE_ENGINE,
+                    socket_path=status_daemon.socket_path))
+
+        # assert
+        assert commit_infos[0] == commit_infos[1]
+        assert 1 == _get_repo_git_status_mock.call_count
+        assert 1 == len(status_memo)
+
+    def test_peer_uid(self, status_daemon):
+        # arrange
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        # act
+        try:
+            sock.connect(status_daemon.socket_path)
+            uid = daemon._peer_uid(sock, status_daemon.socket_path)
+        finally:
+            sock.close()
+
+        # assert
+        assert os.getuid() == uid
+
+    def test_already_listening(self, status_daemon):
+        # act
+        with pytest.raises(Exception) as ex:
+            daemon.StatusDaemon(status_daemon.socket_path)
+
+        # assert
+        assert str(ex.value).startswith("A daemon is already listening at ")
+
+    def test_stale_socket_replaced(self, tmp_path):
+        # arrange
+        socket_path = str(tmp_path / "foo-stale.sock")
+        daemon.StatusDaemon(socket_path).socket.close()
+
+        # act
+        status_daemon = daemon.StatusDaemon(socket_path)
+        status_daemon.server_close()
+
+        # assert
+        assert status_daemon.socket_path == socket_path
+
+    def test_not_a_socket_kept(self, tmp_path):
+        # arrange
+        foo_path = tmp_path / "foo-file.sock"
+        foo_path.write_text("foo-content")
+
+        # act
+        with pytest.raises(Exception) as ex:
+            daemon.StatusDaemon(str(foo_path))
+
+        # assert
+        assert "'{}' isn't a socket of the current user".format(foo_path) == str(ex.value)
+        assert "foo-content" == foo_path.read_text()
+
+    def test_private_socket_dir_created(self, tmp_path):
+        # arrange
+        socket_dir = tmp_path / "foo-dir"
+
+        # act
+        daemon.StatusDaemon(str(socket_dir / "foo.sock")).server_close()
+
+        # assert
+        assert daemon.SOCKET_DIR_MODE == stat.S_IMODE(os.stat(str(socket_dir)).st_mode)
+
+    def test_shared_socket_dir(self, tmp_path):
+        # arrange
+        socket_dir = tmp_path / "foo-shared"
+        socket_dir.mkdir()
+        socket_dir.chmod(0o777)
+
+        # act
+        with pytest.raises(Exception) as ex:
+            daemon.StatusDaemon(str(socket_dir / "foo.sock"))
+
+        # assert
+        assert str(ex.value).endswith("can be modified by other users")
+        assert not os.path.lexists(str(socket_dir / "foo.sock"))
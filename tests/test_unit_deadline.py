@@ -0,0 +1,121 @@
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+import pytest
+
+from gitchecker import deadline
+from gitchecker.status import PhaseTiming
+from gitchecker.timings import NO_TIMINGS, Timings
+
+
+SLEEP_ARGS = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+@patch.object(deadline.time, "monotonic")
+class TestUnitDeadline_Deadline:
+
+    def test_check(self, monotonic_mock):
+        # arrange
+        monotonic_mock.return_value = 100
+        foo_deadline = deadline.Deadline(5)
+
+        # act
+        monotonic_mock.return_value = 104
+        foo_deadline.check()
+        remaining = foo_deadline.remaining()
+        monotonic_mock.return_value = 105
+        with pytest.raises(deadline.DeadlineExceeded) as ex:
+            foo_deadline.check()
+
+        # assert
+        assert 1 == remaining
+        assert 0 == foo_deadline.remaining()
+        assert "The check timed out after 5s" == str(ex.value)
+
+    def test_checked(self, monotonic_mock):
+        # arrange
+        monotonic_mock.side_effect = [100, 101, 102, 106]
+        foo_deadline = deadline.Deadline(5)
+        items = []
+
+        # act
+        with pytest.raises(deadline.DeadlineExceeded):
+            for item in foo_deadline.checked(["foo-1", "foo-2", "foo-3"]):
+                items.append(item)
+
+        # assert
+        assert ["foo-1", "foo-2"] == items
+
+    def test_no_deadline(self, monotonic_mock):
+        # arrange
+        foo_items = ["foo-1", "foo-2"]
+
+        # act
+        deadline.NO_DEADLINE.check()
+
+        # assert
+        assert not deadline.NO_DEADLINE
+        assert deadline.NO_DEADLINE.remaining() is None
+        assert foo_items is deadline.NO_DEADLINE.checked(foo_items)
+        monotonic_mock.assert_not_called()
+
+
+class TestUnitDeadline_Processes:
+
+    def test_communicate_kills(self):
+        # arrange
+        proc = subprocess.Popen(SLEEP_ARGS, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        start = time.monotonic()
+
+        # act
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.Deadline(0.2).communicate(proc)
+
+        # assert
+        assert time.monotonic() - start < 10
+        assert proc.returncode is not None
+
+    def test_kill_on_expiry(self):
+        # arrange
+        proc = subprocess.Popen(SLEEP_ARGS, stdout=subprocess.PIPE)
+
+        # act
+        deadline.Deadline(0.2).kill_on_expiry(proc)
+        stdout = proc.stdout.read()
+
+        # assert
+        assert b"" == stdout
+        assert proc.wait(10) != 0
+
+    def test_kill_cancelled(self):
+        # arrange
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.5)"])
+
+        # act
+        deadline.Deadline(0.1).kill_on_expiry(proc).cancel()
+
+        # assert
+        assert 0 == proc.wait(10)
+
+
+class TestUnitDeadline_PhaseLog:
+
+    @pytest.mark.parametrize("timings", [Timings(), NO_TIMINGS], ids=["timed", "not-timed"])
+    def test(self, timings):
+        # arrange
+        phases = deadline.PhaseLog(timings)
+
+        # act
+        phases.lap("foo-phase-1")
+        phases.count("foo-phase-2", 2)
+        phases.lap("foo-phase-2")
+
+        # assert
+        assert ["foo-phase-1", "foo-phase-2"] == phases.completed
+        assert bool(timings) == bool(phases)
+        if timings:
+            assert 2 == dict((t.phase, t) for t in phases.result())["foo-phase-2"].count
+            assert isinstance(phases.result()[0], PhaseTiming)
+        else:
+            assert phases.result() is None
@@ -0,0 +1,84 @@
+import pytest
+
+from gitchecker import gitignore
+from gitchecker.repository import Repository
+
+
+class TestUnitGitIgnore_Rules:
+
+    @pytest.mark.parametrize("line,base,path,is_dir,expected", [
+        ("*.log", "", "foo.log", False, True),
+        ("*.log", "", "dir/sub/foo.log", False, True),
+        ("*.log", "", "foo.logs", False, False),
+        ("build/", "", "build", True, True),
+        ("build/", "", "build", False, False),
+        ("build/", "", "src/build", True, True),
+        ("/build", "", "src/build", True, False),
+        ("doc/*.txt", "", "doc/notes.txt", False, True),
+        ("doc/*.txt", "", "doc/server/arch.txt", False, False),
+        ("doc/**/*.txt", "", "doc/server/arch.txt", False, True),
+        ("**/foo", "", "a/b/foo", False, True),
+        ("**/foo", "", "foo", False, True),
+        ("abc/**", "", "abc/x/y", False, True),
+        ("abc/**", "", "abc", True, False),
+        ("a/**/b", "", "a/x/y/b", False, True),
+        ("a/**/b", "", "a/b", False, True),
+        ("fo[ox].py", "", "fox.py", False, True),
+        ("fo[!ox].py", "", "fox.py", False, False),
+        ("*.py", "sub", "sub/a.py", False, True),
+        ("*.py", "sub", "other/a.py", False, False),
+        ("/a.py", "sub", "sub/a.py", False, True),
+        ("\\#foo", "", "#foo", False, True),
+    ])
+    def test_matches(self, line, base, path, is_dir, expected):
+        # arrange
+        rule = gitignore._parse_rule(line, base)
+
+        # act
+        matches = rule.matches(path, is_dir)
+
+        # assert
+        assert expected == matches
+
+    @pytest.mark.parametrize("line", ["", "   ", "# comment", "/"])
+    def test_no_rule(self, line):
+        # act
+        rule = gitignore._parse_rule(line, "")
+
+        # assert
+        assert rule is None
+
+
+class TestUnitGitIgnore_GitIgnore:
+
+    def test_precedence(self, tmp_path):
+        # arrange
+        (tmp_path / ".git" / "info").mkdir(parents=True)
+        (tmp_path / ".git" / "info" / "exclude").write_text("*.tmp\n")
+        (tmp_path / ".gitignore").write_text("*.log\n!keep.log\n")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / ".gitignore").write_text("keep.log\n!*.tmp\n")
+        repo = _foo_repo(tmp_path)
+        git_ignore = gitignore.GitIgnore(repo)
+
+        # act
+        git_ignore.push("")
+        root_results = [git_ignore.is_ignored(path, False)
+                        for path in ("a.log", "keep.log", "a.tmp", "a.py")]
+        git_ignore.push("sub")
+        sub_results = [git_ignore.is_ignored(path, False)
+                       for path in ("sub/a.log", "sub/keep.log", "sub/a.tmp")]
+        git_ignore.pop()
+        popped_result = git_ignore.is_ignored("a.tmp", False)
+
+        # assert
+        assert [True, False, True, False] == root_results
+        assert [True, True, False] == sub_results
+        assert popped_result
+
+
+def _foo_repo(tmp_path):
+    git_dir = str(tmp_path / ".git")
+    config = {"core.excludesfile": str(tmp_path / "no-global-excludes")}
+
+    return Repository(str(tmp_path), git_dir, git_dir, config)
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+import gitchecker
+
+
+# generous, "import gitchecker" takes a few milliseconds
+IMPORT_TIME_LIMIT_US = 25000
+SLOW_MODULES = ["git", "asyncio", "concurrent.futures", "ctypes"]
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(gitchecker.__file__)))
+
+
+def _run_python(code, *options):
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    proc = subprocess.run([sys.executable] + list(options) + ["-c", code],
+                          env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+    return proc.stdout, proc.stderr
+
+
+class TestUnitImport:
+
+    def test_import_time(self):
+        # arrange
+        _run_python("import gitchecker")  # compiles the modules
+
+        # act
+        _, stderr = _run_python("import gitchecker", "-X", "importtime")
+
+        # assert
+        last_line = stderr.strip().splitlines()[-1]
+        _, cumulative_us, module = (field.strip() for field in last_line.split("|"))
+        assert "gitchecker" == module
+        assert int(cumulative_us) < IMPORT_TIME_LIMIT_US
+
+    def test_slow_modules_not_imported(self):
+        # act
+        stdout, _ = _run_python("import sys, gitchecker\n"
+                                "gitchecker.compile_path_matcher('foo')\n"
+                                "gitchecker.check_status_and_get_commit_info\n"
+                                "print(' '.join(sorted(sys.modules)))")
+
+        # assert
+        imported_modules = stdout.split()
+        assert "gitchecker.gitchecker" in imported_modules
+        assert [] == [module for module in SLOW_MODULES if module in imported_modules]
+
+    def test_lazy_exports(self):
+        # act & assert
+        assert gitchecker.check_many is gitchecker.gitchecker.check_many
+        assert "watch" in dir(gitchecker)
+        assert set(gitchecker.__all__) <= set(dir(gitchecker))
+
+    def test_lazy_submodules(self):
+        # act
+        stdout, _ = _run_python("import gitchecker\n"
+                                "print(gitchecker.daemon.__name__)\n"
+                                "print(gitchecker.gitchecker.check_many.__module__)\n"
+                                "try:\n"
+                                "    gitchecker.foo_missing\n"
+                                "except AttributeError as ex:\n"
+                                "    print(ex)")
+
+        # assert
+        assert ["gitchecker.daemon",
+                "gitchecker.gitchecker",
+                "module 'gitchecker' has no attribute 'foo_missing'"] == stdout.splitlines()
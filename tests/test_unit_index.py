@@ -0,0 +1,139 @@
+import struct
+import pytest
+
+from gitchecker import index
+
+
+FOO_OID = bytes(range(20))
+
+
+def _entry_bytes(path, flags=0, extended_flags=None, mtime_s=1500000000):
+    fields = index.ENTRY.pack(1, 2, mtime_s, 4, 5, 6, 0o100644, 7, 8, 9, FOO_OID,
+                              flags | min(len(path), 0xFFF) |
+                              (index.FLAG_EXTENDED if extended_flags is not None else 0))
+    if extended_flags is not None:
+        fields += index.EXTENDED_FLAGS.pack(extended_flags)
+
+    return fields
+
+
+def _index_bytes(version, entries, extensions=b""):
+    data = index.HEADER.pack(index.SIGNATURE, version, len(entries))
+    previous_path = b""
+    for path, flags, extended_flags in entries:
+        entry = _entry_bytes(path, flags, extended_flags)
+        if version == 4:
+            common = 0
+            while (common < min(len(path), len(previous_path)) and
+                   path[common] == previous_path[common]):
+                common += 1
+            # single byte varints are enough for these short paths
+            entry += bytes([len(previous_path) - common]) + path[common:] + b"\0"
+        else:
+            entry += path
+            entry += b"\0" * (8 - len(entry) % 8)
+        data += entry
+        previous_path = path
+
+    return data + extensions + b"\0" * index.HASH_SIZE
+
+
+FOO_ENTRIES = [(b"dir/file-1.py", 0, None),
+               (b"dir/file-2.py", 0x2000, None),
+               (b"dir/sub/file-3.py", index.FLAG_ASSUME_VALID, None),
+               (b"other.py", 0, None)]
+
+FOO_V3_ENTRIES = FOO_ENTRIES + [(b"skipped.py", 0, index.EXTENDED_SKIP_WORKTREE),
+                                (b"zz-intent.py", 0, index.EXTENDED_INTENT_TO_ADD)]
+
+
+class TestUnitIndex_ParseIndex:
+
+    @pytest.mark.parametrize("version,entries", [(2, FOO_ENTRIES),
+                                                 (3, FOO_V3_ENTRIES),
+                                                 (4, FOO_V3_ENTRIES)])
+    def test_versions(self, version, entries):
+        # arrange
+        data = _index_bytes(version, entries)
+
+        # act
+        parsed_version, parsed_entries, extensions = index.parse_index(data)
+
+        # assert
+        assert version == parsed_version
+        assert [path.decode() for path, _, _ in entries] == [e.path for e in parsed_entries]
+        assert {} == extensions
+        first_entry = parsed_entries[0]
+        assert (1500000000, 4, 6, 0o100644, 9) == (first_entry.mtime_s,
+                                                   first_entry.mtime_ns,
+                                                   first_entry.ino,
+                                                   first_entry.mode,
+                                                   first_entry.size)
+        assert FOO_OID.hex() == first_entry.oid
+        assert 2 == parsed_entries[1].stage
+        assert parsed_entries[2].assume_valid
+        if version > 2:
+            assert parsed_entries[4].skip_worktree
+            assert parsed_entries[5].intent_to_add
+
+    def test_extensions(self):
+        # arrange
+        tree_extension = index.EXTENSION_HEADER.pack(b"TREE", 3) + b"foo"
+        data = _index_bytes(2, FOO_ENTRIES, tree_extension)
+
+        # act
+        _, _, extensions = index.parse_index(data)
+
+        # assert
+        assert {b"TREE": b"foo"} == extensions
+
+    @pytest.mark.parametrize("signature", [b"link", b"sdir"])
+    def test_unsupported_extensions(self, signature):
+        # arrange
+        data = _index_bytes(2, FOO_ENTRIES, index.EXTENSION_HEADER.pack(signature, 0))
+
+        # act
+        with pytest.raises(Exception):
+            index.parse_index(data)
+
+    def test_invalid_signature(self):
+        # act
+        with pytest.raises(Exception) as ex:
+            index.parse_index(struct.pack(">4sLL", b"FOOO", 2, 0))
+
+        # assert
+        assert "Invalid index file signature" in str(ex.value)
+
+
+class TestUnitIndex_ParseCacheTree:
+
+    def test(self):
+        # arrange
+        data = (b"\x003 2\n" + bytes([1] * 20) +
+                b"foo-dir\x00-1 1\n" +
+                b"foo-sub\x001 0\n" + bytes([2] * 20) +
+                b"bar-dir\x001 0\n" + bytes([3] * 20))
+
+        # act
+        cache_tree = index.parse_cache_tree(data)
+
+        # assert
+        assert {"": "01" * 20,
+                "foo-dir/foo-sub": "02" * 20,
+                "bar-dir": "03" * 20} == cache_tree
+
+
+class TestUnitIndex_ReadOffsetVarint:
+
+    @pytest.mark.parametrize("data,expected_value", [(b"\x05", 5),
+                                                     (b"\x7f", 127),
+                                                     (b"\x80\x00", 128),
+                                                     (b"\x80\x7f", 255),
+                                                     (b"\x81\x00", 256)])
+    def test(self, data, expected_value):
+        # act
+        value, offset = index._read_offset_varint(memoryview(data), 0)
+
+        # assert
+        assert expected_value == value
+        assert len(data) == offset
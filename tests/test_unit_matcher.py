@@ -0,0 +1,112 @@
+import re
+import pytest
+
+from gitchecker import matcher
+
+
+class TestUnitMatcher_PathMatcher:
+
+    @pytest.mark.parametrize("path,expected", [
+        ("build/foo.o", True),
+        ("builder.py", True),
+        ("src/foo.py", False),
+        ("src/foo.pyc", True),
+        ("docs/foo.md", True),
+        ("docs/sub/foo.md", False),
+        ("vendor/sub/foo.js", True),
+        ("foo.log", True),
+        ("foo.log.txt", False),
+    ])
+    def test_matches(self, path, expected):
+        # arrange
+        path_matcher = matcher.PathMatcher(["build",
+                                            r".*\.pyc$",
+                                            "glob:docs/*.md",
+                                            "glob:vendor/**",
+                                            r"(foo|bar)\.log$"])
+
+        # act
+        matches = path_matcher.matches(path)
+
+        # assert
+        assert expected == matches
+
+    def test_not_combinable_patterns(self):
+        # arrange
+        path_matcher = matcher.PathMatcher([r"(\w+)/\1\.py", "(?i)readme", "foo/"])
+
+        # act / assert
+        assert path_matcher.matches("foo/foo.py")
+        assert path_matcher.matches("README.md")
+        assert path_matcher.matches("foo/bar.py")
+        assert not path_matcher.matches("bar/foo.py")
+
+    @pytest.mark.parametrize("dir_path,expected", [
+        ("build/sub", True),
+        ("vendor", True),
+        ("src", False),
+        ("docs", None),
+        ("", None),
+    ])
+    def test_matches_dir(self, dir_path, expected):
+        # arrange
+        path_matcher = matcher.PathMatcher(["^build/", "glob:vendor/**", r"docs/.*\.md$"])
+
+        # act
+        matches = path_matcher.matches_dir(dir_path)
+
+        # assert
+        assert expected is matches
+
+    def test_matches_dir_with_unprefixed_pattern(self):
+        # arrange
+        path_matcher = matcher.PathMatcher(["build/", r".*\.pyc$"])
+
+        # act / assert
+        assert path_matcher.matches_dir("build")
+        assert None is path_matcher.matches_dir("src")
+
+
+class TestUnitMatcher_CompilePathMatcher:
+
+    def test_reuses_matchers(self):
+        # act
+        path_matcher = matcher.compile_path_matcher(["foo", "glob:*.bar"])
+
+        # assert
+        assert path_matcher is matcher.compile_path_matcher(["foo", "glob:*.bar"])
+        assert path_matcher is matcher.compile_path_matcher(path_matcher)
+        assert ("foo",) == matcher.compile_path_matcher("foo").patterns
+
+    @pytest.mark.parametrize("patterns", [None, "", []])
+    def test_no_patterns(self, patterns):
+        # act / assert
+        assert None is matcher.compile_path_matcher(patterns)
+
+    def test_compiled_regex(self):
+        # act
+        path_matcher = matcher.compile_path_matcher([re.compile("foo", re.IGNORECASE)])
+
+        # assert
+        assert path_matcher.matches("FOO.py")
+        assert None is path_matcher.matches_dir("bar")
+
+
+class TestUnitMatcher_LiteralRegexPrefix:
+
+    @pytest.mark.parametrize("pattern,expected", [
+        ("build/", ("build/", True)),
+        ("^build/", ("build/", True)),
+        (r"foo\.py$", ("foo.py", False)),
+        ("foos?/bar", ("foo", False)),
+        (r"src/\w+", ("src/", False)),
+        ("foo|bar", ("", False)),
+        ("foo/(a|b)", ("foo/", False)),
+        ("[|]foo", ("", False)),
+    ])
+    def test(self, pattern, expected):
+        # act
+        prefix = matcher._literal_regex_prefix(pattern)
+
+        # assert
+        assert expected == prefix
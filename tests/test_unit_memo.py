@@ -0,0 +1,80 @@
+from unittest.mock import patch
+from git import Actor, Repo
+
+from gitchecker import memo
+
+
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+
+class TestUnitMemo_StatusMemo:
+
+    def test_same_token(self):
+        # arrange
+        status_memo = memo.StatusMemo()
+        status_memo.put("foo-key", "foo-token", "foo-status")
+
+        # act
+        git_status = status_memo.get("foo-key", "foo-token")
+        other_git_status = status_memo.get("foo-key", "foo-other-token")
+
+        # assert
+        assert "foo-status" == git_status
+        assert other_git_status is None
+        assert 0 == len(status_memo)
+
+    def test_expired(self):
+        # arrange
+        status_memo = memo.StatusMemo(ttl=5)
+        with patch.object(memo.time, "monotonic", return_value=100):
+            status_memo.put("foo-key", "foo-token", "foo-status")
+
+        # act
+        with patch.object(memo.time, "monotonic", return_value=104):
+            git_status = status_memo.get("foo-key", "foo-token")
+        with patch.object(memo.time, "monotonic", return_value=105):
+            expired_git_status = status_memo.get("foo-key", "foo-token")
+
+        # assert
+        assert "foo-status" == git_status
+        assert expired_git_status is None
+
+    def test_least_recently_used_dropped(self):
+        # arrange
+        status_memo = memo.StatusMemo(max_size=2)
+        status_memo.put("foo-key-1", "foo-token", "foo-status-1")
+        status_memo.put("foo-key-2", "foo-token", "foo-status-2")
+        status_memo.get("foo-key-1", "foo-token")
+
+        # act
+        status_memo.put("foo-key-3", "foo-token", "foo-status-3")
+
+        # assert
+        assert 2 == len(status_memo)
+        assert status_memo.get("foo-key-2", "foo-token") is None
+        assert "foo-status-1" == status_memo.get("foo-key-1", "foo-token")
+
+
+class TestUnitMemo_ValidityToken:
+
+    def test_changes(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "foo-dir").mkdir()
+        (tmp_path / "foo-dir" / "foo.py").write_text("foo")
+        repo.index.add(["foo-dir/foo.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        tokens = [memo.validity_token(str(tmp_path))]
+
+        # act
+        tokens.append(memo.validity_token(str(tmp_path / "foo-dir")))
+        (tmp_path / "foo-new.py").write_text("foo")
+        tokens.append(memo.validity_token(str(tmp_path)))
+        repo.index.add(["foo-new.py"])
+        tokens.append(memo.validity_token(str(tmp_path)))
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        tokens.append(memo.validity_token(str(tmp_path)))
+
+        # assert
+        assert tokens[0] == tokens[1]
+        assert len(set(tokens[1:])) == 4
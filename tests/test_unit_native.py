@@ -0,0 +1,407 @@
+import hashlib
+import os
+from unittest.mock import patch
+import pytest
+from git import Actor, Repo
+
+from gitchecker import native
+from gitchecker.deadline import Deadline, DeadlineExceeded
+from gitchecker.gitignore import GitIgnore
+from gitchecker.index import IndexEntry
+from gitchecker.matcher import compile_path_matcher
+from gitchecker.repository import Repository
+from gitchecker.statcache import CACHE_FILENAME
+from gitchecker.status import Change, STAGED, UNSTAGED, UNTRACKED
+
+
+FOO_CONTENT = b"foo\n"
+FOO_OID = hashlib.sha1(b"blob 4\0" + FOO_CONTENT).hexdigest()
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+
+def _index_entry(path, st, oid=FOO_OID, **kwargs):
+    entry = IndexEntry(path,
+                       *divmod(st.st_ctime_ns, 10**9),
+                       *divmod(st.st_mtime_ns, 10**9),
+                       st.st_dev, st.st_ino, 0o100644, st.st_uid, st.st_gid, st.st_size,
+                       oid, 0, False, False, False)
+
+    return entry._replace(**kwargs)
+
+
+def _stat_options(index_mtime_s):
+    return native._StatOptions({}, (index_mtime_s, 0))
+
+
+def _is_modified(worktree, entry, options):
+    is_modified, _ = native._examine_entry(worktree, entry, options)
+
+    return is_modified
+
+
+class TestUnitNative_IsModified:
+
+    not_racy_options = _stat_options(2**32)
+
+    def _arrange(self, tmp_path, content=FOO_CONTENT):
+        (tmp_path / "foo.txt").write_bytes(content)
+        racy_options = _stat_options(0)
+
+        return str(tmp_path), racy_options
+
+    def test_clean(self, tmp_path):
+        # arrange
+        worktree, _ = self._arrange(tmp_path)
+        entry = _index_entry("foo.txt", os.lstat(os.path.join(worktree, "foo.txt")))
+
+        # act
+        with patch.object(native, "hash_blob", side_effect=AssertionError("unexpected hashing")):
+            is_modified = _is_modified(worktree, entry, self.not_racy_options)
+
+        # assert
+        assert not is_modified
+
+    def test_racily_clean_is_hashed(self, tmp_path):
+        # arrange
+        worktree, racy_options = self._arrange(tmp_path, b"bar\n")
+        entry = _index_entry("foo.txt", os.lstat(os.path.join(worktree, "foo.txt")))
+
+        # act
+        is_modified = _is_modified(worktree, entry, racy_options)
+
+        # assert
+        assert is_modified
+
+    def test_touched_but_same_content(self, tmp_path):
+        # arrange
+        worktree, _ = self._arrange(tmp_path)
+        st = os.lstat(os.path.join(worktree, "foo.txt"))
+        entry = _index_entry("foo.txt", st, mtime_s=st.st_mtime_ns // 10**9 - 10)
+
+        # act
+        is_modified = _is_modified(worktree, entry, self.not_racy_options)
+
+        # assert
+        assert not is_modified
+
+    def test_size_changed_is_not_hashed(self, tmp_path):
+        # arrange
+        worktree, _ = self._arrange(tmp_path)
+        entry = _index_entry("foo.txt", os.lstat(os.path.join(worktree, "foo.txt")), size=1)
+
+        # act
+        with patch.object(native, "hash_blob", side_effect=AssertionError("unexpected hashing")):
+            is_modified = _is_modified(worktree, entry, self.not_racy_options)
+
+        # assert
+        assert is_modified
+
+    def test_deleted_and_type_changed(self, tmp_path):
+        # arrange
+        worktree, _ = self._arrange(tmp_path)
+        st = os.lstat(os.path.join(worktree, "foo.txt"))
+        deleted_entry = _index_entry("deleted.txt", st)
+        symlink_entry = _index_entry("foo.txt", st, mode=0o120000)
+
+        # act
+        deleted_is_modified = _is_modified(worktree, deleted_entry, self.not_racy_options)
+        symlink_is_modified = _is_modified(worktree, symlink_entry, self.not_racy_options)
+
+        # assert
+        assert deleted_is_modified
+        assert symlink_is_modified
+
+
+class TestUnitNative_ExamineEntries:
+
+    def test_hashed_in_parallel(self, tmp_path):
+        # arrange
+        entries = []
+        for i in range(10):
+            path = tmp_path / "foo-{}.txt".format(i)
+            path.write_bytes(b"bar\n" if i % 3 == 0 else FOO_CONTENT)
+            entries.append(_index_entry(path.name, os.lstat(str(path))))
+        entries.append(_index_entry("foo-deleted.txt", os.lstat(str(tmp_path))))
+        racy_options = _stat_options(0)
+
+        # act
+        with patch.object(native, "PARALLEL_HASH_MIN_FILES", 2):
+            results = list(native._examine_entries(str(tmp_path), entries, racy_options))
+
+        # assert
+        expected_results = [("foo-deleted.txt", True)]
+        expected_results += [("foo-{}.txt".format(i), i % 3 == 0) for i in range(10)]
+        assert expected_results == [(entry.path, is_dirty) for entry, is_dirty, _ in results]
+
+    @pytest.mark.parametrize("parallel_min_files", [1, 100], ids=["parallel", "serial"])
+    def test_deleted_before_hashed(self, tmp_path, parallel_min_files):
+        # arrange
+        entries = []
+        for i in range(3):
+            path = tmp_path / "foo-{}.txt".format(i)
+            path.write_bytes(FOO_CONTENT)
+            entries.append(_index_entry(path.name, os.lstat(str(path))))
+        racy_options = _stat_options(0)
+        hash_blob = native.hash_blob
+
+        def deleting_hash_blob(path, st):
+            if path.endswith("foo-1.txt"):
+                os.remove(path)
+            return hash_blob(path, st)
+
+        # act
+        with patch.object(native, "PARALLEL_HASH_MIN_FILES", parallel_min_files), \
+                patch.object(native, "hash_blob", side_effect=deleting_hash_blob):
+            results = list(native._examine_entries(str(tmp_path), entries, racy_options))
+            deleted_is_modified = _is_modified(str(tmp_path), entries[1], racy_options)
+
+        # assert
+        assert [("foo-0.txt", False), ("foo-1.txt", True), ("foo-2.txt", False)] == \
+            [(entry.path, is_dirty) for entry, is_dirty, _ in results]
+        assert deleted_is_modified
+
+    def test_not_hashed_when_closed(self, tmp_path):
+        # arrange
+        (tmp_path / "foo.txt").write_bytes(FOO_CONTENT)
+        racy_entry = _index_entry("foo.txt", os.lstat(str(tmp_path / "foo.txt")))
+        resized_entry = racy_entry._replace(size=1)
+        results = native._examine_entries(str(tmp_path), [racy_entry, resized_entry],
+                                          _stat_options(0))
+
+        # act
+        with patch.object(native, "hash_blob", side_effect=AssertionError("unexpected hashing")):
+            first_result = next(results)
+            results.close()
+
+        # assert
+        assert (resized_entry, True) == first_result[:2]
+
+
+class TestUnitNative_IterStaged:
+
+    def test(self):
+        # arrange
+        store = _TreeStoreMock([("kept.py", 0o100644, "1" * 40),
+                                ("modified.py", 0o100644, "2" * 40),
+                                ("renamed.py", 0o100644, "3" * 40),
+                                ("deleted.py", 0o100644, "4" * 40)])
+        st = os.lstat(__file__)
+        entries = [_index_entry("added.py", st, "5" * 40),
+                   _index_entry("kept.py", st, "1" * 40),
+                   _index_entry("modified.py", st, "2" * 40, mode=0o100755),
+                   _index_entry("new-name.py", st, "3" * 40),
+                   _index_entry("intent.py", st, intent_to_add=True)]
+
+        # act
+        changes = list(native._iter_staged(store, "foo-tree", entries))
+
+        # assert
+        assert [Change(STAGED, "modified.py"),
+                Change(STAGED, "added.py"),
+                Change(STAGED, "new-name.py", "renamed.py"),
+                Change(STAGED, "deleted.py")] == changes
+
+    def test_unchanged_subtrees_skipped(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        paths = ["foo-dir/foo-sub/a.py", "foo-dir/b.py", "bar-dir/c.py", "top.py"]
+        for path in paths:
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("foo")
+        repo.index.add(paths)
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        # git records the cache-tree of the whole index
+        repo.git.read_tree("HEAD")
+        (tmp_path / "foo-dir" / "b.py").write_text("modified")
+        (tmp_path / "foo-dir" / "new.py").write_text("foo")
+        repo.git.add("foo-dir/b.py", "foo-dir/new.py")
+
+        # act
+        with patch.object(native.ObjectStore, "read_tree", autospec=True,
+                          side_effect=native.ObjectStore.read_tree) as read_tree_mock:
+            _, changes = native.get_commit_info_and_changes(str(tmp_path))
+            staged_changes = [change for change in changes if change.category == STAGED]
+
+        # assert
+        assert [Change(STAGED, "foo-dir/b.py"), Change(STAGED, "foo-dir/new.py")] == staged_changes
+        assert 2 == read_tree_mock.call_count
+
+
+class _TreeStoreMock:
+
+    def __init__(self, files):
+        self.files = files
+
+    def iter_tree_files(self, sha, prefix="", skip_tree=None):
+        return iter(self.files)
+
+
+class TestUnitNative_IterUntracked:
+
+    def test_prunes_matched_dirs(self, tmp_path):
+        # arrange
+        for path in ["build/out/a.o", "build/b.o", "builder.py", "src/c.py", "src/gen/d.py"]:
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("foo")
+        repo = Repository(str(tmp_path), str(tmp_path / ".git"), str(tmp_path / ".git"), {})
+        pruning = native._Pruning(compile_path_matcher(["build/", "glob:src/gen/**"]))
+
+        # act
+        with patch.object(native.os, "scandir", wraps=os.scandir) as scandir_mock:
+            changes = list(native._iter_untracked(repo, ["src/c.py"], pruning=pruning))
+
+        # assert
+        assert [Change(UNTRACKED, "builder.py")] == changes
+        assert ["build/", "src/gen/"] == sorted(pruning.pruned_dirs)
+        assert 2 == scandir_mock.call_count
+
+
+class TestUnitNative_Paths:
+
+    def test_only_paths_examined(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        for path in ["foo-service/a.py", "foo-service/b.py", "bar-service/c.py", "top.py"]:
+            (tmp_path / path).parent.mkdir(exist_ok=True)
+            (tmp_path / path).write_text("foo")
+        repo.index.add(["foo-service/a.py", "foo-service/b.py", "bar-service/c.py", "top.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        for path in ["foo-service/a.py", "bar-service/c.py", "top.py"]:
+            (tmp_path / path).write_text("modified")
+        (tmp_path / "foo-service" / "new.py").write_text("foo")
+        (tmp_path / "bar-service" / "new.py").write_text("foo")
+        (tmp_path / "foo-service" / "b.py").unlink()
+        repo.index.remove(["foo-service/b.py"])
+
+        # act
+        with patch.object(native.os, "lstat", wraps=os.lstat) as lstat_mock:
+            _, changes = native.get_commit_info_and_changes(str(tmp_path),
+                                                            paths=("foo-service",))
+            changes = list(changes)
+
+        # assert
+        assert [Change(STAGED, "foo-service/b.py"),
+                Change(UNSTAGED, "foo-service/a.py"),
+                Change(UNTRACKED, "foo-service/new.py")] == changes
+        assert not any("bar-service" in call[0][0] or call[0][0].endswith("top.py")
+                       for call in lstat_mock.call_args_list)
+
+    def test_stat_cache_not_supported(self):
+        # act
+        with pytest.raises(ValueError):
+            native.get_commit_info_and_changes("", stat_cache=True, paths=("foo-service",))
+
+
+class TestUnitNative_Snapshot:
+
+    def test_paths_examined_one_at_a_time(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        for path in ["foo-dir/a.py", "foo-dir/sub/b.py", "top.py"]:
+            (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / path).write_text("foo")
+        repo.index.add(["foo-dir/a.py", "foo-dir/sub/b.py", "top.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        (tmp_path / "foo-dir" / "a.py").write_text("modified")
+        for path in ["foo-dir/new.py", "foo-dir/build/out.o"]:
+            (tmp_path / path).parent.mkdir(exist_ok=True)
+            (tmp_path / path).write_text("foo")
+
+        # act
+        snapshot = native.Snapshot(str(tmp_path), compile_path_matcher("foo-dir/build/"))
+        gitignore = GitIgnore(snapshot.repo)
+        gitignore.push("")
+        untracked = list(snapshot.iter_untracked("foo-dir", gitignore))
+
+        # assert
+        assert snapshot.is_tracked("top.py")
+        assert not snapshot.is_tracked("foo-dir")
+        assert snapshot.is_tracked_dir("foo-dir/sub")
+        assert ["foo-dir/a.py", "foo-dir/sub/b.py"] == list(snapshot.iter_tracked("foo-dir"))
+        assert snapshot.is_unstaged("foo-dir/a.py")
+        assert not snapshot.is_unstaged("top.py")
+        assert [Change(UNTRACKED, "foo-dir/new.py")] == untracked
+
+
+class _StoppedDeadline(Deadline):
+    """deadline expired by the test, ``expire()``"""
+
+    def __init__(self):
+        Deadline.__init__(self, 60)
+        self.is_expired = False
+
+    def expired(self):
+        return self.is_expired
+
+    def expire(self):
+        self.is_expired = True
+
+
+class TestUnitNative_Deadline:
+
+    @pytest.mark.parametrize("stat_cache", [False, True], ids=["no-cache", "stat-cache"])
+    def test_walk_stopped(self, tmp_path, stat_cache):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "foo-tracked.py").write_text("foo")
+        repo.index.add(["foo-tracked.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        (tmp_path / "foo-tracked.py").write_text("modified")
+        for path in ["a/foo-untracked.py", "b/foo-untracked.py"]:
+            (tmp_path / path).parent.mkdir()
+            (tmp_path / path).write_text("foo")
+        deadline = _StoppedDeadline()
+        changes_seen = []
+
+        # act
+        _, changes = native.get_commit_info_and_changes(str(tmp_path), stat_cache=stat_cache,
+                                                        deadline=deadline)
+        with pytest.raises(DeadlineExceeded):
+            for change in changes:
+                changes_seen.append(change)
+                if change.category == UNTRACKED:
+                    deadline.expire()
+
+        # assert
+        # the directories are walked in the order of the file system
+        assert [UNSTAGED, UNTRACKED] == [change.category for change in changes_seen]
+        assert not (tmp_path / ".git" / CACHE_FILENAME).exists()
+
+    def test_expired_before_the_changes(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "foo-tracked.py").write_text("foo")
+        repo.index.add(["foo-tracked.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        (tmp_path / "foo-tracked.py").write_text("modified")
+
+        # act
+        commit_info, changes = native.get_commit_info_and_changes(str(tmp_path),
+                                                                  deadline=Deadline(0))
+
+        # assert
+        assert "foo-author" == commit_info.author
+        with pytest.raises(DeadlineExceeded):
+            next(changes)
+
+
+class TestUnitNative_GetCommitInfo:
+
+    def test_packed_refs_and_objects(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "foo.py").write_text("foo")
+        repo.index.add(["foo.py"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        repo.git.gc()
+        expected_commit = repo.head.commit
+
+        # act
+        commit_info = native.get_commit_info(str(tmp_path))
+
+        # assert
+        assert not os.listdir(os.path.join(repo.git_dir, "refs", "heads"))
+        assert repo.git.rev_parse("HEAD", short=7) == commit_info.sha
+        assert "foo-author" == commit_info.author
+        assert expected_commit.authored_datetime == commit_info.authored_datetime
+        assert expected_commit.committed_datetime == commit_info.committed_datetime
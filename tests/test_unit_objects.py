@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta, timezone
+import os
+import zlib
+import pytest
+from git import Actor, Repo
+
+from gitchecker import objects
+
+
+FOO_TREE_OID = "a" * 40
+FOO_BLOB_OID = "b" * 40
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+FOO_COMMIT_DATA = (b"tree " + FOO_TREE_OID.encode() + b"\n"
+                   b"parent " + b"c" * 40 + b"\n"
+                   b"author Foo Author <author@foo.com> 1500000000 +0200\n"
+                   b"committer Foo Committer <committer@foo.com> 1500003600 -0100\n"
+                   b"\n"
+                   b"foo message\n")
+
+
+class TestUnitObjects_Parse:
+
+    def test_commit(self):
+        # act
+        commit = objects.parse_commit("f00", FOO_COMMIT_DATA)
+
+        # assert
+        assert FOO_TREE_OID == commit.tree
+        assert ["c" * 40] == commit.parents
+        assert "Foo Author" == commit.author
+        assert "Foo Committer" == commit.committer
+        assert datetime(2017, 7, 14, 4, 40, tzinfo=timezone(timedelta(hours=2))) == \
+            commit.authored_datetime
+        assert timezone(-timedelta(hours=1)) == commit.committed_datetime.tzinfo
+
+    def test_tree(self):
+        # arrange
+        data = (b"100644 file.py\0" + bytes.fromhex(FOO_BLOB_OID) +
+                b"40000 dir\0" + bytes.fromhex(FOO_TREE_OID))
+
+        # act
+        entries = objects.parse_tree(data)
+
+        # assert
+        assert [objects.TreeEntry(0o100644, "file.py", FOO_BLOB_OID),
+                objects.TreeEntry(objects.TREE_MODE, "dir", FOO_TREE_OID)] == entries
+
+    def test_loose_object(self):
+        # act
+        obj_type, data = objects._parse_loose_object(b"blob 3\0foo")
+
+        # assert
+        assert (objects.OBJ_BLOB, b"foo") == (obj_type, data)
+
+
+class TestUnitObjects_ApplyDelta:
+
+    foo_base = b"0123456789abcdefghij"
+
+    def test_copy_and_insert(self):
+        # arrange
+        delta = (bytes([20, 13]) +
+                 bytes([0x80 | 0x01 | 0x10, 10, 6]) +  # copy "abcdef"
+                 bytes([3]) + b"XYZ" +                  # insert "XYZ"
+                 bytes([0x80 | 0x10, 4]))               # copy "0123"
+
+        # act
+        result = objects._apply_delta(self.foo_base, delta)
+
+        # assert
+        assert b"abcdefXYZ0123" == result
+
+    def test_invalid_opcode(self):
+        # act
+        with pytest.raises(Exception):
+            objects._apply_delta(self.foo_base, bytes([20, 1, 0]))
+
+
+class TestUnitObjects_ObjectStore:
+
+    def test_loose_objects_and_alternates(self, tmp_path):
+        # arrange
+        alternate_dir = tmp_path / "alternate"
+        objects_dir = tmp_path / "objects"
+        (objects_dir / "info").mkdir(parents=True)
+        (objects_dir / "info" / "alternates").write_text(str(alternate_dir) + "\n")
+        commit_sha = "12" + "3" * 38
+        (alternate_dir / "12").mkdir(parents=True)
+        (alternate_dir / "12" / ("3" * 38)).write_bytes(
+            zlib.compress(b"commit %d\0" % len(FOO_COMMIT_DATA) + FOO_COMMIT_DATA))
+        store = objects.ObjectStore(str(objects_dir))
+
+        # act
+        commit = store.read_commit(commit_sha)
+
+        # assert
+        assert FOO_TREE_OID == commit.tree
+        with pytest.raises(Exception) as ex:
+            store.read("f" * 40)
+        assert "not found" in str(ex.value)
+
+    def test_abbreviate_loose_objects(self, tmp_path):
+        # arrange
+        (tmp_path / "12").mkdir()
+        (tmp_path / "12" / ("34567" + "a" * 33)).write_bytes(b"")
+        (tmp_path / "12" / ("34567" + "b" * 33)).write_bytes(b"")
+        (tmp_path / "12" / ("3" * 38)).write_bytes(b"")
+        store = objects.ObjectStore(str(tmp_path))
+
+        # act & assert
+        assert "1234567a" == store.abbreviate("1234567" + "a" * 33)
+        assert "12333" == store.abbreviate("12" + "3" * 38, min_length=5)
+        assert "1234567c" == store.abbreviate("1234567" + "c" * 33)
+
+    def test_abbreviate_packed_objects(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        for i in range(600):
+            (tmp_path / "foo-{}.txt".format(i)).write_text("foo-{}".format(i))
+        repo.index.add([path.name for path in tmp_path.glob("foo-*")])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        repo.git.repack("-a", "-d")
+        shas = repo.git.cat_file("--batch-all-objects", "--batch-check=%(objectname)").split()
+        store = objects.ObjectStore(os.path.join(repo.git_dir, "objects"))
+
+        # act
+        abbreviations = [store.abbreviate(sha, min_length=4) for sha in shas]
+        commit = store.read_commit(repo.head.commit.hexsha)
+        store.close()
+
+        # assert
+        assert [repo.git.rev_parse(sha, short=4) for sha in shas] == abbreviations
+        assert any(len(abbreviation) > 4 for abbreviation in abbreviations)
+        assert "foo-author" == commit.author
+
+    def test_shared_hex_prefix(self):
+        # act & assert
+        assert 3 == objects._shared_hex_prefix(b"\x12\x34", b"\x12\x35")
+        assert 2 == objects._shared_hex_prefix(b"\x12\x34", b"\x12\x44")
+        assert 4 == objects._shared_hex_prefix(b"\x12\x34", b"\x12\x34")
@@ -0,0 +1,78 @@
+from unittest.mock import MagicMock, patch
+import pytest
+
+from gitchecker import pool
+
+
+FOO_GIT_DIR = "foo/repo/path/.git"
+
+
+@patch.object(pool, "Repo")
+class TestUnitPool_RepoPool:
+
+    def test_reuses_idle_handles(self, RepoMock):
+        # arrange
+        RepoMock.return_value.git_dir = FOO_GIT_DIR
+        repo_pool = pool.RepoPool()
+
+        # act
+        with repo_pool.repo("foo-repo") as repo:
+            with repo_pool.repo("foo-repo") as concurrent_repo:
+                pass
+        with repo_pool.repo("./foo-repo") as reused_repo:
+            pass
+
+        # assert
+        assert 2 == RepoMock.call_count
+        assert reused_repo in (repo, concurrent_repo)
+        assert 2 == len(repo_pool)
+
+    def test_invalidated_when_head_or_index_moved(self, RepoMock, tmp_path):
+        # arrange
+        RepoMock.return_value.git_dir = str(tmp_path)
+        repo_pool = pool.RepoPool()
+        with repo_pool.repo("foo-repo"):
+            pass
+
+        # act
+        (tmp_path / "index").write_bytes(b"foo-index")
+        with repo_pool.repo("foo-repo"):
+            pass
+
+        # assert
+        assert 2 == RepoMock.call_count
+        RepoMock.return_value.close.assert_called_once_with()
+
+    def test_evicts_least_recently_used(self, RepoMock):
+        # arrange
+        repo_mocks = {}
+        RepoMock.side_effect = lambda repo_path: repo_mocks.setdefault(
+            repo_path, MagicMock(git_dir=FOO_GIT_DIR))
+        repo_pool = pool.RepoPool(max_size=2)
+
+        # act
+        for repo_path in ["foo-repo-1", "foo-repo-2", "foo-repo-1", "foo-repo-3"]:
+            with repo_pool.repo(repo_path):
+                pass
+
+        # assert
+        assert [0, 1, 0] == [repo_mocks[repo_path].close.call_count
+                             for repo_path in ["foo-repo-1", "foo-repo-2", "foo-repo-3"]]
+        assert 2 == len(repo_pool)
+
+    def test_discards_handle_on_error_and_close(self, RepoMock):
+        # arrange
+        RepoMock.return_value.git_dir = FOO_GIT_DIR
+        repo_pool = pool.RepoPool()
+
+        # act
+        with pytest.raises(ValueError):
+            with repo_pool.repo("foo-repo"):
+                raise ValueError("foo-error")
+        with repo_pool.repo("foo-repo"):
+            pass
+        repo_pool.close()
+
+        # assert
+        assert 2 == RepoMock.return_value.close.call_count
+        assert 0 == len(repo_pool)
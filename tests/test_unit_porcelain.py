@@ -0,0 +1,391 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock, patch
+import pytest
+from git import Actor, Repo
+
+from gitchecker import porcelain
+from gitchecker.deadline import Deadline, DeadlineExceeded
+from gitchecker.matcher import compile_path_matcher
+from gitchecker.status import Change, CommitInfo, STAGED, UNSTAGED, UNTRACKED
+
+
+FOO_STATUS_OUTPUT = (b"1 M. N... 100644 100644 100644 aaaa bbbb foo-staged.py\0"
+                     b"1 .M N... 100644 100644 100644 aaaa aaaa foo unstaged.py\0"
+                     b"1 MM N... 100644 100644 100644 aaaa bbbb foo-both.py\0"
+                     b"2 R. N... 100644 100644 100644 aaaa aaaa R100 foo-new.py\0foo-old.py\0"
+                     b"u UU N... 100644 100644 100644 100644 aaaa bbbb cccc foo-conflict.py\0"
+                     b"? foo-untracked.py\0")
+
+FOO_EXPECTED_CHANGES = [Change(STAGED, "foo-staged.py"),
+                        Change(UNSTAGED, "foo unstaged.py"),
+                        Change(STAGED, "foo-both.py"),
+                        Change(UNSTAGED, "foo-both.py"),
+                        Change(STAGED, "foo-new.py", "foo-old.py"),
+                        Change(STAGED, "foo-conflict.py"),
+                        Change(UNSTAGED, "foo-conflict.py"),
+                        Change(UNTRACKED, "foo-untracked.py")]
+
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+
+class TestUnitPorcelain_StatusParser:
+
+    def test_whole_output(self):
+        # arrange
+        parser = porcelain._StatusParser()
+
+        # act
+        changes = list(parser.feed(FOO_STATUS_OUTPUT))
+
+        # assert
+        assert FOO_EXPECTED_CHANGES == changes
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+    def test_chunked_output(self, chunk_size):
+        # arrange
+        parser = porcelain._StatusParser()
+        chunks = [FOO_STATUS_OUTPUT[i:i + chunk_size]
+                  for i in range(0, len(FOO_STATUS_OUTPUT), chunk_size)]
+
+        # act
+        changes = [change for chunk in chunks for change in parser.feed(chunk)]
+
+        # assert
+        assert FOO_EXPECTED_CHANGES == changes
+
+
+class TestUnitPorcelain_ParseCommitInfo:
+
+    def test(self):
+        # arrange
+        output = (b"f00c0mm\0Foo Author\0001500000000\0002017-07-14 04:40:00 +0200\0"
+                  b"Foo Committer\0001500003600\0002017-07-14 00:40:00 -0330\n")
+
+        # act
+        commit_info = porcelain._parse_commit_info(output)
+
+        # assert
+        plus_two = timezone(timedelta(hours=2))
+        minus_three_half = timezone(-timedelta(hours=3, minutes=30))
+        expected_commit_info = CommitInfo("f00c0mm",
+                                          "Foo Author",
+                                          datetime(2017, 7, 14, 4, 40, tzinfo=plus_two),
+                                          "Foo Committer",
+                                          datetime(2017, 7, 14, 0, 10, tzinfo=minus_three_half))
+        assert expected_commit_info == commit_info
+        assert plus_two == commit_info.authored_datetime.tzinfo
+
+
+class TestUnitPorcelain_ParseRefCommitInfo:
+
+    def test_commit(self):
+        # arrange
+        line = (b"refs/heads/foo-branch\0commit\0f00c0mm\0Foo Author\0001500000000 +0200\0"
+                b"Foo Committer\0001500003600 -0330\0\0\0\0\0\0\n")
+
+        # act
+        ref, commit_info = porcelain._parse_ref_commit_info(line)
+
+        # assert
+        expected_commit_info = CommitInfo("f00c0mm",
+                                          "Foo Author",
+                                          datetime(2017, 7, 14, 4, 40,
+                                                   tzinfo=timezone(timedelta(hours=2))),
+                                          "Foo Committer",
+                                          datetime(2017, 7, 14, 0, 10,
+                                                   tzinfo=timezone(-timedelta(hours=3,
+                                                                              minutes=30))))
+        assert "refs/heads/foo-branch" == ref
+        assert expected_commit_info == commit_info
+
+    def test_annotated_tag_peeled(self):
+        # arrange
+        line = (b"refs/tags/foo-tag\0tag\0f00ta9a\0\0\0\0\0"
+                b"commit\0f00c0mm\0a\0001 +0000\0c\0002 +0000\n")
+
+        # act
+        ref, commit_info = porcelain._parse_ref_commit_info(line)
+
+        # assert
+        assert "refs/tags/foo-tag" == ref
+        assert "f00c0mm" == commit_info.sha
+
+    def test_not_a_commit(self):
+        # arrange
+        line = b"refs/tags/foo-tree-tag\0tag\0f00ta9a\0\0\0\0\0tree\0f00743e\0\0\0\0\n"
+
+        # act
+        ref_commit_info = porcelain._parse_ref_commit_info(line)
+
+        # assert
+        assert ref_commit_info is None
+
+
+class TestUnitPorcelain_GetRefsCommitInfo:
+
+    def test(self, tmp_path):
+        # arrange
+        repo = Repo.init(str(tmp_path))
+        with repo.config_writer() as config:
+            config.set_value("user", "name", FOO_ACTOR.name)
+            config.set_value("user", "email", FOO_ACTOR.email)
+        (tmp_path / "foo.py").write_text("foo")
+        repo.index.add(["foo.py"])
+        first = repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        (tmp_path / "foo.py").write_text("modified")
+        repo.index.add(["foo.py"])
+        second = repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+        repo.create_tag("foo-annotated", ref=first, message="foo-message")
+        repo.create_tag("foo-lightweight", ref=second)
+        repo.create_tag("foo-tree", ref=first.tree, message="foo-message")
+        repo.create_head("foo-branch", first)
+
+        # act
+        refs = porcelain.get_refs_commit_info(str(tmp_path))
+        tags = porcelain.get_refs_commit_info(str(tmp_path), "refs/tags/foo-a*")
+
+        # assert
+        branch = repo.active_branch.path
+        assert sorted([branch, "refs/heads/foo-branch", "refs/tags/foo-annotated",
+                       "refs/tags/foo-lightweight"]) == list(refs)
+        assert second.hexsha[:7] == refs[branch].sha
+        assert first.hexsha[:7] == refs["refs/heads/foo-branch"].sha
+        assert first.hexsha[:7] == refs["refs/tags/foo-annotated"].sha
+        assert "foo-author" == refs["refs/tags/foo-annotated"].author
+        assert second.hexsha[:7] == refs["refs/tags/foo-lightweight"].sha
+        assert ["refs/tags/foo-annotated"] == list(tags)
+
+    def test_git_error(self, tmp_path):
+        # act
+        with pytest.raises(Exception) as ex:
+            porcelain.get_refs_commit_info(str(tmp_path))
+
+        # assert
+        assert str(ex.value).startswith("'git for-each-ref' failed: ")
+
+
+@patch.object(porcelain.subprocess, "Popen")
+class TestUnitPorcelain_GetCommitInfoAndChanges:
+
+    foo_repo_path = "foo/repo/path"
+
+    def test_streams_status(self, PopenMock):
+        # arrange
+        commit_proc = self._proc_mock(b"f00c0mm\0a\0001\0x +0000\0c\0002\0y +0000")
+        status_proc = self._proc_mock(FOO_STATUS_OUTPUT)
+        PopenMock.side_effect = [commit_proc, status_proc]
+
+        # act
+        commit_info, changes = porcelain.get_commit_info_and_changes(self.foo_repo_path)
+
+        # assert
+        assert "f00c0mm" == commit_info.sha
+        assert FOO_EXPECTED_CHANGES == list(changes)
+        assert 2 == PopenMock.call_count
+        assert porcelain.GIT_OPTIONS + porcelain.STATUS_ARGS == PopenMock.call_args[0][0][1:]
+        assert self.foo_repo_path == PopenMock.call_args[1]["cwd"]
+        status_proc.kill.assert_not_called()
+
+    def test_kills_status_when_closed_early(self, PopenMock):
+        # arrange
+        commit_proc = self._proc_mock(b"f00c0mm\0a\0001\0x +0000\0c\0002\0y +0000")
+        status_proc = self._proc_mock(FOO_STATUS_OUTPUT)
+        status_proc.poll.return_value = None
+        PopenMock.side_effect = [commit_proc, status_proc]
+
+        # act
+        _, changes = porcelain.get_commit_info_and_changes(self.foo_repo_path)
+        next(changes)
+        changes.close()
+
+        # assert
+        status_proc.kill.assert_called_once_with()
+
+    def test_git_error(self, PopenMock):
+        # arrange
+        commit_proc = self._proc_mock(b"", b"fatal: not a git repository", returncode=128)
+        commit_proc.args = ["git"] + porcelain.GIT_OPTIONS + porcelain.COMMIT_ARGS
+        status_proc = self._proc_mock(b"")
+        PopenMock.side_effect = [commit_proc, status_proc]
+
+        # act
+        with pytest.raises(Exception) as ex:
+            porcelain.get_commit_info_and_changes(self.foo_repo_path)
+
+        # assert
+        assert "'git log' failed: fatal: not a git repository" == str(ex.value)
+
+    @staticmethod
+    def _proc_mock(stdout, stderr=b"", returncode=0):
+        proc_mock = MagicMock()
+        proc_mock.args = ["git"] + porcelain.GIT_OPTIONS + ["foo-cmd"]
+        proc_mock.returncode = returncode
+        proc_mock.stdout.read1.side_effect = [stdout, b""]
+        proc_mock.communicate.return_value = (stdout, stderr)
+
+        return proc_mock
+
+
+@patch("asyncio.create_subprocess_exec")
+class TestUnitPorcelain_GetCommitInfoAndChangesAsync:
+
+    foo_repo_path = "foo/repo/path"
+
+    def test_streams_status(self, create_subprocess_exec_mock):
+        # arrange
+        async def act():
+            commit_proc = self._proc_mock(b"f00c0mm\0a\0001\0x +0000\0c\0002\0y +0000")
+            status_proc = self._proc_mock(FOO_STATUS_OUTPUT)
+            create_subprocess_exec_mock.side_effect = self._created(commit_proc, status_proc)
+
+            commit_info, changes = \
+                await porcelain.get_commit_info_and_changes_async(self.foo_repo_path)
+
+            return commit_info, [change async for change in changes], status_proc
+
+        # act
+        commit_info, changes, status_proc = asyncio.run(act())
+
+        # assert
+        assert "f00c0mm" == commit_info.sha
+        assert FOO_EXPECTED_CHANGES == changes
+        expected_args = tuple(porcelain.GIT_OPTIONS + porcelain.STATUS_ARGS)
+        assert expected_args == create_subprocess_exec_mock.call_args[0][1:]
+        assert self.foo_repo_path == create_subprocess_exec_mock.call_args[1]["cwd"]
+        status_proc.kill.assert_not_called()
+
+    def test_git_error(self, create_subprocess_exec_mock):
+        # arrange
+        async def act():
+            commit_proc = self._proc_mock(b"", b"fatal: not a git repository", returncode=128)
+            status_proc = self._proc_mock(b"", returncode=None)
+            create_subprocess_exec_mock.side_effect = self._created(commit_proc, status_proc)
+
+            with pytest.raises(Exception) as ex:
+                await porcelain.get_commit_info_and_changes_async(self.foo_repo_path)
+
+            return ex, status_proc
+
+        # act
+        ex, status_proc = asyncio.run(act())
+
+        # assert
+        assert "'git log' failed: fatal: not a git repository" == str(ex.value)
+        status_proc.kill.assert_called_once_with()
+
+    @staticmethod
+    def _created(*procs):
+        """``create_subprocess_exec()`` returning ``procs``, awaited like
+        the real one (the mock isn't an ``AsyncMock`` before Python 3.8)"""
+
+        procs = iter(procs)
+
+        async def create_subprocess_exec(*args, **kwargs):
+            return next(procs)
+
+        return create_subprocess_exec
+
+    @staticmethod
+    def _proc_mock(stdout, stderr=b"", returncode=0):
+        proc_mock = MagicMock()
+        proc_mock.returncode = returncode
+        proc_mock.stdout = asyncio.StreamReader()
+        proc_mock.stdout.feed_data(stdout)
+        proc_mock.stdout.feed_eof()
+
+        async def communicate():
+            return await proc_mock.stdout.read(), stderr
+        proc_mock.communicate = communicate
+
+        return proc_mock
+
+
+class TestUnitPorcelain_Deadline:
+
+    # a status that outputs one entry and then hangs, like on a cold network volume
+    hanging_args = [sys.executable, "-c",
+                    "import sys, time; sys.stdout.buffer.write(b'? foo-untracked.py\\0'); "
+                    "sys.stdout.flush(); time.sleep(30)"]
+
+    def test_killed_when_expired(self):
+        # arrange
+        proc = subprocess.Popen(self.hanging_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        changes_seen = []
+        start = time.monotonic()
+
+        # act
+        with pytest.raises(DeadlineExceeded):
+            for change in porcelain._iter_changes(proc, porcelain._StatusParser(),
+                                                  deadline=Deadline(0.3)):
+                changes_seen.append(change)
+
+        # assert
+        assert [Change(UNTRACKED, "foo-untracked.py")] == changes_seen
+        assert time.monotonic() - start < 10
+        assert proc.returncode is not None
+
+    def test_killed_when_expired_async(self):
+        # arrange
+        async def act():
+            proc = await asyncio.create_subprocess_exec(*self.hanging_args,
+                                                        stdout=subprocess.PIPE,
+                                                        stderr=subprocess.PIPE)
+            changes_seen = []
+            with pytest.raises(DeadlineExceeded):
+                async for change in porcelain._aiter_changes(proc, porcelain._StatusParser(),
+                                                             deadline=Deadline(0.3)):
+                    changes_seen.append(change)
+
+            return proc, changes_seen
+
+        # act
+        proc, changes_seen = asyncio.run(act())
+
+        # assert
+        assert [Change(UNTRACKED, "foo-untracked.py")] == changes_seen
+        assert proc.returncode is not None
+
+
+class TestUnitPorcelain_StatusArgs:
+
+    def test_excludes_pruned_dirs(self, tmp_path):
+        # arrange
+        (tmp_path / ".git").mkdir()
+        (tmp_path / "build").mkdir()
+        prune_matcher = compile_path_matcher(["build/", "build/sub/", "dist/", r".*\.pyc$"])
+        pruned_dirs = []
+
+        # act
+        status_args = porcelain._status_args(str(tmp_path), prune_matcher, pruned_dirs)
+
+        # assert
+        assert porcelain.STATUS_ARGS + ["--",
+                                        ":(top,exclude,literal)build/",
+                                        ":(top,exclude,literal)dist/"] == status_args
+        assert ["build/"] == pruned_dirs
+
+    def test_limited_to_paths(self, tmp_path):
+        # arrange
+        (tmp_path / ".git").mkdir()
+        prune_matcher = compile_path_matcher("services/foo/build/")
+
+        # act
+        status_args = porcelain._status_args(str(tmp_path), prune_matcher, [],
+                                             ("libs/foo", "services/foo"))
+
+        # assert
+        assert porcelain.STATUS_ARGS + ["--",
+                                        ":(top,literal)libs/foo",
+                                        ":(top,literal)services/foo",
+                                        ":(top,exclude,literal)services/foo/build/"] == status_args
+
+    def test_nothing_to_prune(self):
+        # act
+        status_args = porcelain._status_args("", compile_path_matcher(r".*\.pyc$"), [])
+
+        # assert
+        assert porcelain.STATUS_ARGS == status_args
@@ -0,0 +1,31 @@
+from gitchecker import repository
+
+
+class TestUnitRepository_IterSubmodules:
+
+    def test(self, tmp_path):
+        # arrange
+        (tmp_path / ".gitmodules").write_text('[submodule "foo-lib"]\n'
+                                              '\tpath = libs/foo-lib\n'
+                                              '\turl = ../foo-lib.git\n'
+                                              '[submodule "foo-uninitialized"]\n'
+                                              '\tpath = foo-uninitialized\n')
+        (tmp_path / "libs" / "foo-lib").mkdir(parents=True)
+        (tmp_path / "libs" / "foo-lib" / ".git").write_text("gitdir: ../../.git/modules/foo-lib\n")
+        (tmp_path / "libs" / "foo-lib" / ".gitmodules").write_text('[submodule "foo-nested"]\n'
+                                                                   '\tpath = foo-nested\n')
+        (tmp_path / "libs" / "foo-lib" / "foo-nested" / ".git").mkdir(parents=True)
+        (tmp_path / "foo-uninitialized").mkdir()
+
+        # act
+        paths = list(repository.iter_submodules(str(tmp_path)))
+
+        # assert
+        assert ["libs/foo-lib", "libs/foo-lib/foo-nested"] == paths
+
+    def test_no_gitmodules(self, tmp_path):
+        # act
+        paths = list(repository.iter_submodules(str(tmp_path)))
+
+        # assert
+        assert [] == paths
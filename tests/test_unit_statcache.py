@@ -0,0 +1,85 @@
+from gitchecker import statcache
+
+
+FOO_KEY = ("foo-head-sha", (1, 2, 3, 4, 5))
+OLD_STAT_KEY = (10**18, 10**18, 3, 4, 0o100644)
+
+
+class TestUnitStatCache:
+
+    def test_save_and_load(self, tmp_path):
+        # arrange
+        cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+        cache.files = {}
+        cache.set_staged([("staged", "foo.py", None)])
+        cache.set_file("foo.py", OLD_STAT_KEY, False)
+        cache.set_file("deleted.py", statcache.MISSING, True)
+        cache.set_dir("", OLD_STAT_KEY, ["sub"])
+
+        # act
+        cache.save()
+        loaded_cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+
+        # assert
+        assert not loaded_cache.changed
+        assert [("staged", "foo.py", None)] == loaded_cache.staged
+        assert {"foo.py": (OLD_STAT_KEY, False),
+                "deleted.py": (statcache.MISSING, True)} == loaded_cache.files
+        assert {"": (OLD_STAT_KEY, ["sub"])} == loaded_cache.dirs
+
+    def test_other_key(self, tmp_path):
+        # arrange
+        cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+        cache.files = {}
+        cache.set_staged([])
+        cache.save()
+
+        # act
+        loaded_cache = statcache.StatCache.load(str(tmp_path), ("other-head-sha",))
+
+        # assert
+        assert loaded_cache.changed
+        assert loaded_cache.staged is None
+        assert loaded_cache.files is None
+
+    def test_corrupted_file(self, tmp_path):
+        # arrange
+        (tmp_path / statcache.CACHE_FILENAME).write_bytes(b"foo-garbage")
+
+        # act
+        cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+
+        # assert
+        assert cache.staged is None
+
+    def test_changed_ignore_file_discards_dirs(self, tmp_path):
+        # arrange
+        gitignore_path = tmp_path / ".gitignore"
+        cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+        cache.files = {}
+        cache.set_staged([])
+        cache.set_dir("", OLD_STAT_KEY, [])
+        cache.set_ignore_file(str(gitignore_path), statcache.MISSING)
+        cache.save()
+        gitignore_path.write_text("*.log\n")
+
+        # act
+        loaded_cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+
+        # assert
+        assert {} == loaded_cache.dirs
+        assert [] == loaded_cache.staged
+
+    def test_recent_stat_data_is_not_trusted(self, tmp_path):
+        # arrange
+        cache = statcache.StatCache.load(str(tmp_path), FOO_KEY)
+        cache.files = {}
+        recent_key = (cache.scan_start_ns, cache.scan_start_ns, 3, 4, 0o100644)
+
+        # act
+        cache.set_file("recent.py", recent_key, False)
+        cache.set_dir("recent-dir", recent_key, [])
+
+        # assert
+        assert (False, False) == cache.files["recent.py"]
+        assert "recent-dir" not in cache.dirs
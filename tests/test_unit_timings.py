@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from gitchecker import timings
+from gitchecker.status import PhaseTiming
+
+
+@patch.object(timings.time, "perf_counter")
+class TestUnitTimings_Timings:
+
+    def test_laps_and_nested(self, perf_counter_mock):
+        # arrange
+        perf_counter_mock.side_effect = [10, 11, 15, 16.5]
+        foo_timings = timings.Timings()
+
+        # act
+        foo_timings.lap("foo-phase-1", 1)
+        foo_timings.add_nested("foo-nested", 1.5, 2)
+        foo_timings.count("foo-phase-2", 3)
+        foo_timings.lap("foo-phase-2")
+        foo_timings.lap("foo-phase-1", 1)
+
+        # assert
+        assert (PhaseTiming("foo-phase-1", 2.5, 2),
+                PhaseTiming("foo-nested", 1.5, 2),
+                PhaseTiming("foo-phase-2", 2.5, 3)) == foo_timings.result()
+
+    def test_no_timings(self, perf_counter_mock):
+        # act
+        timings.NO_TIMINGS.lap("foo-phase")
+
+        # assert
+        assert not timings.NO_TIMINGS
+        assert timings.NO_TIMINGS.result() is None
+        perf_counter_mock.assert_not_called()
@@ -0,0 +1,129 @@
+import os
+import shutil
+import time
+from git import Actor, Repo
+
+from gitchecker import watcher
+
+
+WAIT_TIMEOUT = 5
+FOO_ACTOR = Actor("foo-author", "foo@example.com")
+
+
+def _wait_for_status(git_watcher, **expected_counts):
+    deadline = time.time() + WAIT_TIMEOUT
+    while True:
+        git_status = git_watcher.status()
+        counts = {name: getattr(git_status, name) for name in expected_counts}
+        if counts == expected_counts or time.time() > deadline:
+            return counts
+
+        time.sleep(0.01)
+
+
+class TestUnitWatcher:
+
+    def _arrange(self, tmp_path):
+        repo = Repo.init(str(tmp_path))
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "foo.py").write_text("foo")
+        (tmp_path / ".gitignore").write_text("*.log\nbuild/\n")
+        repo.index.add(["sub/foo.py", ".gitignore"])
+        repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+
+        return repo
+
+    def test_initial_status(self, tmp_path):
+        # arrange
+        self._arrange(tmp_path)
+        (tmp_path / "untracked.py").write_text("foo")
+
+        # act
+        with watcher.watch(str(tmp_path)) as git_watcher:
+            git_status = git_watcher.status()
+
+        # assert
+        assert 0 == git_status.staged_files
+        assert 0 == git_status.unstaged_files
+        assert 1 == git_status.untracked_files
+        assert 1 == git_status.total_changes
+
+    def test_worktree_changes(self, tmp_path):
+        # arrange
+        self._arrange(tmp_path)
+
+        with watcher.watch(str(tmp_path)) as git_watcher:
+            # act
+            (tmp_path / "sub" / "foo.py").write_text("bar")
+            (tmp_path / "ignored.log").write_text("foo")
+            (tmp_path / "new" / "dir").mkdir(parents=True)
+            (tmp_path / "new" / "dir" / "new.py").write_text("foo")
+
+            # assert
+            assert {"unstaged_files": 1, "untracked_files": 1} == \
+                _wait_for_status(git_watcher, unstaged_files=1, untracked_files=1)
+
+            # act
+            os.rename(str(tmp_path / "new"), str(tmp_path / "build"))
+            shutil.rmtree(str(tmp_path / "sub"))
+            (tmp_path / "sub").mkdir()
+            (tmp_path / "sub" / "foo.py").write_text("foo")
+
+            # assert
+            assert {"unstaged_files": 0, "untracked_files": 0} == \
+                _wait_for_status(git_watcher, unstaged_files=0, untracked_files=0)
+
+    def test_index_and_head_changes(self, tmp_path):
+        # arrange
+        repo = self._arrange(tmp_path)
+
+        with watcher.watch(str(tmp_path)) as git_watcher:
+            # act
+            (tmp_path / "sub" / "foo.py").write_text("bar")
+            repo.git.add("sub/foo.py")
+
+            # assert
+            assert {"staged_files": 1, "unstaged_files": 0} == \
+                _wait_for_status(git_watcher, staged_files=1, unstaged_files=0)
+
+            # act
+            repo.index.commit("foo-message", author=FOO_ACTOR, committer=FOO_ACTOR)
+
+            # assert
+            assert {"staged_files": 0} == _wait_for_status(git_watcher, staged_files=0)
+            assert repo.head.commit.hexsha[:7] == git_watcher.status().commit_info.sha
+
+    def test_ignore_files_regex(self, tmp_path):
+        # arrange
+        self._arrange(tmp_path)
+
+        with watcher.watch(str(tmp_path), ignore_files_regex=r".*\.tmp$") as git_watcher:
+            # act
+            (tmp_path / "foo.tmp").write_text("foo")
+            (tmp_path / "foo.py").write_text("foo")
+
+            # assert
+            assert {"untracked_files": 1} == _wait_for_status(git_watcher, untracked_files=1)
+
+    def test_exclude_files(self, tmp_path, tmp_path_factory):
+        # arrange
+        repo = self._arrange(tmp_path)
+        excludes_file = tmp_path_factory.mktemp("foo-home") / "foo-excludes"
+        with repo.config_writer() as config:
+            config.set_value("core", "excludesFile", str(excludes_file))
+        (tmp_path / "foo-info.py").write_text("foo")
+        (tmp_path / "foo-global.py").write_text("foo")
+
+        with watcher.watch(str(tmp_path)) as git_watcher:
+            # act
+            with open(os.path.join(repo.git_dir, "info", "exclude"), "a") as f:
+                f.write("foo-info.py\n")
+
+            # assert
+            assert {"untracked_files": 1} == _wait_for_status(git_watcher, untracked_files=1)
+
+            # act
+            excludes_file.write_text("foo-global.py\n")
+
+            # assert
+            assert {"untracked_files": 0} == _wait_for_status(git_watcher, untracked_files=0)